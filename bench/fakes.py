@@ -0,0 +1,272 @@
+"""Discord に接続せずにCogを動かすための偽オブジェクト
+
+チャンネルは discord.TextChannel / VoiceChannel / CategoryChannel を継承しているので、
+Cog 側の isinstance チェックはそのまま通る。REST にあたる操作はすべて FakeHTTP を経由し、
+遅延と 429（discord.py と同じく待ってから再試行）を再現して呼び出し回数を数える。
+"""
+import asyncio
+import datetime
+import itertools
+import random
+import time
+from collections import Counter
+import discord
+
+_snowflakes = itertools.count(discord.utils.time_snowflake(datetime.datetime(2024, 1, 1, tzinfo=datetime.timezone.utc)), 1 << 22)
+
+
+def next_id():
+    return next(_snowflakes)
+
+
+class FakeHTTP:
+    """REST 呼び出しの代わり（遅延・429 を再現し、ルートごとの回数を数える）"""
+    def __init__(self, latency=0.05, jitter=0.02, rate_limit_ratio=0.0, retry_after=1.0, seed=None):
+        self.latency = latency
+        self.jitter = jitter
+        self.rate_limit_ratio = rate_limit_ratio
+        self.retry_after = retry_after
+        self.random = random.Random(seed)
+        self.calls = Counter()  # {ルート: 回数}（429 で再試行した分も含む）
+        self.rate_limited = 0
+        self.in_flight = 0
+        self._resume_at = {}  # {ルート: time.monotonic() 基準の再開時刻}
+
+    @property
+    def total_calls(self):
+        return sum(self.calls.values())
+
+    async def request(self, route):
+        while True:
+            delay = self._resume_at.get(route, 0.0) - time.monotonic()
+            if delay > 0:
+                await asyncio.sleep(delay)
+
+            self.calls[route] += 1
+            self.in_flight += 1
+            try:
+                await asyncio.sleep(max(0.0, self.random.gauss(self.latency, self.jitter)))
+            finally:
+                self.in_flight -= 1
+
+            if self.random.random() < self.rate_limit_ratio:
+                # discord.py の HTTP 層と同じく、バケットを止めて待ってから再試行
+                self.rate_limited += 1
+                self._resume_at[route] = time.monotonic() + self.retry_after
+                continue
+            return
+
+
+class FakeUser:
+    def __init__(self, user_id, name, bot=False):
+        self.id = user_id
+        self.name = name
+        self.display_name = name
+        self.bot = bot
+
+
+class FakeVoiceState:
+    def __init__(self, channel, self_mute=False, self_deaf=False):
+        self.channel = channel
+        self.self_mute = self_mute
+        self.self_deaf = self_deaf
+
+
+class FakeMember:
+    def __init__(self, guild, member_id, name, bot=False):
+        self.guild = guild
+        self.id = member_id
+        self.name = name
+        self.display_name = name
+        self.nick = None
+        self.bot = bot
+        self.roles = []
+        self.display_avatar = type("Asset", (), {"url": f"https://cdn.example/avatars/{member_id}.png"})()
+
+    @property
+    def voice(self):
+        return self.guild._voice_states.get(self.id)
+
+    async def move_to(self, channel):
+        await self.guild.http.request("move_member")
+        self.guild.set_voice_channel(self, channel)
+
+
+class FakeMessage:
+    def __init__(self, channel, author, content="", embeds=None, created_at=None):
+        self.id = next_id()
+        self.channel = channel
+        self.guild = channel.guild
+        self._state = channel.guild._state  # commands.Context が参照する
+        self.author = author
+        self.content = content
+        self.embeds = embeds or []
+        self.attachments = []
+        self.created_at = created_at or discord.utils.utcnow()
+
+    async def delete(self):
+        await self.guild.http.request("delete_message")
+        self.channel._remove_messages([self])
+
+    async def edit(self, **kwargs):
+        await self.guild.http.request("edit_message")
+
+
+class _FakeMessageable:
+    """テキストチャット付きチャンネルの共通部分（送信・取得・履歴・削除）"""
+    def _init_messages(self):
+        self._messages = {}  # {メッセージID: FakeMessage}（挿入順 = 古い順）
+
+    def _append(self, message):
+        self._messages[message.id] = message
+
+    def _remove_messages(self, messages):
+        for message in messages:
+            self._messages.pop(message.id, None)
+
+    async def send(self, content=None, *, embed=None, embeds=None, **kwargs):
+        await self.guild.http.request("send_message")
+        message = FakeMessage(self, self.guild.me, content or "", embeds or ([embed] if embed else []))
+        self._append(message)
+        return message
+
+    async def fetch_message(self, message_id):
+        await self.guild.http.request("fetch_message")
+        message = self._messages.get(message_id)
+        if message is None:
+            raise discord.NotFound(_FakeResponse(404), "Unknown Message")
+        return message
+
+    async def history(self, limit=100, before=None):
+        """新しい順に返す（100 件ごとに1回の REST 呼び出しとして数える）"""
+        messages = [m for m in reversed(list(self._messages.values())) if before is None or m.created_at < before]
+        if limit is not None:
+            messages = messages[:limit]
+        for i, message in enumerate(messages):
+            if i % 100 == 0:
+                await self.guild.http.request("history")
+            yield message
+
+    async def delete_messages(self, messages):
+        await self.guild.http.request("bulk_delete")
+        self._remove_messages(messages)
+
+
+class _FakeResponse:
+    def __init__(self, status):
+        self.status = status
+        self.reason = "Fake"
+
+
+class FakeCategory(discord.CategoryChannel):
+    def __init__(self, guild, channel_id, name):
+        self.guild = guild
+        self.id = channel_id
+        self.name = name
+        self.category_id = None
+        self.position = 0
+
+    @property
+    def text_channels(self):
+        return [c for c in self.guild.text_channels if c.category_id == self.id]
+
+
+class FakeTextChannel(_FakeMessageable, discord.TextChannel):
+    def __init__(self, guild, channel_id, name, category=None):
+        self.guild = guild
+        self.id = channel_id
+        self.name = name
+        self.category_id = category.id if category else None
+        self.position = 0
+        self._init_messages()
+
+
+class FakeVoiceChannel(_FakeMessageable, discord.VoiceChannel):
+    def __init__(self, guild, channel_id, name, category=None):
+        self.guild = guild
+        self.id = channel_id
+        self.name = name
+        self.category_id = category.id if category else None
+        self.position = 0
+        self._init_messages()
+
+
+class FakeGuild:
+    """1つのギルドの状態（チャンネル・メンバー・ボイス状態）"""
+    def __init__(self, http, name="bench-guild"):
+        self.http = http
+        self.id = next_id()
+        self.name = name
+        self.me = FakeUser(next_id(), "zero-bot", bot=True)
+        self._state = None  # Bot に登録したときに ConnectionState を入れる
+        self._channels = {}
+        self._members = {}
+        self._voice_states = {}  # {メンバーID: FakeVoiceState}（VoiceChannel.members が参照）
+
+    # ---------- 参照 ----------
+    @property
+    def channels(self):
+        return list(self._channels.values())
+
+    @property
+    def categories(self):
+        return [c for c in self._channels.values() if isinstance(c, FakeCategory)]
+
+    @property
+    def text_channels(self):
+        return [c for c in self._channels.values() if isinstance(c, FakeTextChannel)]
+
+    @property
+    def voice_channels(self):
+        return [c for c in self._channels.values() if isinstance(c, FakeVoiceChannel)]
+
+    @property
+    def members(self):
+        return list(self._members.values())
+
+    def get_channel(self, channel_id):
+        return self._channels.get(channel_id)
+
+    _resolve_channel = get_channel  # Client.get_channel から呼ばれる
+
+    def get_member(self, member_id):
+        return self._members.get(member_id)
+
+    # ---------- 構築（REST を呼ばない） ----------
+    def add_category(self, name, channel_id=None):
+        category = FakeCategory(self, channel_id or next_id(), name)
+        self._channels[category.id] = category
+        return category
+
+    def add_text_channel(self, name, category=None, channel_id=None):
+        channel = FakeTextChannel(self, channel_id or next_id(), name, category)
+        self._channels[channel.id] = channel
+        return channel
+
+    def add_voice_channel(self, name, category=None, channel_id=None):
+        channel = FakeVoiceChannel(self, channel_id or next_id(), name, category)
+        self._channels[channel.id] = channel
+        return channel
+
+    def add_member(self, name):
+        member = FakeMember(self, next_id(), name)
+        self._members[member.id] = member
+        return member
+
+    def set_voice_channel(self, member, channel):
+        """ボイス状態を更新して (before, after) を返す"""
+        before = self._voice_states.get(member.id) or FakeVoiceState(None)
+        if channel is None:
+            self._voice_states.pop(member.id, None)
+        else:
+            self._voice_states[member.id] = FakeVoiceState(channel)
+        return before, FakeVoiceState(channel)
+
+    # ---------- REST ----------
+    async def create_category(self, name, **kwargs):
+        await self.http.request("create_channel")
+        return self.add_category(name)
+
+    async def create_text_channel(self, name, category=None, **kwargs):
+        await self.http.request("create_channel")
+        return self.add_text_channel(name, category)
@@ -0,0 +1,282 @@
+"""ゲートウェイイベントの再生ベンチマーク
+
+    python -m bench.replay --events 2000 --rate 200
+    python -m bench.replay --record bench/streams/night.jsonl   # 合成したイベント列を保存
+    python -m bench.replay --replay bench/streams/night.jsonl   # 保存したイベント列を再生
+
+本物の Cog（message_handler / voice_events）を読み込み、偽のギルドと FakeHTTP の上で
+on_message / on_voice_state_update を再生する。ハンドラーの待ち時間（p50 / p99）、
+処理件数/秒、1イベントあたりの REST 呼び出し回数を表示する。
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from pathlib import Path
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+if str(REPO_ROOT) not in sys.path:
+    sys.path.insert(0, str(REPO_ROOT))
+
+from discord.ext import commands  # noqa: E402
+from bench.fakes import FakeHTTP, FakeGuild, FakeMessage  # noqa: E402
+from config import CATEGORY_NAME, MESSAGE_SOURCE_CHANNEL_IDS, intents  # noqa: E402
+
+COGS = ["cogs.voice_events", "cogs.message_handler"]
+WORDS = ["おつかれ", "こんばんは", "ねむい", "それな", "草", "おやすみ", "いまなにしてる？", "ゲームする人", "www", "了解"]
+
+
+# ---------- イベント列 ----------
+def synthesize(rooms=8, members=60, events=2000, rate=200.0, message_ratio=0.85, seed=0):
+    """合成イベント列 {"world": ..., "events": [...]} を作る（rate=0 なら全件を同時に流す）"""
+    rng = random.Random(seed)
+    world = {
+        "rooms": [f"部屋{i + 1}" for i in range(rooms)],
+        "members": [f"user{i + 1:03d}" for i in range(members)],
+    }
+    position = {}  # {メンバー番号: 部屋番号}
+    stream = []
+    for i in range(events):
+        t = i / rate if rate else 0.0
+        in_voice = list(position)
+        if in_voice and rng.random() < message_ratio:
+            member = rng.choice(in_voice)
+            content = " ".join(rng.choice(WORDS) for _ in range(rng.randint(1, 4)))
+            stream.append({"t": t, "type": "message", "member": member, "room": position[member], "content": content})
+            continue
+
+        member = rng.randrange(members)
+        before = position.get(member)
+        if before is None:
+            after = rng.randrange(rooms)
+        elif rng.random() < 0.5:
+            after = None
+        else:
+            after = rng.choice([r for r in range(rooms) if r != before] or [None])
+        if after is None:
+            position.pop(member, None)
+        else:
+            position[member] = after
+        stream.append({"t": t, "type": "voice", "member": member, "before": before, "after": after})
+    return {"world": world, "events": stream}
+
+
+def save_stream(stream, path):
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with path.open("w", encoding="utf-8") as f:
+        f.write(json.dumps({"type": "world", **stream["world"]}, ensure_ascii=False) + "\n")
+        for event in stream["events"]:
+            f.write(json.dumps(event, ensure_ascii=False) + "\n")
+
+
+def load_stream(path):
+    """1行目がワールド定義、以降が1行1イベントの JSONL を読み込む"""
+    with open(path, encoding="utf-8") as f:
+        lines = [json.loads(line) for line in f if line.strip()]
+    if not lines or lines[0].get("type") != "world":
+        raise ValueError(f"{path}: 1行目に world 定義がありません")
+    world = {key: value for key, value in lines[0].items() if key != "type"}
+    return {"world": world, "events": lines[1:]}
+
+
+# ---------- 再生 ----------
+def percentile(values, q):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(q / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+class Replayer:
+    def __init__(self, stream, http, coalesce_window=0.2):
+        self.stream = stream
+        self.http = http
+        self.coalesce_window = coalesce_window
+        self.latencies = defaultdict(list)  # {イベント種別: [秒]}
+        self.errors = 0
+
+    def build_world(self):
+        guild = FakeGuild(self.http)
+        voice_category = guild.add_category("ボイス")
+        self.rooms = [guild.add_voice_channel(name, voice_category) for name in self.stream["world"]["rooms"]]
+        self.members = [guild.add_member(name) for name in self.stream["world"]["members"]]
+        guild.add_category(CATEGORY_NAME)
+
+        # プロフィール投稿（半数のメンバーに1件ずつ）
+        profile_category = guild.add_category("プロフィール")
+        for channel_id in MESSAGE_SOURCE_CHANNEL_IDS:
+            channel = guild.add_text_channel("プロフィール", profile_category, channel_id=channel_id)
+            for member in self.members[::2]:
+                channel._append(FakeMessage(channel, member, "よろしくおねがいします"))
+        return guild
+
+    async def setup_bot(self, guild):
+        bot = commands.Bot(command_prefix="!", intents=intents)
+        bot._connection.user = guild.me
+        bot._connection._guilds[guild.id] = guild
+        guild._state = bot._connection
+        for cog in COGS:
+            await bot.load_extension(cog)
+        bot.get_cog("VoiceEventsCog").coalescer.window = self.coalesce_window
+        return bot
+
+    async def dispatch(self, bot, event_name, *args):
+        """bot.dispatch と同じリスナー（add_listener / Cog.listener）を呼び、完了を待つ"""
+        listeners = bot.extra_events.get(f"on_{event_name}", [])
+        results = await asyncio.gather(*(listener(*args) for listener in listeners), return_exceptions=True)
+        for result in results:
+            if isinstance(result, Exception):
+                self.errors += 1
+                print(f"[BENCH] on_{event_name} で例外: {result!r}")
+
+    async def run_event(self, bot, guild, event):
+        member = self.members[event["member"]]
+        if event["type"] == "message":
+            room = self.rooms[event["room"]]
+            message = FakeMessage(room, member, event["content"])
+            room._append(message)  # ゲートウェイ同様、届いた時点でチャンネルにある
+            args = ("message", message)
+        else:
+            after = self.rooms[event["after"]] if event["after"] is not None else None
+            before, after_state = guild.set_voice_channel(member, after)
+            args = ("voice_state_update", member, before, after_state)
+
+        started = time.perf_counter()
+        await self.dispatch(bot, *args)
+        self.latencies[event["type"]].append(time.perf_counter() - started)
+
+    async def drain(self, bot):
+        """まとめ送信・転記キュー・空室削除が終わるまで待つ"""
+        voice_cog = bot.get_cog("VoiceEventsCog")
+        await voice_cog.coalescer.flush_all()
+        relay_queue = bot.relay_queue
+        idle_since = None
+        while True:
+            busy = relay_queue.queue_depth() or self.http.in_flight or any(not t.done() for t in voice_cog.purge_tasks.values())
+            if busy:
+                idle_since = None
+            elif idle_since is None:
+                idle_since = time.perf_counter()
+            elif time.perf_counter() - idle_since > relay_queue.batch_window * 2:
+                break
+            await asyncio.sleep(0.05)
+        await relay_queue.close()
+        await voice_cog.profile_message_map._store.close()
+
+    async def run(self):
+        guild = self.build_world()
+        bot = await self.setup_bot(guild)
+        await self.dispatch(bot, "ready")
+        await bot.get_cog("VoiceEventsCog").profile_index.ready.wait()
+        setup_calls = self.http.total_calls
+        self.http.calls.clear()
+
+        events = self.stream["events"]
+        tasks = []
+        started = time.perf_counter()
+        for event in events:
+            delay = started + event.get("t", 0.0) - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            tasks.append(asyncio.create_task(self.run_event(bot, guild, event)))
+        await asyncio.gather(*tasks)
+        handled = time.perf_counter() - started
+        await self.drain(bot)
+        drained = time.perf_counter() - started
+
+        all_latencies = [value for values in self.latencies.values() for value in values]
+        return {
+            "events": len(events),
+            "errors": self.errors,
+            "handled_seconds": handled,
+            "drained_seconds": drained,
+            "events_per_second": len(events) / handled if handled else 0.0,
+            "latency_ms": {
+                kind: {
+                    "count": len(values),
+                    "p50": percentile(values, 50) * 1000,
+                    "p99": percentile(values, 99) * 1000,
+                    "max": max(values) * 1000,
+                }
+                for kind, values in sorted({**self.latencies, "all": all_latencies}.items()) if values
+            },
+            "rest_calls": self.http.total_calls,
+            "rest_calls_per_event": self.http.total_calls / len(events) if events else 0.0,
+            "rest_calls_by_route": dict(self.http.calls.most_common()),
+            "rate_limited": self.http.rate_limited,
+            "setup_rest_calls": setup_calls,
+            "relay": {key: bot.relay_queue.stats()[key] for key in ("sent_batches", "sent_embeds")},
+            "channel_cache": bot.channel_manager.cache_stats(),
+        }
+
+
+def print_report(report):
+    print(f"イベント数        : {report['events']}（例外 {report['errors']} 件）")
+    print(f"処理時間          : {report['handled_seconds']:.2f}s（送信完了まで {report['drained_seconds']:.2f}s）")
+    print(f"処理件数/秒       : {report['events_per_second']:.1f}")
+    print("ハンドラー待ち時間 (ms):")
+    for kind, stats in report["latency_ms"].items():
+        print(f"  {kind:<8} n={stats['count']:<6} p50={stats['p50']:8.2f}  p99={stats['p99']:8.2f}  max={stats['max']:8.2f}")
+    print(f"REST 呼び出し     : {report['rest_calls']} 回（1イベントあたり {report['rest_calls_per_event']:.3f} 回、429 {report['rate_limited']} 回）")
+    for route, count in report["rest_calls_by_route"].items():
+        print(f"  {route:<16} {count}")
+    print(f"転記              : {report['relay']['sent_embeds']} embed / {report['relay']['sent_batches']} 回の送信")
+    cache = report["channel_cache"]
+    print(f"チャンネルキャッシュ: ヒット率 {cache.get('hit_rate', 0.0):.1%}")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="ゲートウェイイベントを再生して Cog の性能を測る")
+    parser.add_argument("--replay", help="再生する JSONL ファイル（省略時は合成）")
+    parser.add_argument("--record", help="合成したイベント列の保存先")
+    parser.add_argument("--rooms", type=int, default=8)
+    parser.add_argument("--members", type=int, default=60)
+    parser.add_argument("--events", type=int, default=2000)
+    parser.add_argument("--rate", type=float, default=200.0, help="1秒あたりのイベント数（0 なら一斉に流す）")
+    parser.add_argument("--message-ratio", type=float, default=0.85)
+    parser.add_argument("--latency", type=float, default=0.05, help="REST 呼び出しの平均遅延（秒）")
+    parser.add_argument("--jitter", type=float, default=0.02)
+    parser.add_argument("--rate-limit-ratio", type=float, default=0.01, help="429 を返す割合")
+    parser.add_argument("--retry-after", type=float, default=0.5)
+    parser.add_argument("--coalesce", type=float, default=0.2, help="入退室をまとめる秒数")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", action="store_true", help="結果を JSON で出力")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    if args.replay:
+        stream = load_stream(args.replay)
+    else:
+        stream = synthesize(args.rooms, args.members, args.events, args.rate, args.message_ratio, args.seed)
+        if args.record:
+            save_stream(stream, args.record)
+
+    http = FakeHTTP(args.latency, args.jitter, args.rate_limit_ratio, args.retry_after, seed=args.seed)
+    replayer = Replayer(stream, http, coalesce_window=args.coalesce)
+
+    # 永続ストア（zero_bot.db など）は一時ディレクトリに作る
+    with tempfile.TemporaryDirectory() as workdir:
+        cwd = os.getcwd()
+        os.chdir(workdir)
+        try:
+            report = asyncio.run(replayer.run())
+        finally:
+            os.chdir(cwd)
+
+    if args.json:
+        print(json.dumps(report, ensure_ascii=False, indent=2))
+    else:
+        print_report(report)
+
+
+if __name__ == "__main__":
+    main()
@@ -3,58 +3,123 @@ from discord.ext import commands
 import os
 import asyncio
 from dotenv import load_dotenv
-from config import TOKEN, intents
-from utils.channel_manager import ChannelManager
+from config import TOKEN, intents, BOT_SHARDED, BOT_SHARD_COUNT, BOT_SHARD_IDS, FORCE_COMMAND_SYNC
+from utils.channel_manager import get_channel_manager
+from utils.kv_store import get_state_store
+from utils.relay_queue import get_relay_queue
+from utils.search_index import get_search_index
+from utils.jobs import get_job_dispatcher
+from utils.logging_setup import setup_logging, shutdown_logging
+from utils.command_sync import sync_command_tree
+from utils.startup_timer import StartupTimer
 
 load_dotenv()
 
-bot = commands.Bot(command_prefix="!", intents=intents)
-channel_manager = ChannelManager(bot)  # ✅ ChannelManager を初期化
+startup = StartupTimer()  # ✅ 起動時間の内訳（on_ready で表示）
 
-async def load_cogs():
-    """Cogをロード"""
-    for cog in [
-        # ✅ 設定は一番最初にロード（他のCogが設定を参照できるように）
-        # "cogs.config_loader",
-        "cogs.oyanmo",
-        "cogs.voice_events",
-        "cogs.message_handler",
-        "cogs.archive_manager",  # ✅ ArchiveManager を追加
-        # "cogs.ogiri",
-    ]:
-        try:
+if BOT_SHARDED:
+    # ✅ シャードごとにゲートウェイ接続を分ける（Cog はギルド単位で状態を持つのでそのまま動く）
+    bot = commands.AutoShardedBot(command_prefix="!", intents=intents, shard_count=BOT_SHARD_COUNT, shard_ids=BOT_SHARD_IDS)
+else:
+    bot = commands.Bot(command_prefix="!", intents=intents)
+channel_manager = get_channel_manager(bot)  # ✅ 全Cogで共有する ChannelManager を初期化
+
+# ✅ 設定は一番最初にロード（他のCogが設定を参照できるように）
+PRIORITY_COGS = [
+    # "cogs.config_loader",
+]
+
+# 互いに依存しないので並列にロードする
+COGS = [
+    "cogs.oyanmo",
+    "cogs.voice_events",
+    "cogs.message_handler",
+    "cogs.archive_manager",  # ✅ ArchiveManager を追加
+    "cogs.search",  # ✅ 転記メッセージの検索（SEARCH_INDEX=True のとき有効）
+    "cogs.stats",  # ✅ メトリクス（/stats・METRICS_PORT）
+    # "cogs.ogiri",
+]
+
+async def load_cog(cog):
+    try:
+        with startup.measure(f"Cog {cog}"):
             await bot.load_extension(cog)
-            print(f"✅ Cog {cog} がロードされました。")
-        except Exception as e:
-            print(f"❌ Cog {cog} のロードに失敗: {e}")
+        print(f"✅ Cog {cog} がロードされました。")
+    except Exception as e:
+        print(f"❌ Cog {cog} のロードに失敗: {e}")
+
+async def load_cogs():
+    """Cogをロード（PRIORITY_COGS を順に読み込んでから、残りを並列に）"""
+    with startup.measure("Cog の読み込み（全体）"):
+        for cog in PRIORITY_COGS:
+            await load_cog(cog)
+        await asyncio.gather(*(load_cog(cog) for cog in COGS))
 
 @bot.event
 async def setup_hook():
     """Bot の起動時に非同期処理を実行"""
-    await channel_manager.start_cleanup_task()
-    print("✅ キャッシュクリアタスクを開始")
+    with startup.measure("setup_hook"):
+        await channel_manager.start_cleanup_task()
+        print("✅ キャッシュクリアタスクを開始")
+        job_dispatcher = get_job_dispatcher(bot)
+        if job_dispatcher is not None:
+            job_dispatcher.start()  # ✅ アーカイブ・メッセージ削除は別プロセスで実行
+            print("✅ ワーカープロセスを開始")
 
 @bot.event
 async def on_ready():
     """Bot がログインしたときの処理"""
     print(f"✅ {bot.user} がログインしました！")
+    startup.end("ログイン → on_ready")
     try:
-        synced = await bot.tree.sync()
-        print(f"🌍 スラッシュコマンドが {len(synced)} 個同期されました。")
+        # ✅ コマンド定義のハッシュが前回と同じなら同期しない（再接続のたびに REST を呼ばない）
+        # Discord 側の登録が食い違ったときは FORCE_COMMAND_SYNC=True で起動すると必ず同期する
+        with startup.measure("スラッシュコマンド同期"):
+            synced = await sync_command_tree(bot, force=FORCE_COMMAND_SYNC)
+        if synced is None:
+            print("🌍 スラッシュコマンドに変更がないため、同期をスキップしました。")
+        else:
+            print(f"🌍 スラッシュコマンドが {synced} 個同期されました。")
     except Exception as e:
         print(f"❌ スラッシュコマンドの同期に失敗: {e}")
 
+    report = startup.finish()
+    if report is not None:
+        print(report)
+
+@bot.event
+async def on_shard_ready(shard_id):
+    print(f"✅ シャード {shard_id} の準備ができました。")
+
+@bot.event
+async def on_shard_disconnect(shard_id):
+    print(f"⚠ シャード {shard_id} が切断されました。")
+
 @bot.event
 async def on_shutdown():
     """Bot の終了時にキャッシュクリーンアップタスクを停止"""
     print("🛑 Bot のシャットダウンを検知、クリーンアップを開始します...")
     await channel_manager.stop_cleanup_task()
     print("✅ キャッシュクリーンアップタスクを停止しました。")
+    await get_relay_queue(bot).close()
+    job_dispatcher = get_job_dispatcher(bot)
+    if job_dispatcher is not None:
+        await job_dispatcher.close()
+        print("✅ ワーカープロセスを停止しました。")
+    search_index = get_search_index(bot)
+    if search_index is not None:
+        await search_index.close()
+    await get_state_store().close()
+    print("✅ 永続ストアの未保存データを書き込みました。")
+    shutdown_logging()
 
 async def main():
+    with startup.measure("ログ設定"):
+        setup_logging()  # ✅ ログはキュー経由で別スレッドが書き込む
     try:
         async with bot:
             await load_cogs()
+            startup.begin("ログイン → on_ready")
             await bot.start(TOKEN)
     except KeyboardInterrupt:
         print("\n🛑 Bot が手動で停止されました！")
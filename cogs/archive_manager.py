@@ -1,18 +1,93 @@
 import discord
 from discord import app_commands
-from discord.ext import commands
+from discord.ext import commands, tasks
 import datetime
 import pytz
 import re
-import os
 import asyncio
-from config import CATEGORY_NAME, debug_log
+from utils.archive_pipeline import ArchivePipeline
+from utils.channel_manager import get_channel_manager
+from utils.channel_deleter import ChannelDeleteExecutor, ProgressMessage
+from utils.jobs import get_job_dispatcher
+from utils.logging_setup import get_logger
+from config import CATEGORY_NAME
+
+logger = get_logger("archive")
 
 jst = pytz.timezone("Asia/Tokyo")
+# tasks.loop 用（pytz のタイムゾーンは time と組み合わせると LMT になるため固定オフセットを使う）
+JST_FIXED = datetime.timezone(datetime.timedelta(hours=9))
+ARCHIVE_TIME = datetime.time(hour=23, minute=45, tzinfo=JST_FIXED)
 
 class ArchiveManagerCog(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
+        self.pipeline = None  # 書き出し → バンドル → アップロード（cog_load で用意）
+        self.archive_lock = asyncio.Lock()  # 定期実行と手動実行の重複を防ぐ
+
+    async def cog_load(self):
+        # エクスポート状態のファイル読み込みはスレッドで（他の Cog のロードを止めない）
+        self.pipeline = await asyncio.to_thread(ArchivePipeline)
+        self.nightly_archive.start()
+
+    async def cog_unload(self):
+        self.nightly_archive.cancel()
+
+    def dated_channels_before(self, guild, date_str, inclusive=False):
+        """`date_str` より前の日付付きテキストチャンネルを [(日付, チャンネル)] で日付順に返す"""
+        manager = get_channel_manager(self.bot)
+        if guild.id not in manager.indexed_guilds:
+            manager.index_guild(guild)
+        return manager.archive_catalog.before(guild.id, date_str, inclusive=inclusive)
+
+    async def export_archives(self):
+        """今日より前の日付付きチャンネルを Markdown に書き出す（書き出し済みはスキップ）"""
+        async with self.archive_lock:
+            today_date = datetime.datetime.now(jst).strftime("%Y%m%d")
+            targets = [
+                (date_str, guild.id, channel.id, channel.name)
+                for guild in self.bot.guilds
+                for date_str, channel in self.dated_channels_before(guild, today_date)
+            ]
+
+            dispatcher = get_job_dispatcher(self.bot)
+            if dispatcher is not None:
+                # ✅ 書き出し・アップロードはワーカープロセスで実行（ゲートウェイの応答に影響させない）
+                return await dispatcher.run("archive", targets=targets)
+            return await self.pipeline.run(targets, self._get_channel)
+
+    async def _get_channel(self, channel_id):
+        return self.bot.get_channel(channel_id)
+
+    @tasks.loop(time=ARCHIVE_TIME)
+    async def nightly_archive(self):
+        """毎日 23:45 にアーカイブを書き出す"""
+        # 例外がループの外に出ると tasks.loop が止まり、翌日以降も実行されなくなる
+        try:
+            exported = await self.export_archives()
+        except Exception:
+            logger.exception("[ARCHIVE] 定期アーカイブに失敗しました")
+            return
+        logger.info("📁 アーカイブを %d 件書き出しました。", len(exported))
+
+    @nightly_archive.before_loop
+    async def before_nightly_archive(self):
+        await self.bot.wait_until_ready()
+
+    @app_commands.command(name="archive_export", description="管理者用：アーカイブの書き出しを今すぐ実行")
+    async def archive_export(self, interaction: discord.Interaction):
+        if not interaction.user.guild_permissions.administrator:
+            await interaction.response.send_message("⛔ このコマンドは管理者のみ実行可能です。", ephemeral=True)
+            return
+
+        await interaction.response.defer(ephemeral=True)
+        try:
+            exported = await self.export_archives()
+        except Exception as e:
+            logger.exception("[ARCHIVE] /archive_export に失敗しました")
+            await interaction.followup.send(f"❌ アーカイブの書き出しに失敗しました: {e}", ephemeral=True)
+            return
+        await interaction.followup.send(f"📁 `{len(exported)}` 件のアーカイブを書き出しました。", ephemeral=True)
 
     @app_commands.command(name="manage_comment", description="管理者用コマンド")
     @app_commands.describe(date="（yyyymmdd）")
@@ -31,29 +106,19 @@ class ArchiveManagerCog(commands.Cog):
             return
 
         try:
-            threshold_date = datetime.datetime.strptime(date, "%Y%m%d").replace(tzinfo=jst)
+            datetime.datetime.strptime(date, "%Y%m%d")
         except ValueError:
             await interaction.response.send_message("❌ 無効な日付です。正しい `yyyymmdd` 形式で指定してください。", ephemeral=True)
             return
 
-        debug_log(f"[DELETE ARCHIVE] `{date}` 以前のアーカイブチャンネルを削除します")
+        logger.debug("[DELETE ARCHIVE] `%s` 以前のアーカイブチャンネルを削除します", date)
 
-        category = discord.utils.get(guild.categories, name=CATEGORY_NAME)
-        if category is None:
+        if get_channel_manager(self.bot).category_index.get(guild.id) is None:
             await interaction.response.send_message(f"⚠ `{CATEGORY_NAME}` カテゴリーが見つかりません。", ephemeral=True)
             return
 
-        channels_to_delete = []
-        for channel in category.text_channels:
-            match = re.match(r"^(\d{8})_", channel.name)
-            if match:
-                channel_date_str = match.group(1)
-                try:
-                    channel_date = datetime.datetime.strptime(channel_date_str, "%Y%m%d").replace(tzinfo=jst)
-                    if channel_date <= threshold_date:
-                        channels_to_delete.append(channel)
-                except ValueError:
-                    continue
+        # ✅ カタログから二分探索で取得（チャンネル名を毎回解析しない）
+        channels_to_delete = [channel for _, channel in self.dated_channels_before(guild, date, inclusive=True)]
 
         if not channels_to_delete:
             await interaction.response.send_message(f"✅ `{date}` 以前の削除対象チャンネルはありませんでした。", ephemeral=True)
@@ -90,19 +155,56 @@ class DeleteConfirmView(discord.ui.View):
             await interaction.followup.send("❌ 実行者のみが削除を確定できます。", ephemeral=True)
             return
 
-        deleted_count = 0
-        for channel in self.channels_to_delete:
+        self.stop()
+        await self.delete_original_message()  # ✅ 確認メッセージを削除
+
+        # 進捗はチャンネルに直接送ったメッセージを編集する（インタラクションの期限に依存しない）
+        channels = list(self.channels_to_delete)
+        progress_channel = interaction.channel
+        progress = None
+        try:
+            progress_msg = await progress_channel.send(f"🗑 `{len(channels)}` 件のアーカイブチャンネルを削除します…")
+            progress = ProgressMessage(progress_msg)
+        except (discord.HTTPException, AttributeError):
+            progress_msg = None
+
+        # 実行中のチャンネル自体が対象なら最後に削除する
+        last = [channel for channel in channels if progress_channel and channel.id == progress_channel.id]
+        channels = [channel for channel in channels if channel not in last]
+
+        executor = ChannelDeleteExecutor()
+        summary = await executor.delete_channels(channels, progress=progress, reason=f"/manage_comment by {interaction.user}")
+
+        failed = summary["failed"]
+        # 件数は実際に削除できたものだけ数える（実行中のチャンネルは結果の送信後に削除する）
+        lines = [f"✅ `{len(summary['succeeded'])}` 件のアーカイブチャンネルを削除しました。"]
+        if summary["already_deleted"]:
+            lines.append(f"ℹ `{len(summary['already_deleted'])}` 件は既に削除されていました。")
+        if last:
+            lines.append("🗑 このチャンネルも削除対象のため、最後に削除します。")
+        if failed:
+            lines.append(f"⚠ `{len(failed)}` 件は削除できませんでした:")
+            lines += [f"- `{name}`: {reason}" for name, reason in failed[:20]]
+            if len(failed) > 20:
+                lines.append(f"…ほか `{len(failed) - 20}` 件")
+        result_text = "\n".join(lines)
+
+        if progress_msg is not None and not last:
+            await progress.update(result_text, force=True)
+        else:
             try:
-                await channel.delete()
-                deleted_count += 1
-                debug_log(f"[ARCHIVE DELETED] {channel.name} を削除しました。")
-            except discord.Forbidden:
-                await self.interaction.followup.send(f"❌ `{channel.name}` の削除権限がありません。")
-            except Exception as e:
-                debug_log(f"⚠ {channel.name} の削除に失敗: {e}")
+                await interaction.followup.send(result_text)
+            except discord.HTTPException:
+                pass
 
-        await self.delete_original_message()  # ✅ 確認メッセージを削除
-        await interaction.followup.send(f"✅ `{deleted_count}` 件のアーカイブチャンネルを削除しました。")
+        if last:
+            last_summary = await executor.delete_channels(last)
+            for name, reason in last_summary["failed"]:
+                logger.debug("⚠ %s の削除に失敗: %s", name, reason)
+                try:
+                    await progress_channel.send(f"⚠ このチャンネル（`{name}`）は削除できませんでした: {reason}")
+                except discord.HTTPException:
+                    pass
 
     @discord.ui.button(label="キャンセル", style=discord.ButtonStyle.secondary)
     async def cancel_delete(self, interaction: discord.Interaction, button: discord.ui.Button):
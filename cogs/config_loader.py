@@ -1,15 +1,44 @@
 import os
 import json
+import asyncio
+import copy
+import hashlib
+import inspect
+from functools import lru_cache
 import discord
 from discord.ext import commands
 
+_MISSING = object()
+
+
+@lru_cache(maxsize=256)
+def compile_path(path: str) -> tuple:
+    """"a.b.c" → ("a", "b", "c")（同じパスは1回だけ分割する）"""
+    return tuple(path.split("."))
+
+
 class ConfigStore:
-    """どこからでも参照できるグローバル設定ストア"""
+    """どこからでも参照できるグローバル設定ストア
+
+    - 同じ内容（ハッシュが一致）の再読込は JSON をパースしない
+    - get() の結果はパスごとに覚えておき、設定が変わったときだけ捨てる
+    - subscribe() したコールバックに変更を通知する（同期関数・コルーチン関数どちらでも可）
+    - get() が dict / list を返すときはコピーを渡す（呼び出し側で変更してもキャッシュは壊れない）
+    """
     def __init__(self) -> None:
         self.data: dict = {}
         self.version: int | None = None
+        self.content_hash: str | None = None
+        self._cache: dict = {}
+        self._subscribers: list = []
+        self._tasks: set = set()  # コルーチンの購読者のタスク（完了まで参照を保持する）
+
+    def load_from_text(self, text: str) -> bool:
+        """設定を読み込む。内容が変わっていれば True を返す"""
+        content_hash = hashlib.sha256(text.encode("utf-8")).hexdigest()
+        if content_hash == self.content_hash:
+            return False
 
-    def load_from_text(self, text: str) -> None:
         cfg = json.loads(text)
 
         # 必須キーの軽い検証（必要に応じて拡張してね）
@@ -18,17 +47,64 @@ class ConfigStore:
             if k not in cfg:
                 raise ValueError(f"config missing key: {k}")
 
+        old = self.data
         self.data = cfg
         self.version = cfg.get("version")
+        self.content_hash = content_hash
+        self._cache.clear()
+        self._notify(old, cfg)
+        return True
 
     def get(self, path: str, default=None):
+        value = self._cache.get(path, _MISSING)
+        if value is _MISSING:
+            value = self._resolve(compile_path(path))
+            self._cache[path] = value
+        if value is _MISSING:
+            return default
+        return copy.deepcopy(value) if isinstance(value, (dict, list)) else value
+
+    def _resolve(self, parts: tuple):
         cur = self.data
-        for part in path.split("."):
+        for part in parts:
             if not isinstance(cur, dict) or part not in cur:
-                return default
+                return _MISSING
             cur = cur[part]
         return cur
 
+    def accessor(self, path: str, default=None):
+        """パスを事前に分割した取得関数を返す（呼び出しごとの split をなくす）"""
+        compile_path(path)
+        return lambda: self.get(path, default)
+
+    def subscribe(self, callback):
+        """設定変更時に callback(old, new) を呼ぶ（デコレータとしても使える）"""
+        self._subscribers.append(callback)
+        return callback
+
+    def unsubscribe(self, callback) -> None:
+        if callback in self._subscribers:
+            self._subscribers.remove(callback)
+
+    def _notify(self, old: dict, new: dict) -> None:
+        for callback in list(self._subscribers):
+            try:
+                result = callback(old, new)
+                if inspect.isawaitable(result):
+                    task = asyncio.ensure_future(result)
+                    self._tasks.add(task)
+                    task.add_done_callback(lambda t, cb=callback: self._on_task_done(t, cb))
+            except Exception as e:
+                print(f"[CONFIG] subscriber {callback!r} failed: {e}")
+
+    def _on_task_done(self, task: asyncio.Future, callback) -> None:
+        self._tasks.discard(task)
+        if task.cancelled():
+            return
+        e = task.exception()
+        if e is not None:
+            print(f"[CONFIG] subscriber {callback!r} failed: {e}")
+
 # 他のCogから: from cogs.config_loader import config_store
 config_store = ConfigStore()
 
@@ -38,40 +114,79 @@ class ConfigLoader(commands.Cog):
     #bot-config（等）のピン留め/直近メッセージ or 添付JSON を読み込む
     - 起動時に自動ロード（失敗してもBotは落とさない）
     - /config reload で再読込
+    - 読み込んだメッセージの編集・ピン留めの変更で自動的に再読込
     """
     def __init__(self, bot: commands.Bot, config_channel_id: int) -> None:
         self.bot = bot
         self.config_channel_id = config_channel_id
+        self.source_message_id: int | None = None  # 設定を読み込んだメッセージ
+        self._attachment_id: int | None = None  # 読み込んだ添付（同じIDなら内容も同じ）
+        self._lock = asyncio.Lock()
 
-    async def _fetch_config_text(self) -> str:
+    async def _config_channel(self) -> discord.TextChannel:
         ch = self.bot.get_channel(self.config_channel_id) or await self.bot.fetch_channel(self.config_channel_id)
         if not isinstance(ch, discord.TextChannel):
             raise RuntimeError("Config channel not found or not a text channel")
+        return ch
+
+    async def _config_text_from(self, m: discord.Message) -> tuple[str | None, int | None]:
+        """メッセージ本文 or 添付JSON から (設定テキスト, 添付ID) を取り出す
+
+        設定がなければテキストは ""、前回読み込んだ添付と同じなら None。
+        """
+        # 本文がJSONなら採用
+        try:
+            json.loads(m.content)
+            return m.content, None
+        except Exception:
+            pass
+
+        # JSONファイル添付があれば採用（前回と同じ添付ならダウンロードしない）
+        for a in m.attachments:
+            if a.filename.lower().endswith(".json"):
+                if a.id == self._attachment_id:
+                    return None, a.id
+                raw = await a.read()
+                return raw.decode("utf-8"), a.id
+        return "", None
+
+    async def _fetch_config_text(self) -> tuple[discord.Message, str | None, int | None]:
+        ch = await self._config_channel()
+
+        # 0) 前回読み込んだメッセージが残っていればそれだけを取得
+        if self.source_message_id is not None:
+            try:
+                m = await ch.fetch_message(self.source_message_id)
+                text, attachment_id = await self._config_text_from(m)
+                if text != "":
+                    return m, text, attachment_id
+            except discord.NotFound:
+                pass
+            self.source_message_id = None
 
         # 1) ピン留めを優先
         pins = await ch.pins()
         candidates = pins if pins else [m async for m in ch.history(limit=50)]
 
         for m in candidates:
-            # 本文がJSONなら採用
-            try:
-                json.loads(m.content)
-                return m.content
-            except Exception:
-                pass
-
-            # JSONファイル添付があれば採用
-            for a in m.attachments:
-                if a.filename.lower().endswith(".json"):
-                    raw = await a.read()
-                    return raw.decode("utf-8")
+            text, attachment_id = await self._config_text_from(m)
+            if text != "":
+                return m, text, attachment_id
 
         raise RuntimeError("No valid JSON config found in the channel")
 
     async def load(self) -> str:
-        text = await self._fetch_config_text()
-        config_store.load_from_text(text)
-        return f"config loaded (version={config_store.version})"
+        async with self._lock:
+            m, text, attachment_id = await self._fetch_config_text()
+            self.source_message_id = m.id
+            if text is None:
+                return f"config unchanged (version={config_store.version})"
+            changed = config_store.load_from_text(text)
+            # 読み込めた添付だけを覚える（不正な添付は次回も読み直してエラーを報告する）
+            self._attachment_id = attachment_id
+            if not changed:
+                return f"config unchanged (version={config_store.version})"
+            return f"config loaded (version={config_store.version})"
 
     @commands.hybrid_command(description="設定JSONを再読込します")
     @commands.has_permissions(manage_guild=True)
@@ -82,6 +197,13 @@ class ConfigLoader(commands.Cog):
         except Exception as e:
             await ctx.reply(f"config reload failed: {e}", mention_author=False)
 
+    async def _auto_reload(self, reason: str) -> None:
+        try:
+            msg = await self.load()
+            print(f"[CONFIG] {msg} ({reason})")
+        except Exception as e:
+            print(f"[CONFIG] reload failed ({reason}): {e}")
+
     @commands.Cog.listener()
     async def on_ready(self):
         # 起動時に読み込み（失敗はログのみ）
@@ -91,6 +213,20 @@ class ConfigLoader(commands.Cog):
         except Exception as e:
             print(f"[CONFIG] initial load failed: {e}")
 
+    @commands.Cog.listener()
+    async def on_raw_message_edit(self, payload: discord.RawMessageUpdateEvent):
+        # キャッシュにないメッセージの編集も拾えるよう raw イベントで受ける
+        if payload.channel_id == self.config_channel_id and payload.message_id == self.source_message_id:
+            await self._auto_reload("message edited")
+
+    @commands.Cog.listener()
+    async def on_guild_channel_pins_update(self, channel, last_pin):
+        if channel.id != self.config_channel_id:
+            return
+        # ピン留めが変わったら読み込み元を選び直す
+        self.source_message_id = None
+        await self._auto_reload("pins updated")
+
 
 async def setup(bot: commands.Bot):
     # .env などから設定チャンネルIDを取得（未設定なら0→スキップ）
@@ -1,85 +1,68 @@
 import discord
-import datetime
 import pytz
-import os
-import logging
 from discord.ext import commands
-from utils.channel_manager import ChannelManager
-from config import debug_log, EXCLUDED_CATEGORY_IDS
+from utils.channel_manager import get_channel_manager
+from utils.relay_queue import get_relay_queue
+from utils.logging_setup import get_logger
+from utils.search_index import get_search_index
+from utils.metrics import timed_handler
+from config import EXCLUDED_CATEGORY_IDS
 
 # タイムゾーン設定
 jst = pytz.timezone("Asia/Tokyo")
 
-# ログ保存ディレクトリとファイルパス
-log_dir = "log"
-os.makedirs(log_dir, exist_ok=True)
-today_str = datetime.datetime.now(jst).strftime("%Y%m%d")
-log_file_path = os.path.join(log_dir, f"message_handler_{today_str}.log")
-
-# ログローテート処理（3日より古いログを削除）
-for fname in os.listdir(log_dir):
-    if fname.startswith("message_handler_") and fname.endswith(".log"):
-        try:
-            date_str = fname.replace("message_handler_", "").replace(".log", "")
-            file_date = datetime.datetime.strptime(date_str, "%Y%m%d")
-            if (datetime.datetime.now(jst) - file_date).days > 2:
-                os.remove(os.path.join(log_dir, fname))
-        except Exception:
-            continue
-
-# ログ設定（ファイル出力）
-logger = logging.getLogger("message_handler")
-logger.setLevel(logging.INFO)
-
-# 重複防止
-if not logger.handlers:
-    file_handler = logging.FileHandler(log_file_path, encoding="utf-8")
-    formatter = logging.Formatter('[%(asctime)s] %(levelname)s - %(message)s')
-    file_handler.setFormatter(formatter)
-    logger.addHandler(file_handler)
+# ログ（出力先・ローテーションは utils.logging_setup で一括管理）
+logger = get_logger("message_handler")
 
 class MessageHandlerCog(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
-        self.channel_manager = ChannelManager(bot)
+        self.channel_manager = get_channel_manager(bot)  # ✅ 全Cogで共有
+        self.relay_queue = get_relay_queue(bot)  # ✅ 転記先チャンネルごとにまとめて送信（全Cogで共有）
+        self.search_index = get_search_index(bot)  # ✅ /search 用のローカル索引（無効なら None）
 
     def is_excluded(self, channel):
         """チャンネルが除外カテゴリーに属しているかを確認"""
         return channel and channel.category and channel.category.id in EXCLUDED_CATEGORY_IDS
 
     @commands.Cog.listener()
+    @timed_handler("on_message")
     async def on_message(self, message):
         """ボイスチャンネルのテキストチャットのメッセージのみ転記"""
-        now = datetime.datetime.now(jst).strftime("%Y-%m-%d %H:%M:%S")
-
-        logger.info(f"[MESSAGE][{message.channel.name}][{message.author.display_name}] {message.content}")
+        log_extra = {
+            "guild_id": message.guild.id if message.guild else None,
+            "channel_id": message.channel.id,
+            "user_id": message.author.id,
+            "message_id": message.id,
+        }
+        logger.info("[MESSAGE][%s][%s] %s", message.channel.name, message.author.display_name, message.content, extra=log_extra)
         image_urls = [attachment.url for attachment in message.attachments]
         if image_urls:
-            logger.info(f"[IMAGE][{message.channel.name}][{message.author.display_name}] {image_urls[0]}")
+            logger.info("[IMAGE][%s][%s] %s", message.channel.name, message.author.display_name, image_urls[0], extra=log_extra)
 
-        # debug_log(f"{now} - on_message: {message.author.display_name} ({message.author.id})")
-        # debug_log(f"    チャンネル: {message.channel.name} ({message.channel.id})")
-        # debug_log(f"    メッセージ: {message.content}")
+        # logger.debug("on_message: %s (%s)", message.author.display_name, message.author.id)
+        # logger.debug("    チャンネル: %s (%s)", message.channel.name, message.channel.id)
+        # logger.debug("    メッセージ: %s", message.content)
 
         if message.author.bot:
-            # debug_log(f"{message.author.display_name} のメッセージはBOTのため無視")
+            # logger.debug("%s のメッセージはBOTのため無視", message.author.display_name)
             return
 
         guild = message.guild
         if guild is None:
-            debug_log("ギルド情報が取得できないため無視")
+            logger.debug("ギルド情報が取得できないため無視")
             return
 
         if not isinstance(message.channel, discord.VoiceChannel):
-            debug_log(f"{message.channel.name} はボイスチャンネルではないため無視")
+            logger.debug("%s はボイスチャンネルではないため無視", message.channel.name)
             return
 
         if self.is_excluded(message.channel):
-            debug_log(f"[SKIP] `{message.channel.name}` は除外カテゴリー (`{message.channel.category.id}`) に属するため無視")
+            logger.debug("[SKIP] `%s` は除外カテゴリー (`%s`) に属するため無視", message.channel.name, message.channel.category.id)
             return
 
         target_channel = await self.channel_manager.get_or_create_text_channel(guild, message.channel)
-        debug_log(f"転記先チャンネル: {target_channel.name} ({target_channel.id})")
+        logger.debug("転記先チャンネル: %s (%s)", target_channel.name, target_channel.id)
 
         message_time_jst = message.created_at.replace(tzinfo=pytz.utc).astimezone(jst).strftime("%Y/%m/%d %H:%M:%S")
 
@@ -95,9 +78,7 @@ class MessageHandlerCog(commands.Cog):
         if image_urls:
             embed.set_image(url=image_urls[0])
 
-        await target_channel.send(embed=embed)
-        debug_log(f"メッセージを転記完了: {message.content}")
-
+        embeds = [embed]
         for img_url in image_urls[1:]:
             image_embed = discord.Embed(
                 color=0x82cded,
@@ -107,9 +88,14 @@ class MessageHandlerCog(commands.Cog):
                 icon_url=message.author.display_avatar.url
             )
             image_embed.set_image(url=img_url)
+            embeds.append(image_embed)
+
+        # ✅ 送信はワーカーに任せる（同じメッセージの embed は順番どおり1回でまとめて送る）
+        self.relay_queue.enqueue(target_channel, embeds)
+        logger.debug("メッセージを転記キューに追加: %s", message.content)
 
-            await target_channel.send(embed=image_embed)
-            debug_log(f"追加の画像を転記: {img_url}")
+        if self.search_index is not None:
+            self.search_index.add(message)
 
         await self.bot.process_commands(message)
 
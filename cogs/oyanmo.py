@@ -1,14 +1,24 @@
+import asyncio
 import discord
 from discord import app_commands
 from discord.ext import commands
 from utils.helpers import voice_users_autocomplete
-from utils.countdown import countdown_procedure, countdown_active
+from utils.voice_presence import get_voice_presence
+from utils.countdown import countdown_procedure, run_countdown
 from utils.messages import get_random_success_message
+from utils.rate_limit import RateLimiter
+from utils.logging_setup import get_logger
 from config import TARGET_VOICE_CHANNEL_ID
 
+logger = get_logger("oyanmo")
+
+MOVE_CONCURRENCY = 4  # まとめて移動するときの同時リクエスト数
+
 class OyanmoCog(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
+        self.voice_presence = get_voice_presence(bot)  # ✅ 起動時から入退室を追跡（オートコンプリート用）
+        self.move_limiter = RateLimiter(concurrency=MOVE_CONCURRENCY)
 
     @app_commands.command(name="おやんも", description="指定したユーザーを寝落ち部屋に移動させます")
     @app_commands.autocomplete(username=voice_users_autocomplete)
@@ -20,14 +30,18 @@ class OyanmoCog(commands.Cog):
             await interaction.followup.send("サーバー情報を取得できません。", ephemeral=True)
             return
 
-        target_member = discord.utils.find(lambda m: m.display_name == username, guild.members)
-        if target_member is None or target_member.voice is None:
-            await interaction.followup.send(f"❌ `{username}` はボイスチャンネルにいません。")
+        # ✅ username にはオートコンプリートで選んだメンバーIDが入る
+        target_member = self.voice_presence.resolve_member(guild, username)
+        if target_member is None:
+            await interaction.followup.send(f"❌ `{username}` が見つかりません。候補から選択してください。")
+            return
+        if target_member.voice is None:
+            await interaction.followup.send(f"❌ `{target_member.display_name}` はボイスチャンネルから退出しています。")
             return
 
         target_channel = interaction.client.get_channel(TARGET_VOICE_CHANNEL_ID)
         if not isinstance(target_channel, discord.VoiceChannel):
-            await interaction.followup.send(f"❌ `{username}`: 指定されたボイスチャンネルが見つかりません。")
+            await interaction.followup.send(f"❌ `{target_member.display_name}`: 指定されたボイスチャンネルが見つかりません。")
             return
 
         # 初期表示
@@ -47,5 +61,116 @@ class OyanmoCog(commands.Cog):
             embed.color = 0x32CD32
             await response_message.edit(embed=embed, view=None)
 
+    @app_commands.command(name="おやんも_まとめて", description="複数のユーザー、または部屋のミュート中のユーザーをまとめて寝落ち部屋に移動させます")
+    @app_commands.describe(
+        room="この部屋のユーザーを対象にする",
+        mode="部屋を指定したときの対象（ミュート中のみ / 全員）",
+        countdown="カウントダウンしてから移動する",
+    )
+    @app_commands.choices(mode=[
+        app_commands.Choice(name="ミュート中のみ", value="muted"),
+        app_commands.Choice(name="全員", value="all"),
+    ])
+    @app_commands.autocomplete(
+        user1=voice_users_autocomplete,
+        user2=voice_users_autocomplete,
+        user3=voice_users_autocomplete,
+        user4=voice_users_autocomplete,
+        user5=voice_users_autocomplete,
+    )
+    async def おやんも_まとめて(self, interaction: discord.Interaction, user1: str = None, user2: str = None,
+                           user3: str = None, user4: str = None, user5: str = None,
+                           room: discord.VoiceChannel = None, mode: str = "muted", countdown: bool = False):
+        await interaction.response.defer()
+
+        guild = interaction.guild
+        if guild is None:
+            await interaction.followup.send("サーバー情報を取得できません。", ephemeral=True)
+            return
+
+        target_channel = interaction.client.get_channel(TARGET_VOICE_CHANNEL_ID)
+        if not isinstance(target_channel, discord.VoiceChannel):
+            await interaction.followup.send("❌ 指定されたボイスチャンネルが見つかりません。")
+            return
+
+        usernames = [name for name in (user1, user2, user3, user4, user5) if name]
+        if not usernames and room is None:
+            await interaction.followup.send("❌ ユーザーか部屋を1つ以上指定してください。", ephemeral=True)
+            return
+
+        targets, skipped = self.collect_targets(guild, usernames, room, mode, target_channel)
+        if not targets:
+            detail = "\n".join(skipped) if skipped else ""
+            await interaction.followup.send(f"❌ 移動できるユーザーがいません。\n{detail}".strip())
+            return
+
+        names = "、".join(f"`{member.display_name}`" for member in targets)
+        embed = discord.Embed(
+            title="おやんも実行",
+            description=f"{names} を寝落ち部屋へ移動させます。",
+            color=0x5865F2
+        )
+        response_message = await interaction.followup.send(embed=embed, wait=True)
+
+        if countdown:
+            embed.title = "おやんも コマンド実行"
+            if not await run_countdown(interaction, response_message, embed, f"{len(targets)} 人（{names}）"):
+                return
+
+        # ✅ 同時実行数を絞りつつまとめて移動（429 は RateLimiter が待って再試行）
+        results = await asyncio.gather(*(self.move_member(member, target_channel) for member in targets))
+        moved = [member for member, error in results if error is None]
+        failed = [(member, error) for member, error in results if error is not None]
+
+        lines = []
+        if moved:
+            lines.append(f"✅ 移動: {'、'.join(f'`{member.display_name}`' for member in moved)}")
+        if failed:
+            lines.append(f"❌ 失敗: {'、'.join(f'`{member.display_name}`' for member, _ in failed)}")
+        lines.extend(skipped)
+        embed.title = "おやんも実行"
+        embed.description = "\n".join(lines)
+        embed.color = 0x32CD32 if not failed else 0xFFA500
+        await response_message.edit(embed=embed, view=None)
+
+    def collect_targets(self, guild, usernames, room, mode, target_channel):
+        """移動対象のメンバー（重複なし）と、対象外にした理由の一覧を返す"""
+        targets = {}
+        skipped = []
+        already_there = []  # 既に寝落ち部屋にいるメンバー
+        for username in usernames:
+            member = self.voice_presence.resolve_member(guild, username)
+            if member is None:
+                skipped.append(f"⚠ `{username}` が見つかりません。")
+            elif member.voice is None or member.voice.channel is None:
+                skipped.append(f"⚠ `{member.display_name}` はボイスチャンネルから退出しています。")
+            elif member.voice.channel.id == target_channel.id:
+                already_there.append(member.display_name)
+            else:
+                targets[member.id] = member
+
+        if room is not None and room.id == target_channel.id:
+            skipped.append(f"⚠ `{room.name}` は寝落ち部屋のため、部屋の指定は対象外にしました。")
+        elif room is not None:
+            for member in room.members:
+                if member.bot or member.voice is None:
+                    continue
+                if mode == "muted" and not (member.voice.self_mute or member.voice.self_deaf):
+                    continue
+                targets[member.id] = member
+
+        if already_there:
+            skipped.append(f"ℹ 既に寝落ち部屋にいます: {'、'.join(f'`{name}`' for name in already_there)}")
+        return list(targets.values()), skipped
+
+    async def move_member(self, member, target_channel):
+        """(メンバー, 失敗時の例外 or None) を返す"""
+        try:
+            await self.move_limiter.run(lambda: member.move_to(target_channel))
+            return member, None
+        except (discord.HTTPException, discord.RateLimited) as e:
+            logger.debug("[OYANMO] %s の移動に失敗: %s", member.display_name, e)
+            return member, e
+
 async def setup(bot):
     await bot.add_cog(OyanmoCog(bot))
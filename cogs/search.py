@@ -0,0 +1,109 @@
+import discord
+from discord import app_commands
+from discord.ext import commands
+import datetime
+import time
+import pytz
+from utils.search_index import get_search_index
+from utils.logging_setup import get_logger
+
+logger = get_logger("search")
+
+jst = pytz.timezone("Asia/Tokyo")
+
+SEARCH_RESULT_LIMIT = 10
+SNIPPET_LENGTH = 80
+
+
+def parse_date(date_str):
+    """yyyymmdd を JST 0時の datetime に変換（不正なら None）"""
+    try:
+        return jst.localize(datetime.datetime.strptime(date_str, "%Y%m%d"))
+    except ValueError:
+        return None
+
+
+class SearchCog(commands.Cog):
+    """転記したメッセージをローカルの索引から検索する"""
+    def __init__(self, bot, search_index):
+        self.bot = bot
+        self.search_index = search_index
+
+    @app_commands.command(name="search", description="管理者用：転記されたメッセージを検索")
+    @app_commands.describe(
+        keyword="検索語（空白区切りで AND 検索）",
+        user="発言したユーザー",
+        room="ボイスチャンネル名（部分一致）",
+        since="この日以降（yyyymmdd）",
+        until="この日まで（yyyymmdd）",
+    )
+    async def search(self, interaction: discord.Interaction, keyword: str = None, user: discord.User = None,
+                     room: str = None, since: str = None, until: str = None):
+        if interaction.guild is None:
+            await interaction.response.send_message("エラー: サーバー情報が取得できません。", ephemeral=True)
+            return
+
+        if not interaction.user.guild_permissions.administrator:
+            await interaction.response.send_message("⛔ このコマンドは管理者のみ実行可能です。", ephemeral=True)
+            return
+
+        since_dt = until_dt = None
+        if since:
+            since_dt = parse_date(since)
+            if since_dt is None:
+                await interaction.response.send_message("❌ `since` は `yyyymmdd` 形式で指定してください。", ephemeral=True)
+                return
+        if until:
+            until_dt = parse_date(until)
+            if until_dt is None:
+                await interaction.response.send_message("❌ `until` は `yyyymmdd` 形式で指定してください。", ephemeral=True)
+                return
+            until_dt += datetime.timedelta(days=1)  # 指定日の終わりまで含める
+
+        if not any([keyword, user, room, since_dt, until_dt]):
+            await interaction.response.send_message("❌ 検索条件を1つ以上指定してください。", ephemeral=True)
+            return
+
+        started = time.perf_counter()
+        results = await self.search_index.search(
+            interaction.guild.id,
+            keyword=keyword,
+            author_id=user.id if user else None,
+            room=room,
+            since=since_dt,
+            until=until_dt,
+            limit=SEARCH_RESULT_LIMIT,
+        )
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        logger.debug("[SEARCH] keyword=%s user=%s room=%s → %d 件 (%.1fms)", keyword, user, room, len(results), elapsed_ms)
+
+        if not results:
+            await interaction.response.send_message("🔍 条件に合うメッセージは見つかりませんでした。", ephemeral=True)
+            return
+
+        await interaction.response.send_message(embed=self.build_results_embed(interaction.guild, results, elapsed_ms), ephemeral=True)
+
+    @staticmethod
+    def build_results_embed(guild, results, elapsed_ms):
+        embed = discord.Embed(title="🔍 検索結果", color=0x82cded)
+        for row in results:
+            posted_at = datetime.datetime.fromtimestamp(row["created_at"], jst).strftime("%Y/%m/%d %H:%M")
+            content = row["content"].replace("\n", " ")
+            if len(content) > SNIPPET_LENGTH:
+                content = content[:SNIPPET_LENGTH] + "…"
+            link = f"https://discord.com/channels/{guild.id}/{row['channel_id']}/{row['message_id']}"
+            embed.add_field(
+                name=f"{posted_at}  {row['room']}  {row['author_name']}",
+                value=f"{content}\n[元のメッセージ]({link})",
+                inline=False,
+            )
+        embed.set_footer(text=f"{len(results)} 件（最大 {SEARCH_RESULT_LIMIT} 件） / {elapsed_ms:.0f}ms")
+        return embed
+
+
+async def setup(bot):
+    search_index = get_search_index(bot)
+    if search_index is None:
+        logger.info("ℹ SEARCH_INDEX が無効のため /search は登録しません。")
+        return
+    await bot.add_cog(SearchCog(bot, search_index))
@@ -0,0 +1,195 @@
+import discord
+from discord import app_commands
+from discord.ext import commands
+import time
+from utils.channel_manager import get_channel_manager
+from utils.relay_queue import get_relay_queue
+from utils.jobs import get_job_dispatcher
+from utils.metrics import get_metrics, instrument_http, event_handler_seconds, event_handler_errors
+from utils.logging_setup import LEVEL_NAMES, get_logger, set_level, reset_level, subsystem_levels
+from config import METRICS_PORT
+
+logger = get_logger("stats")
+
+HANDLER_EVENTS = ("on_message", "on_voice_state_update")
+
+
+class StatsCog(commands.Cog):
+    """メトリクスの集計（/stats と、任意で Prometheus 形式のエンドポイント）"""
+    def __init__(self, bot):
+        self.bot = bot
+        self.metrics = get_metrics()
+        self.started_at = time.monotonic()
+        self._restore_http = None
+        self._runner = None
+
+    async def cog_load(self):
+        # ✅ すべての REST 呼び出しを計測（HTTPClient.request を包む）
+        self._restore_http = instrument_http(self.bot.http)
+        self.register_gauges()
+        if METRICS_PORT:
+            await self.start_endpoint(METRICS_PORT)
+
+    async def cog_unload(self):
+        if self._restore_http is not None:
+            self._restore_http()
+            self._restore_http = None
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+
+    def register_gauges(self):
+        channel_manager = get_channel_manager(self.bot)
+        relay_queue = get_relay_queue(self.bot)
+        self.metrics.gauge("zero_bot_relay_queue_depth", "転記キューに残っている件数").set_function(relay_queue.queue_depth)
+        self.metrics.gauge("zero_bot_channel_cache_entries", "ボイス→テキストチャンネルキャッシュの件数").set_function(
+            lambda: channel_manager.cache_stats()["size"]
+        )
+        self.metrics.gauge("zero_bot_channel_cache_hit_ratio", "ボイス→テキストチャンネルキャッシュのヒット率").set_function(
+            lambda: channel_manager.cache_stats()["hit_rate"]
+        )
+        self.metrics.gauge("zero_bot_gateway_latency_seconds", "ゲートウェイの応答時間（秒）", ("shard",)).set_function(
+            lambda: {(str(shard_id),): latency for shard_id, latency in self.shard_latencies()}
+        )
+        job_dispatcher = get_job_dispatcher(self.bot)
+        if job_dispatcher is not None:
+            self.metrics.gauge("zero_bot_jobs_pending", "ワーカープロセスで実行中・待ちのジョブ数").set_function(job_dispatcher.pending_count)
+
+    def shard_latencies(self):
+        """[(シャードID, 秒)]（AutoShardedBot でなければシャード 0 のみ）"""
+        latencies = getattr(self.bot, "latencies", None) or [(0, self.bot.latency)]
+        return [(shard_id, latency if latency == latency else 0.0) for shard_id, latency in latencies]  # 未接続時は NaN
+
+    def gateway_latency(self):
+        latencies = [latency for _, latency in self.shard_latencies()]
+        return sum(latencies) / len(latencies)
+
+    async def start_endpoint(self, port):
+        """127.0.0.1:<port>/metrics で Prometheus 形式のテキストを返す"""
+        from aiohttp import web  # discord.py の依存に含まれる
+
+        async def handle_metrics(request):
+            return web.Response(text=self.metrics.render_prometheus(), content_type="text/plain", charset="utf-8")
+
+        app = web.Application()
+        app.router.add_get("/metrics", handle_metrics)
+        runner = web.AppRunner(app, access_log=None)
+        await runner.setup()
+        try:
+            await web.TCPSite(runner, "127.0.0.1", port).start()
+        except OSError as e:
+            await runner.cleanup()
+            logger.error("❌ メトリクスのエンドポイントを開始できません (port=%s): %s", port, e, exc_info=True)
+            return
+        self._runner = runner
+        logger.debug("[METRICS] http://127.0.0.1:%s/metrics で公開中", port)
+
+    def build_stats_embed(self):
+        embed = discord.Embed(title="📊 Bot の状態", color=0x82cded)
+
+        uptime = int(time.monotonic() - self.started_at)
+        embed.description = f"稼働時間: {uptime // 3600}時間{uptime % 3600 // 60}分 / 遅延: {self.gateway_latency() * 1000:.0f}ms"
+        shard_latencies = self.shard_latencies()
+        if len(shard_latencies) > 1:
+            embed.add_field(
+                name="シャード",
+                value="\n".join(f"`#{shard_id}`: {latency * 1000:.0f}ms" for shard_id, latency in shard_latencies)[:1024],
+                inline=False,
+            )
+
+        handler_seconds = event_handler_seconds()
+        handler_errors = event_handler_errors()
+        samples = handler_seconds.samples()
+        lines = []
+        for event in HANDLER_EVENTS:
+            series = samples.get((event,))
+            if series is None:
+                lines.append(f"`{event}`: なし")
+                continue
+            p50 = handler_seconds.quantile(0.5, event=event) * 1000
+            p99 = handler_seconds.quantile(0.99, event=event) * 1000
+            lines.append(
+                f"`{event}`: {series[2]} 件 / p50 ≤ {p50:g}ms / p99 ≤ {p99:g}ms / 例外 {handler_errors.value(event=event)} 件"
+            )
+        embed.add_field(name="イベント処理", value="\n".join(lines), inline=False)
+
+        rest = self.metrics.get("zero_bot_rest_requests")
+        if rest is not None:
+            by_route = {}
+            failed = 0
+            for (method, route, status), count in rest.samples().items():
+                by_route[f"{method} {route}"] = by_route.get(f"{method} {route}", 0) + count
+                if status != "ok":
+                    failed += count
+            top = sorted(by_route.items(), key=lambda item: item[1], reverse=True)[:5]
+            value = f"合計 {sum(by_route.values())} 回（失敗 {failed} 回）\n" + "\n".join(f"`{route}`: {count}" for route, count in top)
+            embed.add_field(name="REST 呼び出し", value=value[:1024], inline=False)
+
+        cache = get_channel_manager(self.bot).cache_stats()
+        lookups = self.metrics.get("zero_bot_channel_lookups")
+        lookup_counts = lookups.samples() if lookups is not None else {}
+        embed.add_field(
+            name="転記先チャンネル",
+            value=(
+                f"キャッシュ {cache['size']}/{cache['max_size']} 件・ヒット率 {cache['hit_rate']:.1%}\n"
+                f"キャッシュ {lookup_counts.get(('cache',), 0)} / 既存 {lookup_counts.get(('index',), 0)} / 新規 {lookup_counts.get(('created',), 0)}"
+            ),
+            inline=False,
+        )
+
+        relay = get_relay_queue(self.bot).stats()
+        embed.add_field(
+            name="転記キュー",
+            value=f"待ち {relay['queue_depth']} 件 / 送信 {relay['sent_embeds']} embed（{relay['sent_batches']} 回）",
+            inline=False,
+        )
+
+        job_dispatcher = get_job_dispatcher(self.bot)
+        if job_dispatcher is not None:
+            jobs = job_dispatcher.stats()
+            state = f"稼働中（pid {jobs['pid']}）" if jobs["alive"] else "停止中"
+            embed.add_field(name="ワーカー", value=f"{state} / 実行中・待ち {jobs['pending']} 件", inline=False)
+        return embed
+
+    @app_commands.command(name="stats", description="管理者用：Bot の処理状況を表示")
+    async def stats(self, interaction: discord.Interaction):
+        if interaction.guild is None or not interaction.user.guild_permissions.administrator:
+            await interaction.response.send_message("⛔ このコマンドは管理者のみ実行可能です。", ephemeral=True)
+            return
+        await interaction.response.send_message(embed=self.build_stats_embed(), ephemeral=True)
+
+    async def subsystem_autocomplete(self, interaction: discord.Interaction, current: str):
+        current_lower = (current or "").lower()
+        return [
+            app_commands.Choice(name=f"{name}（{level}）", value=name)
+            for name, level in subsystem_levels().items()
+            if current_lower in name.lower()
+        ][:25]
+
+    @app_commands.command(name="loglevel", description="管理者用：サブシステムごとのログレベルを変更（再起動不要）")
+    @app_commands.describe(subsystem="対象（all で全体）", level="ログレベル（省略時は現在の設定を表示）")
+    @app_commands.choices(level=[app_commands.Choice(name=name, value=name) for name in LEVEL_NAMES]
+                          + [app_commands.Choice(name="全体の設定に戻す", value="RESET")])
+    @app_commands.autocomplete(subsystem=subsystem_autocomplete)
+    async def loglevel(self, interaction: discord.Interaction, subsystem: str = None, level: str = None):
+        if interaction.guild is None or not interaction.user.guild_permissions.administrator:
+            await interaction.response.send_message("⛔ このコマンドは管理者のみ実行可能です。", ephemeral=True)
+            return
+
+        if subsystem and level:
+            try:
+                if level == "RESET":
+                    reset_level(subsystem)
+                else:
+                    set_level(subsystem, level)
+            except ValueError as e:
+                await interaction.response.send_message(f"❌ {e}（候補から選択してください）", ephemeral=True)
+                return
+            logger.info("🔧 ログレベルを変更: %s → %s（%s）", subsystem, level, interaction.user.display_name)
+
+        lines = [f"`{name}`: {current}" for name, current in subsystem_levels().items()]
+        await interaction.response.send_message("🔧 ログレベル\n" + "\n".join(lines), ephemeral=True)
+
+
+async def setup(bot):
+    await bot.add_cog(StatsCog(bot))
@@ -3,160 +3,230 @@ import random
 import datetime
 import pytz
 import asyncio
-import logging
-import os
 
 from discord.ext import commands
 from utils.helpers import normalize_text_channel_name
-from utils.channel_manager import ChannelManager
-from config import CATEGORY_NAME, EXCLUDED_CATEGORY_IDS, debug_log, MESSAGE_SOURCE_CHANNEL_IDS, LEAVE_MESSAGE_DELETE_EXCLUDED_CATEGORY_IDS
-from utils.helpers import load_profile_messages, save_profile_messages
+from utils.channel_manager import get_channel_manager
+from config import CATEGORY_NAME, EXCLUDED_CATEGORY_IDS, MESSAGE_SOURCE_CHANNEL_IDS, LEAVE_MESSAGE_DELETE_EXCLUDED_CATEGORY_IDS, VOICE_EVENT_COALESCE_SECONDS
+from utils.helpers import load_profile_messages
+from utils.kv_store import get_state_store
+from utils.profile_index import ProfileLinkIndex
+from utils.purge import ChannelPurger
+from utils.jobs import get_job_dispatcher
+from utils.relay_queue import get_relay_queue
+from utils.voice_coalescer import VoiceEvent, VoiceEventCoalescer
+from utils.logging_setup import get_logger
+from utils.metrics import timed_handler
 
 # タイムゾーン設定
 jst = pytz.timezone("Asia/Tokyo")
 
-# ログ保存ディレクトリとファイルパス
-log_dir = "log"
-os.makedirs(log_dir, exist_ok=True)
-today_str = datetime.datetime.now(jst).strftime("%Y%m%d")
-log_file_path = os.path.join(log_dir, f"message_handler_{today_str}.log")
-
-# ログローテート処理（3日より古いログを削除）
-for fname in os.listdir(log_dir):
-    if fname.startswith("message_handler_") and fname.endswith(".log"):
-        try:
-            date_str = fname.replace("message_handler_", "").replace(".log", "")
-            file_date = datetime.datetime.strptime(date_str, "%Y%m%d")
-            if (datetime.datetime.now(jst) - file_date).days > 2:
-                os.remove(os.path.join(log_dir, fname))
-        except Exception:
-            continue
-
-# ログ設定（ファイル出力）
-logger = logging.getLogger("message_handler")
-logger.setLevel(logging.INFO)
-
-# 重複防止
-if not logger.handlers:
-    file_handler = logging.FileHandler(log_file_path, encoding="utf-8")
-    formatter = logging.Formatter('[%(asctime)s] %(levelname)s - %(message)s')
-    file_handler.setFormatter(formatter)
-    logger.addHandler(file_handler)
+# ログ（出力先・ローテーションは utils.logging_setup で一括管理）
+logger = get_logger("voice_events")
 
 class VoiceEventsCog(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
-        self.channel_manager = ChannelManager(bot)
-        self.join_message_tracking = {}  # {ユーザーID: (テキストチャンネルID, メッセージID)}
-        self.profile_message_map = load_profile_messages()
+        self.channel_manager = get_channel_manager(bot)  # ✅ 全Cogで共有
+        self.profile_message_map = None  # cog_load で読み込む
+        self.profile_index = ProfileLinkIndex(MESSAGE_SOURCE_CHANNEL_IDS)  # ✅ 投稿者ID → 最新プロフィール投稿
+        self.purger = ChannelPurger()
+        self.purge_tasks = {}  # {ボイスチャンネルID: 削除中の Task}（再入室でキャンセル）
+        self.relay_queue = get_relay_queue(bot)
+        # ✅ 短時間の入退室はギルドごとにまとめて、転記先チャンネルごとに1件の embed にする
+        self.coalescer = VoiceEventCoalescer(self.flush_voice_events, window=VOICE_EVENT_COALESCE_SECONDS)
+
+    async def cog_load(self):
+        # ✅ SQLite に永続化（書き込みはまとめてスレッドで反映。初回は JSON から移行）
+        # 読み込みはスレッドで行い、他の Cog のロードを止めない
+        self.profile_message_map = await asyncio.to_thread(
+            get_state_store().namespace, "profile_messages", migrate_from=load_profile_messages
+        )
+
+    async def cog_unload(self):
+        for task in self.purge_tasks.values():
+            task.cancel()
+        await self.coalescer.flush_all()
+
+    @commands.Cog.listener()
+    async def on_ready(self):
+        self.profile_index.start_backfill(self.bot)
+
+    @commands.Cog.listener()
+    async def on_message(self, message):
+        if self.profile_index.is_source(message.channel.id):
+            self.profile_index.add(message)
+
+    @commands.Cog.listener()
+    async def on_message_edit(self, before, after):
+        # 読み込み前に投稿されたものなどインデックスに無い投稿を補う
+        if self.profile_index.is_source(after.channel.id):
+            self.profile_index.add(after)
+
+    @commands.Cog.listener()
+    async def on_raw_message_delete(self, payload):
+        # キャッシュに無いメッセージの削除も拾えるよう raw イベントを使う
+        if self.profile_index.is_source(payload.channel_id):
+            self.profile_index.remove(payload.message_id)
+
+    @commands.Cog.listener()
+    async def on_raw_bulk_message_delete(self, payload):
+        if self.profile_index.is_source(payload.channel_id):
+            for message_id in payload.message_ids:
+                self.profile_index.remove(message_id)
 
     def is_excluded(self, channel):
         """チャンネルが指定されたカテゴリー ID のいずれかに属しているか確認"""
         return channel and channel.category and channel.category.id in EXCLUDED_CATEGORY_IDS
 
     @commands.Cog.listener()
+    @timed_handler("on_voice_state_update")
     async def on_voice_state_update(self, member, before, after):
         guild = member.guild
+        now = datetime.datetime.now(jst)
 
         # ✅ 退室処理
         if before.channel and before.channel != after.channel:
-            logger.info(f"[VOICE LEAVE] {member.display_name} が `{before.channel.name}` から退出")
+            logger.info("[VOICE LEAVE] %s が `%s` から退出", member.display_name, before.channel.name,
+                        extra={"guild_id": guild.id, "channel_id": before.channel.id, "user_id": member.id})
 
             if not self.is_excluded(before.channel):
-                text_channel = await self.channel_manager.get_or_create_text_channel(guild, before.channel)
-
-                embed = discord.Embed(
-                    description=f"**{member.display_name}**（ID: `{member.id}`）が **{before.channel.name}** から退出しました。",
-                    color=0xE74C3C
-                )
-                embed.set_author(name=f"{member.display_name} さんの退出", icon_url=member.display_avatar.url)
-                embed.set_footer(text=datetime.datetime.now(jst).strftime("%Y-%m-%d %H:%M:%S"))
-
-                await text_channel.send(embed=embed)
-
-                # 現在の人数
-                member_count = len(before.channel.members)
+                self.coalescer.add(guild.id, VoiceEvent("leave", member, before.channel, now))
 
-                # 0人ならメッセージ削除
-                if member_count == 0:
-                    category_id = before.channel.category_id
+                # 0人ならメッセージ削除（バックグラウンドで実行）
+                if len(before.channel.members) == 0:
+                    self.schedule_purge(before.channel)
 
-                    if category_id not in LEAVE_MESSAGE_DELETE_EXCLUDED_CATEGORY_IDS:
-                        await self.delete_all_messages_from_channel(before.channel)
-                    else:
-                        debug_log(f"[SKIP DELETE] {before.channel.name} は削除対象外カテゴリ（ID: {category_id}）のため削除スキップ")
+        # ✅ 入室処理
+        if after.channel and before.channel != after.channel:
+            logger.info("[VOICE JOIN] %s が `%s` に入室", member.display_name, after.channel.name,
+                        extra={"guild_id": guild.id, "channel_id": after.channel.id, "user_id": member.id})
 
-                # 🔽 プロフィールEmbed削除
-                profile_data = self.profile_message_map.get(str(member.id))
-                if profile_data:
-                    try:
-                        channel = self.bot.get_channel(int(profile_data["channel_id"]))
-                        message = await channel.fetch_message(int(profile_data["message_id"]))
-                        await message.delete()
-                        debug_log(f"[DELETE PROFILE LINK] `{member.display_name}` のプロフィール投稿を削除しました")
+            # 誰かが戻ってきたら削除を中止
+            self.cancel_purge(after.channel)
 
-                        del self.profile_message_map[str(member.id)]
-                        save_profile_messages(self.profile_message_map)
+            if not self.is_excluded(after.channel):
+                self.coalescer.add(guild.id, VoiceEvent("join", member, after.channel, now))
 
-                    except Exception as e:
-                        debug_log(f"[DELETE ERROR] `{member.display_name}` のプロフィール投稿削除時にエラー: {e}")
+    async def flush_voice_events(self, guild_id, events):
+        """まとめた入退室イベントを転記先チャンネルごとに1件の embed で送信"""
+        guild = self.bot.get_guild(guild_id)
+        if guild is None:
+            return
 
-        # ✅ 入室処理
-        if after.channel and before.channel != after.channel:
-            logger.info(f"[VOICE JOIN] {member.display_name} が `{after.channel.name}` に入室")
+        # {ボイスチャンネルID: (ボイスチャンネル, {メンバーID: [VoiceEvent]})}（発生順を維持）
+        rooms = {}
+        for event in events:
+            _, member_events = rooms.setdefault(event.voice_channel.id, (event.voice_channel, {}))
+            member_events.setdefault(event.member.id, []).append(event)
 
-            if not self.is_excluded(after.channel):
-                text_channel = await self.channel_manager.get_or_create_text_channel(guild, after.channel)
+        left = []  # 最終的に部屋から出たメンバー
+        joined = []  # 最終的に部屋に入ったメンバー
+        for voice_channel, member_events in rooms.values():
+            try:
+                text_channel = await self.channel_manager.get_or_create_text_channel(guild, voice_channel)
+            except discord.HTTPException as e:
+                logger.error("[ERROR] %s の転記先チャンネルを取得できません: %s", voice_channel.name, e, exc_info=True)
+                continue
 
-                embed = discord.Embed(
-                    description=f"**{member.display_name}**（ID: `{member.id}`）が **{after.channel.name}** に入室しました。",
-                    color=0x2ECC71
-                )
-                embed.set_author(name=f"{member.display_name} さんの入室", icon_url=member.display_avatar.url)
-                embed.set_footer(text=datetime.datetime.now(jst).strftime("%Y-%m-%d %H:%M:%S"))
+            sent_future = self.relay_queue.enqueue(text_channel, [self.build_voice_embed(voice_channel, member_events)])
 
-                sent_msg = await text_channel.send(embed=embed)
-                self.join_message_tracking[member.id] = (text_channel.id, sent_msg.id)
+            for member_events_list in member_events.values():
+                was_in = member_events_list[0].kind == "leave"
+                now_in = member_events_list[-1].kind == "join"
+                if was_in and not now_in:
+                    left.append(member_events_list[-1])
+                elif now_in and not was_in:
+                    joined.append((member_events_list[-1], sent_future))
 
-                await self.post_user_recent_message_link(member, after.channel)
+        # 退出した人のプロフィール投稿を先に消してから、入室した人の分を投稿する
+        for event in left:
+            await self.delete_profile_link(event.member)
 
-                # 前いたチャンネルの人数表示
-                member_count = len(before.channel.members)
+        for event, sent_future in joined:
+            # 入室の embed（他のメンバーとまとめて送ることがある）を送ってからプロフィールを投稿する
+            try:
+                await sent_future
+            except discord.HTTPException:
+                pass
+            await self.post_user_recent_message_link(event.member, event.voice_channel)
+
+    def build_voice_embed(self, voice_channel, member_events):
+        """1人1件ならこれまでどおりの入室/退出 embed、複数ならまとめた embed"""
+        if len(member_events) == 1:
+            (events,) = member_events.values()
+            if len(events) == 1:
+                event = events[0]
+                member = event.member
+                if event.kind == "join":
+                    embed = discord.Embed(
+                        description=f"**{member.display_name}**（ID: `{member.id}`）が **{voice_channel.name}** に入室しました。",
+                        color=0x2ECC71
+                    )
+                    embed.set_author(name=f"{member.display_name} さんの入室", icon_url=member.display_avatar.url)
+                else:
+                    embed = discord.Embed(
+                        description=f"**{member.display_name}**（ID: `{member.id}`）が **{voice_channel.name}** から退出しました。",
+                        color=0xE74C3C
+                    )
+                    embed.set_author(name=f"{member.display_name} さんの退出", icon_url=member.display_avatar.url)
+                embed.set_footer(text=event.at.strftime("%Y-%m-%d %H:%M:%S"))
+                return embed
+
+        labels = {"join": "入室", "leave": "退出"}
+        lines = []
+        for events in member_events.values():
+            member = events[0].member
+            history = " → ".join(f"{labels[event.kind]}({event.at.strftime('%H:%M:%S')})" for event in events)
+            lines.append(f"**{member.display_name}**（ID: `{member.id}`）: {history}")
+
+        description = "\n".join(lines)
+        if len(description) > 4000:
+            description = description[:4000] + "\n…"
+
+        all_events = [event for events in member_events.values() for event in events]
+        embed = discord.Embed(
+            title=f"🔁 {voice_channel.name} の入退室",
+            description=description,
+            color=0x3498DB
+        )
+        embed.set_footer(text=f"{all_events[0].at.strftime('%Y-%m-%d %H:%M:%S')} 〜 {all_events[-1].at.strftime('%H:%M:%S')}")
+        return embed
 
-                # 0人チェック
-                if member_count == 0:
-                    await self.delete_all_messages_from_channel(before.channel)
+    async def delete_profile_link(self, member):
+        """退室したメンバーのプロフィールEmbedを削除"""
+        profile_data = self.profile_message_map.get(str(member.id))
+        if not profile_data:
+            return
+        try:
+            channel = self.bot.get_channel(int(profile_data["channel_id"]))
+            message = await channel.fetch_message(int(profile_data["message_id"]))
+            await message.delete()
+            logger.debug("[DELETE PROFILE LINK] `%s` のプロフィール投稿を削除しました", member.display_name)
 
-    async def delete_join_message(self, member):
-        """退室時に、入室時に記録したメッセージを削除"""
-        if member.id in self.join_message_tracking:
-            channel_id, message_id = self.join_message_tracking.pop(member.id)
-            channel = self.bot.get_channel(channel_id)
+            self.profile_message_map.pop(str(member.id))
 
-            if channel:
-                try:
-                    join_message = await channel.fetch_message(message_id)
-                    await join_message.delete()
-                    debug_log(f"[DELETE MESSAGE] `{member.display_name}` の入室時のメッセージを削除しました")
-                except discord.NotFound:
-                    debug_log(f"[DELETE FAILED] `{member.display_name}` のメッセージが見つかりませんでした")
+        except discord.NotFound:
+            # 空室時の削除で既に消えている
+            self.profile_message_map.pop(str(member.id))
+        except Exception as e:
+            logger.debug("[DELETE ERROR] `%s` のプロフィール投稿削除時にエラー: %s", member.display_name, e)
 
     async def find_latest_message_link(self, member):
-        """指定ユーザーの最新メッセージリンクを取得"""
-        for channel_id in MESSAGE_SOURCE_CHANNEL_IDS:
-            message_source_channel = self.bot.get_channel(channel_id)
-            if not message_source_channel:
-                debug_log(f"[ERROR] 指定のメッセージチャンネル (ID: {channel_id}) が見つかりません")
-                continue
-
-            async for message in message_source_channel.history(limit=100):
-                if message.author.id == member.id:
-                    message_link = f"https://discord.com/channels/{message.guild.id}/{message.channel.id}/{message.id}"
-                    debug_log(f"[FOUND MESSAGE] `{member.display_name}` のメッセージを `{message.channel.name}` で発見")
-                    return message_link
+        """指定ユーザーの最新メッセージリンクを取得（インデックスから。history API は呼ばない）"""
+        if not self.profile_index.ready.is_set():
+            # 起動直後の読み込み中だけ少し待つ
+            try:
+                await asyncio.wait_for(self.profile_index.ready.wait(), timeout=5)
+            except asyncio.TimeoutError:
+                pass
 
-        debug_log(f"[NO MESSAGE] `{member.display_name}` のメッセージが見つかりませんでした")
-        return None
+        message_link = self.profile_index.latest_link(member.id)
+        if message_link:
+            logger.debug("[FOUND MESSAGE] `%s` のメッセージを発見", member.display_name)
+        else:
+            logger.debug("[NO MESSAGE] `%s` のメッセージが見つかりませんでした", member.display_name)
+        return message_link
 
     async def post_user_recent_message_link(self, member, target_channel):
         """指定チャンネルから取得したメッセージリンクを埋め込み形式で転記"""
@@ -201,29 +271,54 @@ class VoiceEventsCog(commands.Cog):
         )
         embed.set_thumbnail(url=member.display_avatar.url)
 
-        debug_log(f"[MESSAGE LINK] `{display_name}` のメッセージリンクを埋め込み形式で転記: {message_link}")
+        logger.debug("[MESSAGE LINK] `%s` のメッセージリンクを埋め込み形式で転記: %s", display_name, message_link)
         sent_msg = await target_channel.send(embed=embed)
 
-        # 🔽 JSONファイルに保存
+        # 🔽 永続ストアに保存（ディスクへの書き込みはまとめて非同期に行われる）
         self.profile_message_map[str(member.id)] = {
             "channel_id": str(target_channel.id),
             "message_id": str(sent_msg.id)
         }
-        save_profile_messages(self.profile_message_map)
+
+    def schedule_purge(self, voice_channel):
+        """空になったボイスチャンネルのメッセージ削除をバックグラウンドで開始"""
+        category_id = voice_channel.category_id
+        if category_id in LEAVE_MESSAGE_DELETE_EXCLUDED_CATEGORY_IDS:
+            logger.debug("[SKIP DELETE] %s は削除対象外カテゴリ（ID: %s）のため削除スキップ", voice_channel.name, category_id)
+            return
+
+        task = self.purge_tasks.get(voice_channel.id)
+        if task is not None and not task.done():
+            return  # 実行中
+
+        task = asyncio.create_task(self.delete_all_messages_from_channel(voice_channel))
+        self.purge_tasks[voice_channel.id] = task
+        task.add_done_callback(lambda t: self._on_purge_done(voice_channel, t))
+
+    def cancel_purge(self, voice_channel):
+        task = self.purge_tasks.get(voice_channel.id)
+        if task is not None and not task.done():
+            task.cancel()
+            logger.debug("[PURGE] %s に再入室があったため削除を中止しました", voice_channel.name)
+
+    def _on_purge_done(self, voice_channel, task):
+        if self.purge_tasks.get(voice_channel.id) is task:
+            del self.purge_tasks[voice_channel.id]
+        if not task.cancelled() and task.exception() is not None:
+            logger.error("[ERROR] %s のメッセージ削除に失敗: %s", voice_channel.name, task.exception(),
+                         exc_info=task.exception())
 
     async def delete_all_messages_from_channel(self, target_channel):
-        """指定されたテキストチャンネルのメッセージをすべて一括削除する（14日以内のみ対象）"""
-        while True:
-            # 最大100件取得（14日以内）
-            messages = [msg async for msg in target_channel.history(limit=100)]
-            if not messages:
-                break
-            try:
-                await target_channel.delete_messages(messages)
-                await asyncio.sleep(1)  # レートリミット対策
-            except discord.HTTPException as e:
-                print(f"[ERROR] bulk_delete failed: {e}")
-                break
+        """指定されたチャンネルのメッセージを削除する（14日より古いものは個別削除）
+
+        空になった時点より前のメッセージだけを対象にするので、途中で誰かが戻って
+        書き込んだメッセージは消さない。ワーカープロセスが有効ならそちらで削除する（キャンセルも伝わる）。
+        """
+        before = discord.utils.utcnow()
+        dispatcher = get_job_dispatcher(self.bot)
+        if dispatcher is not None:
+            return await dispatcher.run("purge", channel_id=target_channel.id, before=before)
+        return await self.purger.purge(target_channel, before=before)
 
 async def setup(bot):
     await bot.add_cog(VoiceEventsCog(bot))
@@ -1,4 +1,5 @@
 import os
+import logging
 import discord
 from dotenv import load_dotenv
 
@@ -9,8 +10,42 @@ CATEGORY_NAME = "インチャテキスト"
 ARCHIVE_CATEGORY_NAME = "インチャテキスト"
 TARGET_VOICE_CHANNEL_ID = int(os.getenv("TARGET_VOICE_CHANNEL_ID", "0"))
 STOP_BUTTON_ONLY_COMMAND_USER = os.getenv("STOP_BUTTON_ONLY_COMMAND_USER", "False").lower() == "true"
+# おやんものカウントダウン秒数と、途中経過を編集する間隔（0 なら相対タイムスタンプのみで編集しない）
+COUNTDOWN_SECONDS = int(os.getenv("COUNTDOWN_SECONDS", "10"))
+COUNTDOWN_EDIT_INTERVAL = float(os.getenv("COUNTDOWN_EDIT_INTERVAL", "0"))
 GOOGLE_DRIVE_FOLDER_ID = os.getenv("GOOGLE_DRIVE_FOLDER_ID")
 TARGET_GUILD_ID = int(os.getenv("TARGET_GUILD_ID", "0"))
+# アーカイブを日付ごとの圧縮バンドル（.md.gz + 目録）にまとめてアップロードする
+ARCHIVE_BUNDLE = os.getenv("ARCHIVE_BUNDLE", "True").lower() == "true"
+
+# 転記したメッセージのローカル全文検索（/search）。有効にすると SQLite ファイルに保存する
+SEARCH_INDEX_ENABLED = os.getenv("SEARCH_INDEX", "False").lower() == "true"
+SEARCH_DB_PATH = os.getenv("SEARCH_DB_PATH", "zero_bot_search.db")
+
+# Prometheus 形式のメトリクスを 127.0.0.1:<port>/metrics で公開（0 なら無効）
+METRICS_PORT = int(os.getenv("METRICS_PORT", "0"))
+
+# AutoShardedBot で起動する（シャード数は省略時 Discord の推奨値）
+# 全シャードを1プロセスで受け持つ前提（定期アーカイブ・ワーカー・状態ファイル・DB・ログはプロセスで1つ）。
+# BOT_SHARD_IDS を指定する場合も BOT_SHARD_COUNT の全シャードを含める必要がある。
+BOT_SHARDED = os.getenv("BOT_SHARDED", "False").lower() == "true"
+BOT_SHARD_COUNT = int(os.getenv("BOT_SHARD_COUNT", "0")) or None
+BOT_SHARD_IDS = [int(x) for x in os.getenv("BOT_SHARD_IDS", "").split(",") if x.strip()] or None
+if BOT_SHARD_IDS is not None and (BOT_SHARD_COUNT is None or sorted(BOT_SHARD_IDS) != list(range(BOT_SHARD_COUNT))):
+    raise ValueError(
+        "BOT_SHARD_IDS は BOT_SHARD_COUNT の全シャード（0〜BOT_SHARD_COUNT-1）を指定してください。"
+        "複数プロセスでのシャード分割には対応していません。"
+    )
+
+# スラッシュコマンドの同期は定義のハッシュが変わったときだけ行う。True なら起動時に必ず同期する
+FORCE_COMMAND_SYNC = os.getenv("FORCE_COMMAND_SYNC", "False").lower() == "true"
+
+# アーカイブの書き出し・Drive アップロード・空室のメッセージ削除を別プロセス（worker.py）で実行する
+JOB_WORKER_ENABLED = os.getenv("JOB_WORKER", "False").lower() == "true"
+
+# ボイス→テキストチャンネルのキャッシュ（件数上限・有効秒数。JST 0時にも失効）
+CHANNEL_CACHE_SIZE = int(os.getenv("CHANNEL_CACHE_SIZE", "64"))
+CHANNEL_CACHE_TTL = int(os.getenv("CHANNEL_CACHE_TTL", "21600"))
 
 # 転記対象外とするカテゴリー（ID で指定）
 EXCLUDED_CATEGORY_IDS = [
@@ -19,12 +54,18 @@ EXCLUDED_CATEGORY_IDS = [
     1153343627100176404,  # 面談室
 ]
 
+# おやんものオートコンプリート候補から外すボイスチャンネル
+EXCLUDED_VOICE_CHANNEL_IDS = [1426392389374836826, 1252161804147232779]
+
 # プロフ転記元
 MESSAGE_SOURCE_CHANNEL_IDS = [
     1146511568922755102,  # 女性プロフィール
     1146511242396188802,  # 男性プロフィール
 ]
 
+# この秒数以内の入退室はまとめて1件の embed にする
+VOICE_EVENT_COALESCE_SECONDS = float(os.getenv("VOICE_EVENT_COALESCE_SECONDS", "3"))
+
 # 退出時のメッセージ削除処理をスキップするカテゴリーID一覧
 LEAVE_MESSAGE_DELETE_EXCLUDED_CATEGORY_IDS = [
     1239840073927888906,  # イベント用
@@ -39,10 +80,15 @@ intents.guilds = True
 # デバッグログ出力
 DEBUG_MODE = os.getenv("DEBUG_MODE", "False").lower() == "true"
 
-def debug_log(message):
-    """DEBUG_MODE が True のときのみログを出力"""
-    if DEBUG_MODE:
-        print(f"[DEBUG] {message}")
+_debug_logger = logging.getLogger("zero_bot.general")
+
+def debug_log(message, *args):
+    """DEBUG レベルが有効なとき（DEBUG_MODE または /loglevel general DEBUG）のみログを出力
+
+    `debug_log("%s が入室", name)` のように引数を渡すと、無効なときは文字列を組み立てない。
+    """
+    if _debug_logger.isEnabledFor(logging.DEBUG):
+        _debug_logger.debug(message, *args, stacklevel=2)
 
 
 # ======== 大喜利bot 用設定 ========
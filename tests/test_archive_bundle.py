@@ -0,0 +1,39 @@
+import gzip
+import os
+import tempfile
+import unittest
+from utils.archive_bundle import write_day_bundle, read_channel_from_bundle
+
+
+class ArchiveBundleTest(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmpdir.cleanup)
+
+    def write(self, name, text):
+        path = os.path.join(self.tmpdir.name, name)
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(text)
+        return path
+
+    def test_read_one_channel_from_bundle(self):
+        sources = [
+            ("1:10", "20240101_部屋1", self.write("a.md", "# 部屋1\nこんにちは\n")),
+            ("2:20", "20240101_部屋1", self.write("b.md", "# 別ギルドの部屋1\n")),
+            ("1:11", "20240101_部屋2", self.write("c.md", "# 部屋2\n")),
+        ]
+        bundle_path, manifest_path = write_day_bundle(self.tmpdir.name, "20240101", sources)
+
+        self.assertEqual(read_channel_from_bundle(bundle_path, manifest_path, "20240101_部屋2"), "# 部屋2\n")
+        # 同名のチャンネルは状態のキーを付けて区別される
+        self.assertEqual(read_channel_from_bundle(bundle_path, manifest_path, "20240101_部屋1 (2:20)"), "# 別ギルドの部屋1\n")
+        with self.assertRaises(KeyError):
+            read_channel_from_bundle(bundle_path, manifest_path, "20240101_部屋3")
+
+        # バンドル全体は普通の .gz として展開できる
+        with gzip.open(bundle_path, "rt", encoding="utf-8") as f:
+            self.assertEqual(f.read(), "# 部屋1\nこんにちは\n# 別ギルドの部屋1\n# 部屋2\n")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,53 @@
+import asyncio
+import copy
+import datetime
+import unittest
+import pytz
+from discord.ext import commands
+from bench.fakes import FakeHTTP, FakeGuild
+from config import CATEGORY_NAME, intents
+from utils.channel_manager import ChannelManager
+from utils.helpers import normalize_text_channel_name
+
+jst = pytz.timezone("Asia/Tokyo")
+
+
+class ChannelRenameTest(unittest.TestCase):
+    def test_renamed_channel_is_not_found_by_old_name(self):
+        asyncio.run(self._renamed_channel_is_not_found_by_old_name())
+
+    async def _renamed_channel_is_not_found_by_old_name(self):
+        guild = FakeGuild(FakeHTTP(latency=0.0, jitter=0.0))
+        voice = guild.add_voice_channel("部屋1", guild.add_category("ボイス"))
+        category = guild.add_category(CATEGORY_NAME)
+        today = datetime.datetime.now(jst).strftime("%Y%m%d")
+        text = guild.add_text_channel(f"{today}_{normalize_text_channel_name(voice.name)}", category)
+
+        manager = ChannelManager(commands.Bot(command_prefix="!", intents=intents))
+        manager.index_guild(guild)
+        self.assertIs(await manager.get_or_create_text_channel(guild, voice), text)
+
+        # discord.py と同じく before は複製を渡す
+        before = copy.copy(text)
+        text.name = f"{today}_renamed"
+        await manager.on_guild_channel_update(before, text)
+
+        channel = await manager.get_or_create_text_channel(guild, voice)
+        self.assertIsNot(channel, text)
+        self.assertEqual(channel.name, f"{today}_{normalize_text_channel_name(voice.name)}")
+
+
+class ArchiveCatalogTest(unittest.TestCase):
+    def test_invalid_dates_are_not_cataloged(self):
+        guild = FakeGuild(FakeHTTP(latency=0.0, jitter=0.0))
+        category = guild.add_category(CATEGORY_NAME)
+        guild.add_text_channel("20241399_部屋1", category)
+        valid = guild.add_text_channel("20240101_部屋1", category)
+
+        manager = ChannelManager(commands.Bot(command_prefix="!", intents=intents))
+        manager.index_guild(guild)
+        self.assertEqual(manager.archive_catalog.before(guild.id, "20991231"), [("20240101", valid)])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,166 @@
+import json
+import os
+import re
+import tempfile
+import threading
+import unittest
+from email.utils import formatdate
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest import mock
+from utils import drive_uploader
+from utils.drive_uploader import DriveUploader
+
+
+class FakeDrive:
+    """Drive API の代わり（multipart・再開可能アップロード、指定回数の 503 を返す）"""
+    def __init__(self):
+        self.files = {}  # {ファイルID: 内容}
+        self.sessions = {}  # {セッションID: 受信済みバイト列}
+        self.fail_next = []  # 次のリクエストに返すエラー [(ステータス, Retry-After)]
+        self.fail_puts = set()  # 503 を返す PUT の番号（1 始まり）
+        self.requests = []
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), self._handler())
+        self.base = f"http://127.0.0.1:{self.server.server_port}"
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def _handler(self):
+        drive = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def _reply(self, status, body=b"", headers=None):
+                self.send_response(status)
+                for name, value in (headers or {}).items():
+                    self.send_header(name, value)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def _body(self):
+                return self.rfile.read(int(self.headers.get("Content-Length", 0)))
+
+            def _fail(self):
+                if not drive.fail_next:
+                    return False
+                status, retry_after = drive.fail_next.pop(0)
+                self._reply(status, headers={"Retry-After": retry_after} if retry_after else None)
+                return True
+
+            def _created(self, content, file_id=None):
+                file_id = file_id or f"file{len(drive.files) + 1}"
+                drive.files[file_id] = content
+                self._reply(200, json.dumps({"id": file_id}).encode())
+
+            def do_PATCH(self):
+                self.do_POST()
+
+            def do_POST(self):
+                body = self._body()
+                drive.requests.append((self.command, self.path))
+                if self._fail():
+                    return
+                # PATCH /upload/drive/v3/files/<ID> は既存ファイルの置き換え
+                target = re.search(r"/files/([^/?]+)", self.path)
+                if "uploadType=multipart" in self.path:
+                    # メタデータと内容の2パート。内容は2つ目の空行の後ろから最後の境界まで
+                    boundary = re.search(r"boundary=(\S+)", self.headers["Content-Type"]).group(1).encode()
+                    part = body.split(b"--" + boundary)[2]
+                    self._created(part.split(b"\r\n\r\n", 1)[1][:-2], target and target.group(1))
+                else:
+                    session_id = str(len(drive.sessions) + 1)
+                    drive.sessions[session_id] = b""
+                    self._reply(200, headers={"Location": f"{drive.base}/session/{session_id}"})
+
+            def do_PUT(self):
+                body = self._body()
+                drive.requests.append(("PUT", self.path))
+                if sum(1 for method, _ in drive.requests if method == "PUT") in drive.fail_puts:
+                    drive.fail_next.append((503, None))
+                if self._fail():
+                    return
+                session_id = self.path.rsplit("/", 1)[1]
+                received = drive.sessions[session_id]
+                content_range = self.headers["Content-Range"]
+                status_only = re.match(r"bytes \*/(\d+)", content_range)
+                if status_only:
+                    size = int(status_only.group(1))
+                else:
+                    start, _, size = map(int, re.match(r"bytes (\d+)-(\d+)/(\d+)", content_range).groups())
+                    received = drive.sessions[session_id] = received[:start] + body
+                if len(received) >= size:
+                    self._created(received)
+                else:
+                    self._reply(308, headers={"Range": f"bytes=0-{len(received) - 1}"} if received else None)
+
+        return Handler
+
+
+class DriveUploaderTest(unittest.TestCase):
+    def setUp(self):
+        self.drive = FakeDrive()
+        self.uploader = DriveUploader(api_base=self.drive.base, token_provider=lambda: "token")
+        self.tmpdir = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.uploader.close()
+        self.drive.close()
+        self.tmpdir.cleanup()
+
+    def write(self, name, content):
+        path = os.path.join(self.tmpdir.name, name)
+        with open(path, "wb") as f:
+            f.write(content)
+        return path
+
+    def test_simple_upload_retries_with_http_date_retry_after(self):
+        path = self.write("a.md", "こんにちは".encode("utf-8"))
+        self.drive.fail_next = [(503, formatdate(usegmt=True))]  # HTTP 日付形式（すぐ再試行してよい）
+        with mock.patch.object(drive_uploader.time, "sleep") as sleep:
+            file_id = self.uploader.upload_file(path, "folder")
+        self.assertEqual(self.drive.files[file_id], "こんにちは".encode("utf-8"))
+        sleep.assert_called_once()
+        self.assertLessEqual(sleep.call_args.args[0], 1.0)
+
+    def test_unparsable_retry_after_falls_back_to_exponential_backoff(self):
+        self.assertIsNone(DriveUploader._retry_after_seconds("soon"))
+        self.assertEqual(DriveUploader._retry_after_seconds("3"), 3.0)
+        with mock.patch.object(drive_uploader.time, "sleep") as sleep:
+            self.uploader._backoff(2, "soon")
+        self.assertGreaterEqual(sleep.call_args.args[0], 4)
+
+    def test_resumable_upload_resumes_after_503(self):
+        content = os.urandom(5000)
+        path = self.write("big.md.gz", content)
+        with mock.patch.object(drive_uploader, "RESUMABLE_THRESHOLD", 1000), \
+                mock.patch.object(drive_uploader, "CHUNK_SIZE", 1024), \
+                mock.patch.object(drive_uploader.time, "sleep"):
+            self.drive.fail_puts = {3}  # 3つ目のチャンクで失敗させる
+            file_id = self.uploader.upload_file(path, "folder", mime_type="application/gzip")
+        self.assertEqual(self.drive.files[file_id], content)
+        # 失敗後は受信済みの位置を問い合わせてから続きを送る（最初からは送り直さない）
+        self.assertEqual(sum(1 for method, _ in self.drive.requests if method == "PUT"), 7)
+
+    def test_upload_with_file_id_replaces_the_existing_file(self):
+        path = self.write("20240101.md.gz", b"first")
+        file_id = self.uploader.upload_file(path, "folder")
+        self.write("20240101.md.gz", b"second")
+        self.assertEqual(self.uploader.upload_file(path, "folder", file_id=file_id), file_id)
+        self.assertEqual(self.drive.files, {file_id: b"second"})
+        self.assertEqual(self.drive.requests[-1][0], "PATCH")
+
+    def test_auth_failure_is_raised_as_upload_error(self):
+        uploader = DriveUploader(api_base=self.drive.base)
+        self.addCleanup(uploader.close)
+        with mock.patch.object(uploader, "_authenticate", side_effect=RuntimeError("invalid_grant")):
+            with self.assertRaises(drive_uploader.DriveUploadError):
+                uploader.upload_file(self.write("a.md", b"x"), "folder")
+
+
+if __name__ == "__main__":
+    unittest.main()
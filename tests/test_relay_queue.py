@@ -0,0 +1,43 @@
+import asyncio
+import unittest
+import discord
+from utils.relay_queue import RelayQueue
+
+
+class FlakyChannel:
+    """最初の send だけ接続エラーにするチャンネル"""
+    def __init__(self, error):
+        self.id = 1
+        self.name = "20240101_部屋1"
+        self.error = error
+        self.sent = []
+
+    async def send(self, embeds=None):
+        if self.error is not None:
+            error, self.error = self.error, None
+            raise error
+        self.sent.append(embeds)
+        return embeds
+
+
+class RelayQueueTest(unittest.TestCase):
+    def test_non_http_error_fails_the_batch_and_keeps_the_worker(self):
+        asyncio.run(self._non_http_error_fails_the_batch_and_keeps_the_worker())
+
+    async def _non_http_error_fails_the_batch_and_keeps_the_worker(self):
+        relay = RelayQueue(batch_window=0.01)
+        channel = FlakyChannel(ConnectionResetError("connection reset"))
+        first = relay.enqueue(channel, [discord.Embed(description="1")])
+        with self.assertRaises(ConnectionResetError):
+            await asyncio.wait_for(first, timeout=1)
+
+        # 同じワーカーで後続のメッセージも送信される
+        second = relay.enqueue(channel, [discord.Embed(description="2")])
+        sent = await asyncio.wait_for(second, timeout=1)
+        self.assertEqual([embed.description for embed in sent], ["2"])
+        self.assertEqual(len(channel.sent), 1)
+        await relay.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,31 @@
+import asyncio
+import unittest
+from utils.voice_coalescer import VoiceEventCoalescer, VoiceEvent
+
+
+class VoiceEventCoalescerTest(unittest.TestCase):
+    def test_flushes_for_a_guild_do_not_overlap(self):
+        asyncio.run(self._flushes_for_a_guild_do_not_overlap())
+
+    async def _flushes_for_a_guild_do_not_overlap(self):
+        calls = []
+        running = 0
+
+        async def flush(guild_id, events):
+            nonlocal running
+            running += 1
+            self.assertEqual(running, 1)  # 前の送信が終わる前に次が始まらない
+            await asyncio.sleep(0.05)
+            calls.append([event.kind for event in events])
+            running -= 1
+
+        coalescer = VoiceEventCoalescer(flush, window=0.01)
+        coalescer.add(1, VoiceEvent("join", None, None, None))
+        await asyncio.sleep(0.02)  # 1つ目の送信中に次の窓が閉じる
+        coalescer.add(1, VoiceEvent("leave", None, None, None))
+        await asyncio.sleep(0.2)
+        self.assertEqual(calls, [["join"], ["leave"]])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,67 @@
+import gzip
+import json
+import os
+import shutil
+
+BUNDLE_SUFFIX = ".md.gz"
+MANIFEST_SUFFIX = ".manifest.json"
+
+
+def bundle_paths(archive_dir, date_str):
+    """日付ごとのバンドルと目録のパス"""
+    bundle_dir = os.path.join(archive_dir, "bundles")
+    return (
+        os.path.join(bundle_dir, f"{date_str}{BUNDLE_SUFFIX}"),
+        os.path.join(bundle_dir, f"{date_str}{MANIFEST_SUFFIX}"),
+    )
+
+
+def write_day_bundle(archive_dir, date_str, sources):
+    """1日分の Markdown を1つの gzip バンドルにまとめる
+
+    sources: [(チャンネルID, チャンネル名, Markdown のパス)]（チャンネルID は "ギルドID:チャンネルID" でもよい）
+    チャンネルごとに独立した gzip メンバーとして連結するので、
+    ファイル全体は普通の .gz として展開でき、目録のオフセットを使えば
+    1チャンネルだけを取り出すこともできる。
+    """
+    bundle_path, manifest_path = bundle_paths(archive_dir, date_str)
+    os.makedirs(os.path.dirname(bundle_path), exist_ok=True)
+
+    manifest = {"date": date_str, "bundle": os.path.basename(bundle_path), "channels": {}}
+    tmp_path = f"{bundle_path}.tmp"
+    with open(tmp_path, "wb") as out:
+        for channel_id, channel_name, md_path in sources:
+            start = out.tell()
+            with open(md_path, "rb") as src, gzip.GzipFile(
+                filename=os.path.basename(md_path), mode="wb", fileobj=out, mtime=0
+            ) as gz:
+                shutil.copyfileobj(src, gz)
+            # 別のギルドに同名のチャンネルがあれば ID を付けて区別する
+            name = channel_name if channel_name not in manifest["channels"] else f"{channel_name} ({channel_id})"
+            manifest["channels"][name] = {
+                "channel_id": str(channel_id).rsplit(":", 1)[-1],  # 状態のキー（"ギルドID:チャンネルID"）でも可
+                "offset": start,
+                "length": out.tell() - start,
+                "size": os.path.getsize(md_path),
+            }
+    os.replace(tmp_path, bundle_path)
+
+    with open(f"{manifest_path}.tmp", "w", encoding="utf-8") as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2)
+    os.replace(f"{manifest_path}.tmp", manifest_path)
+    return bundle_path, manifest_path
+
+
+def read_channel_from_bundle(bundle_path, manifest_path, channel_name):
+    """バンドルから1チャンネル分の Markdown だけを取り出す"""
+    with open(manifest_path, "r", encoding="utf-8") as f:
+        manifest = json.load(f)
+
+    entry = manifest["channels"].get(channel_name)
+    if entry is None:
+        raise KeyError(f"{channel_name} はバンドルに含まれていません")
+
+    with open(bundle_path, "rb") as f:
+        f.seek(entry["offset"])
+        data = f.read(entry["length"])
+    return gzip.decompress(data).decode("utf-8")
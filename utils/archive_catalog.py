@@ -0,0 +1,49 @@
+import bisect
+
+
+class ArchiveCatalog:
+    """日付付きテキストチャンネルを日付順に保持するカタログ
+
+    ギルドごとに (日付, チャンネルID) のソート済みリストを持ち、
+    「ある日付より前」などの範囲検索を二分探索で行う。
+    """
+    def __init__(self):
+        self._keys = {}  # {ギルドID: [(日付, チャンネルID)]}（ソート済み）
+        self._channels = {}  # {チャンネルID: (ギルドID, 日付, チャンネル)}
+
+    def add(self, guild_id, date_str, channel):
+        if channel.id in self._channels:
+            self.remove(channel.id)
+        bisect.insort(self._keys.setdefault(guild_id, []), (date_str, channel.id))
+        self._channels[channel.id] = (guild_id, date_str, channel)
+
+    def remove(self, channel_id):
+        entry = self._channels.pop(channel_id, None)
+        if entry is None:
+            return
+        guild_id, date_str, _ = entry
+        keys = self._keys.get(guild_id, [])
+        i = bisect.bisect_left(keys, (date_str, channel_id))
+        if i < len(keys) and keys[i] == (date_str, channel_id):
+            del keys[i]
+
+    def clear_guild(self, guild_id):
+        for _, channel_id in self._keys.pop(guild_id, []):
+            self._channels.pop(channel_id, None)
+
+    def _slice(self, guild_id, lo, hi):
+        return [(date_str, self._channels[channel_id][2]) for date_str, channel_id in self._keys.get(guild_id, [])[lo:hi]]
+
+    def before(self, guild_id, date_str, inclusive=False):
+        """`date_str` より前（inclusive なら当日も含む）のチャンネルを [(日付, チャンネル)] で返す"""
+        keys = self._keys.get(guild_id, [])
+        # チャンネルIDは正の整数なので、(日付, 0) / (日付, inf) で日付の境界を探せる
+        hi = bisect.bisect_right(keys, (date_str, float("inf"))) if inclusive else bisect.bisect_left(keys, (date_str, 0))
+        return self._slice(guild_id, 0, hi)
+
+    def get(self, channel_id):
+        entry = self._channels.get(channel_id)
+        return entry[2] if entry else None
+
+    def __len__(self):
+        return len(self._channels)
@@ -0,0 +1,231 @@
+import os
+import json
+import asyncio
+import discord
+import pytz
+from utils.logging_setup import get_logger
+
+logger = get_logger("archive")
+
+jst = pytz.timezone("Asia/Tokyo")
+
+ARCHIVE_DIR = "archive"
+EXPORT_STATE_FILE = "export_state.json"
+STATE_SAVE_INTERVAL = 100  # history() の1ページ分ごとに進捗を保存
+
+
+def format_message_markdown(message):
+    """1メッセージを Markdown に変換（転記 embed は本文・画像も展開）"""
+    created = message.created_at.astimezone(jst).strftime("%Y/%m/%d %H:%M:%S")
+    lines = [f"### {message.author.display_name} ({created})"]
+
+    if message.content:
+        lines.append(message.content)
+
+    for embed in message.embeds:
+        if embed.author and embed.author.name:
+            lines.append(f"**{embed.author.name}**")
+        if embed.title:
+            lines.append(f"**{embed.title}**")
+        if embed.description:
+            lines.append(embed.description)
+        if embed.image and embed.image.url:
+            lines.append(f"![image]({embed.image.url})")
+
+    for attachment in message.attachments:
+        lines.append(f"[{attachment.filename}]({attachment.url})")
+
+    return "\n\n".join(lines) + "\n\n"
+
+
+def state_key(guild_id, channel_id):
+    """エクスポート状態のキー（"ギルドID:チャンネルID"）"""
+    return f"{guild_id}:{channel_id}"
+
+
+class ArchiveExporter:
+    """日付付きテキストチャンネルの履歴を Markdown ファイルへ逐次書き出す
+
+    チャンネルごとに「どのメッセージIDまで書いたか」とファイル位置を記録するので、
+    途中で止まっても続きから再開できる（書き出し済みの履歴は再取得しない）。
+    ファイルへの書き込みと状態の保存はスレッドで行い、イベントループを止めない。
+    """
+    def __init__(self, archive_dir=ARCHIVE_DIR):
+        self.archive_dir = archive_dir
+        self.state_path = os.path.join(archive_dir, EXPORT_STATE_FILE)
+        state = self._load_state()
+        self.state = state["channels"]  # {"ギルドID:チャンネルID": {path, date, last_message_id, offset, done, ...}}
+        # {日付: {path, manifest, drive_file_id, manifest_drive_file_id, stale}}（stale: アップロード後に作り直した）
+        self.bundles = state["bundles"]
+
+    def _load_state(self):
+        state = {}
+        if os.path.exists(self.state_path):
+            try:
+                with open(self.state_path, "r", encoding="utf-8") as f:
+                    state = json.load(f)
+            except (OSError, ValueError) as e:
+                logger.error("[ERROR] エクスポート状態の読み込みに失敗: %s", e, exc_info=True)
+        if "channels" not in state:
+            state = {"channels": state, "bundles": {}}  # 旧形式（チャンネルのみ）
+        return state
+
+    def _save_state(self):
+        self._write_state(self._dump_state())
+
+    async def _save_state_async(self):
+        # JSON の組み立てはループ上で（書き込み中に状態が変わらないように）、書き込みだけスレッドで
+        await asyncio.to_thread(self._write_state, self._dump_state())
+
+    def _dump_state(self):
+        return json.dumps({"channels": self.state, "bundles": self.bundles}, ensure_ascii=False)
+
+    def _write_state(self, text):
+        """書きかけのファイルを残さないよう、一時ファイル経由で置き換える"""
+        os.makedirs(self.archive_dir, exist_ok=True)
+        tmp_path = f"{self.state_path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(text)
+        os.replace(tmp_path, self.state_path)
+
+    def export_path(self, channel, date_str):
+        """<日付>/<ギルドID>/<チャンネル名>.md（別のギルドの同名チャンネルと衝突しないように）"""
+        return os.path.join(self.archive_dir, date_str, str(channel.guild.id), f"{channel.name}.md")
+
+    def _entry(self, guild_id, channel_id):
+        # 旧形式（チャンネルIDのみのキー）の記録も参照する
+        return self.state.get(state_key(guild_id, channel_id)) or self.state.get(str(channel_id))
+
+    def is_done(self, guild_id, channel_id):
+        entry = self._entry(guild_id, channel_id)
+        return bool(entry and entry.get("done"))
+
+    def unbundled_by_date(self, channel_names):
+        """書き出し済みでまだバンドルしていないチャンネルを日付ごとに返す
+
+        channel_names: {状態のキー: チャンネル名}（目録に載せる名前）
+        戻り値: {日付: [(状態のキー, チャンネル名, パス)]}
+        """
+        by_date = {}
+        for key, entry in self.state.items():
+            if entry.get("done") and not entry.get("bundled") and entry.get("date"):
+                name = channel_names.get(key) or os.path.splitext(os.path.basename(entry["path"]))[0]
+                by_date.setdefault(entry["date"], []).append((key, name, entry["path"]))
+        return by_date
+
+    def mark_bundled(self, date_str, keys, bundle_path, manifest_path):
+        for key in keys:
+            self.state[key]["bundled"] = True
+        # 作り直した場合も Drive のファイルIDは残し、同じファイルを置き換える（重複させない）
+        previous = self.bundles.get(date_str) or {}
+        self.bundles[date_str] = {
+            "path": bundle_path,
+            "manifest": manifest_path,
+            "drive_file_id": previous.get("drive_file_id"),
+            "manifest_drive_file_id": previous.get("manifest_drive_file_id"),
+            "stale": ["bundle", "manifest"],
+        }
+        self._save_state()
+
+    def pending_uploads(self):
+        """アップロードが必要なファイル [(記録先キー, パス, 置き換える Drive のファイルID)]
+
+        バンドル済みのチャンネルは個別に上げない。作り直したバンドルは既存のファイルを置き換える。
+        """
+        pending = [
+            (("channel", key), entry["path"], None)
+            for key, entry in self.state.items()
+            if entry.get("done") and not entry.get("bundled") and not entry.get("drive_file_id")
+        ]
+        for date_str, bundle in self.bundles.items():
+            stale = bundle.get("stale", [])
+            if not bundle.get("drive_file_id") or "bundle" in stale:
+                pending.append((("bundle", date_str), bundle["path"], bundle.get("drive_file_id")))
+            if not bundle.get("manifest_drive_file_id") or "manifest" in stale:
+                pending.append((("manifest", date_str), bundle["manifest"], bundle.get("manifest_drive_file_id")))
+        return pending
+
+    def mark_uploaded(self, upload_key, drive_file_id):
+        kind, key = upload_key
+        if kind == "channel" and key in self.state:
+            self.state[key]["drive_file_id"] = drive_file_id
+        elif kind in ("bundle", "manifest") and key in self.bundles:
+            bundle = self.bundles[key]
+            bundle["drive_file_id" if kind == "bundle" else "manifest_drive_file_id"] = drive_file_id
+            if kind in bundle.get("stale", []):
+                bundle["stale"].remove(kind)
+        self._save_state()
+
+    async def export_channel(self, channel, date_str):
+        """チャンネルの履歴を古い順に Markdown へ書き出し、ファイルパスを返す"""
+        key = state_key(channel.guild.id, channel.id)
+        entry = self._entry(channel.guild.id, channel.id)
+        if entry and entry.get("done"):
+            return entry["path"]
+
+        if entry is None:
+            entry = self.state[key] = {
+                "path": self.export_path(channel, date_str),
+                "date": date_str,
+                "last_message_id": None,
+                "offset": 0,
+                "done": False,
+            }
+
+        path = entry["path"]
+        resume_offset = entry["offset"] if entry["last_message_id"] is not None else None
+        f, resumed = await asyncio.to_thread(self._open, path, resume_offset)
+        try:
+            chunk = []
+            if resumed:
+                after = discord.Object(id=int(entry["last_message_id"]))
+                logger.debug("[ARCHIVE EXPORT] %s をメッセージID %s の続きから再開", channel.name, entry["last_message_id"])
+            else:
+                chunk.append(f"# {channel.name}\n\n")
+                after = None
+                entry["last_message_id"] = None
+
+            written = 0
+            last_message_id = entry["last_message_id"]
+            async for message in channel.history(limit=None, after=after, oldest_first=True):
+                chunk.append(format_message_markdown(message))
+                last_message_id = str(message.id)
+                written += 1
+
+                if written % STATE_SAVE_INTERVAL == 0:
+                    # ファイル位置とメッセージIDは必ず同時に記録する
+                    entry["offset"] = await asyncio.to_thread(self._write_chunk, f, chunk)
+                    entry["last_message_id"] = last_message_id
+                    chunk = []
+                    await self._save_state_async()
+
+            entry["offset"] = await asyncio.to_thread(self._write_chunk, f, chunk)
+            entry["last_message_id"] = last_message_id
+        finally:
+            await asyncio.to_thread(f.close)
+
+        entry["done"] = True
+        await self._save_state_async()
+        logger.debug("[ARCHIVE EXPORT] %s を %s に書き出しました（今回 %d 件）", channel.name, path, written)
+        return path
+
+    @staticmethod
+    def _open(path, offset):
+        """書き出し先を開いて (ファイル, 続きから書くか) を返す
+
+        offset があれば、そこより後ろ（未確定の書き込み）を切り捨てて続きから書く。
+        """
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        if offset is not None and os.path.exists(path):
+            f = open(path, "r+", encoding="utf-8", newline="")
+            f.seek(offset)
+            f.truncate()
+            return f, True
+        return open(path, "w", encoding="utf-8", newline=""), False
+
+    @staticmethod
+    def _write_chunk(f, parts):
+        """まとめて書き込んでファイル位置を返す"""
+        f.write("".join(parts))
+        f.flush()
+        return f.tell()
@@ -0,0 +1,99 @@
+import asyncio
+import os
+import discord
+from utils.archive_exporter import ArchiveExporter, state_key
+from utils.archive_bundle import write_day_bundle
+from utils.drive_uploader import get_drive_uploader, DriveUploadError
+from utils.logging_setup import get_logger
+from config import GOOGLE_DRIVE_FOLDER_ID, ARCHIVE_BUNDLE
+
+logger = get_logger("archive")
+
+
+class ArchivePipeline:
+    """アーカイブの書き出し → 日付ごとのバンドル → Google Drive へのアップロード
+
+    チャンネルは ID で受け取り、書き出しが必要なものだけ `get_channel` で取得する。
+    Bot のプロセス内（キャッシュから取得）でも、ワーカープロセス（REST で取得）でも同じように動く。
+    """
+    def __init__(self, exporter=None):
+        self.exporter = exporter or ArchiveExporter()
+
+    async def run(self, targets, get_channel):
+        """targets: [(日付, ギルドID, チャンネルID, チャンネル名)]、get_channel: チャンネルID → チャンネルのコルーチン関数
+
+        書き出したファイルのパスを返す（書き出し済みのチャンネルはスキップ）
+        """
+        exported = []
+        channel_names = {}
+        for date_str, guild_id, channel_id, channel_name in targets:
+            channel_names[state_key(guild_id, channel_id)] = channel_name
+            if self.exporter.is_done(guild_id, channel_id):
+                continue
+            try:
+                channel = await get_channel(channel_id)
+                if channel is None:
+                    continue
+                path = await self.exporter.export_channel(channel, date_str)
+                exported.append(path)
+            except discord.HTTPException as e:
+                logger.error("[ERROR] %s のエクスポートに失敗: %s", channel_name, e, exc_info=True)
+
+        if ARCHIVE_BUNDLE:
+            await self.bundle_archives(channel_names)
+        if GOOGLE_DRIVE_FOLDER_ID:
+            await self.upload_archives()
+        return exported
+
+    async def bundle_archives(self, channel_names):
+        """書き出し済みの Markdown を日付ごとに1つの圧縮バンドルへまとめる"""
+        for date_str, sources in self.exporter.unbundled_by_date(channel_names).items():
+            # 既にバンドル済みの日付に追加分があれば、まとめて作り直す
+            previous = self.exporter.bundles.get(date_str)
+            if previous:
+                sources += [
+                    (key, channel_names.get(key) or os.path.splitext(os.path.basename(entry["path"]))[0], entry["path"])
+                    for key, entry in self.exporter.state.items()
+                    if entry.get("date") == date_str and entry.get("bundled")
+                ]
+            try:
+                bundle_path, manifest_path = await asyncio.to_thread(
+                    write_day_bundle, self.exporter.archive_dir, date_str, sources
+                )
+            except OSError as e:
+                logger.error("[ERROR] %s のバンドル作成に失敗: %s", date_str, e, exc_info=True)
+                continue
+            self.exporter.mark_bundled(date_str, [key for key, _, _ in sources], bundle_path, manifest_path)
+            logger.debug("[ARCHIVE BUNDLE] %s: %d チャンネルを %s にまとめました", date_str, len(sources), bundle_path)
+
+    async def upload_archives(self):
+        """書き出し済みのアーカイブを Google Drive へアップロード（スレッドプールで並行実行）"""
+        pending = self.exporter.pending_uploads()
+        if not pending:
+            return 0
+
+        uploader = get_drive_uploader()
+        results = await asyncio.gather(
+            *(uploader.upload(path, GOOGLE_DRIVE_FOLDER_ID, mime_type=self._mime_type(path), file_id=file_id)
+              for _, path, file_id in pending),
+            return_exceptions=True
+        )
+
+        uploaded = 0
+        for (upload_key, path, _), result in zip(pending, results):
+            if isinstance(result, (DriveUploadError, OSError)):
+                logger.error("[ERROR] %s のアップロードに失敗: %s", path, result, exc_info=result)
+            elif isinstance(result, BaseException):
+                raise result
+            else:
+                self.exporter.mark_uploaded(upload_key, result)
+                uploaded += 1
+        return uploaded
+
+    @staticmethod
+    def _mime_type(path):
+        if path.endswith(".gz"):
+            return "application/gzip"
+        if path.endswith(".json"):
+            return "application/json"
+        return "text/markdown"
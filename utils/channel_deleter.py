@@ -0,0 +1,60 @@
+import asyncio
+import time
+import discord
+from utils.rate_limit import RateLimiter
+from utils.logging_setup import get_logger
+
+logger = get_logger("archive")
+
+
+class ProgressMessage:
+    """1つのメッセージを編集して進捗を表示（編集は一定間隔ごとに間引く）"""
+    def __init__(self, message, min_interval=2.0):
+        self.message = message
+        self.min_interval = min_interval
+        self._last_edit = 0.0
+
+    async def update(self, content, force=False):
+        if self.message is None:
+            return
+        now = time.monotonic()
+        if not force and now - self._last_edit < self.min_interval:
+            return
+        self._last_edit = now
+        try:
+            await self.message.edit(content=content)
+        except discord.HTTPException as e:
+            logger.debug("[PROGRESS] 進捗メッセージの更新に失敗: %s", e)
+
+
+class ChannelDeleteExecutor:
+    """チャンネルを同時実行数を絞って並行削除し、チャンネルごとの結果を返す"""
+    def __init__(self, concurrency=4, limiter=None):
+        self.limiter = limiter or RateLimiter(concurrency=concurrency)
+
+    async def delete_channels(self, channels, progress=None, reason=None):
+        """戻り値: {"succeeded": [チャンネル名], "already_deleted": [チャンネル名], "failed": [(チャンネル名, 理由)]}"""
+        succeeded = []
+        already_deleted = []  # 実行前に削除されていた（件数には含めない）
+        failed = []
+        total = len(channels)
+
+        async def delete_one(channel):
+            try:
+                await self.limiter.run(lambda: channel.delete(reason=reason))
+                succeeded.append(channel.name)
+                logger.debug("[ARCHIVE DELETED] %s を削除しました。", channel.name)
+            except discord.NotFound:
+                already_deleted.append(channel.name)
+            except discord.Forbidden:
+                failed.append((channel.name, "削除権限がありません"))
+            except (discord.HTTPException, discord.RateLimited) as e:
+                failed.append((channel.name, str(e)))
+                logger.debug("⚠ %s の削除に失敗: %s", channel.name, e)
+
+            if progress is not None:
+                done = len(succeeded) + len(already_deleted) + len(failed)
+                await progress.update(f"🗑 削除中… `{done}` / `{total}` 件（失敗 `{len(failed)}` 件）", force=(done == total))
+
+        await asyncio.gather(*(delete_one(channel) for channel in channels))
+        return {"succeeded": succeeded, "already_deleted": already_deleted, "failed": failed}
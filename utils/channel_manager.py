@@ -4,121 +4,259 @@ import pytz
 import asyncio
 import re
 from utils.helpers import normalize_text_channel_name
-from config import CATEGORY_NAME, debug_log
+from utils.lru_cache import LRUCache
+from utils.archive_catalog import ArchiveCatalog
+from utils.metrics import get_metrics
+from utils.logging_setup import get_logger
+from config import CATEGORY_NAME, CHANNEL_CACHE_SIZE, CHANNEL_CACHE_TTL
 
 jst = pytz.timezone("Asia/Tokyo")
+logger = get_logger("channel_manager")
+
+# 転記用テキストチャンネル名（YYYYMMDD_<ボイスチャンネル名>）
+DATED_CHANNEL_PATTERN = re.compile(r"^(\d{8})_(.+)$")
+
+# 転記先の解決方法ごとの件数（cache: キャッシュ / index: 既存チャンネル / created: 新規作成）
+channel_lookups = get_metrics().counter(
+    "zero_bot_channel_lookups", "転記先テキストチャンネルの解決回数", ("result",)
+)
+
+def make_index_key(guild_id, date_str, normalized_name):
+    """インデックス用のキー（Discord はテキストチャンネル名を小文字化するので合わせる）"""
+    return (guild_id, date_str, normalized_name.lower())
+
+def get_channel_manager(bot):
+    """Bot 全体で共有する ChannelManager を取得（なければ作成）"""
+    manager = getattr(bot, "channel_manager", None)
+    if manager is None:
+        manager = ChannelManager(bot)
+        bot.channel_manager = manager
+    return manager
 
 class ChannelManager:
     """ボイスチャンネルとテキストチャンネルの管理を統一"""
     def __init__(self, bot):
         self.bot = bot
-        self.voice_text_mapping = {}
-        self.max_cache_size = 10
+        # {ボイスチャンネルID: テキストチャンネル}（LRU・TTL・JST 0時で失効）
+        self.voice_text_mapping = LRUCache(max_size=CHANNEL_CACHE_SIZE, ttl=CHANNEL_CACHE_TTL)
+        self.channel_index = {}  # {(ギルドID, 日付, 正規化名): テキストチャンネル}
+        self.category_index = {}  # {ギルドID: CATEGORY_NAME のカテゴリー}
+        self.indexed_guilds = set()
+        self.archive_catalog = ArchiveCatalog()  # 日付順のカタログ（削除・エクスポート用）
+        self.pending_creations = {}  # {インデックスキー or ("category", ギルドID): 作成中の Task}
         self.cleanup_interval = 3600  # 1時間ごとにキャッシュクリア
         self.cleanup_task = None  # タスクを保持
 
+        # ✅ チャンネルの作成・削除・更新でインデックスを最新に保つ
+        bot.add_listener(self.on_ready, "on_ready")
+        bot.add_listener(self.on_guild_join, "on_guild_join")
+        bot.add_listener(self.on_guild_channel_create, "on_guild_channel_create")
+        bot.add_listener(self.on_guild_channel_delete, "on_guild_channel_delete")
+        bot.add_listener(self.on_guild_channel_update, "on_guild_channel_update")
+
+    # ---------- インデックス管理 ----------
+    def index_guild(self, guild):
+        """ギルドのキャッシュからカテゴリーと日付付きテキストチャンネルを登録"""
+        for key in [key for key in self.channel_index if key[0] == guild.id]:
+            del self.channel_index[key]
+        self.archive_catalog.clear_guild(guild.id)
+
+        category = discord.utils.get(guild.categories, name=CATEGORY_NAME)
+        if category is None:
+            self.category_index.pop(guild.id, None)
+        else:
+            self.category_index[guild.id] = category
+            for channel in category.text_channels:
+                self._add_to_index(channel)
+
+        self.indexed_guilds.add(guild.id)
+        logger.debug("[INDEX] %s: %s 件のテキストチャンネルを登録", guild.name, sum(1 for key in self.channel_index if key[0] == guild.id))
+
+    def _index_key(self, channel):
+        """CATEGORY_NAME 配下の日付付きテキストチャンネルならキーを返す"""
+        if not isinstance(channel, discord.TextChannel):
+            return None
+        category = self.category_index.get(channel.guild.id)
+        if category is None or channel.category_id != category.id:
+            return None
+        match = DATED_CHANNEL_PATTERN.match(channel.name)
+        if not match:
+            return None
+        try:
+            datetime.datetime.strptime(match.group(1), "%Y%m%d")  # 20241399 のような存在しない日付は除外
+        except ValueError:
+            return None
+        return make_index_key(channel.guild.id, match.group(1), match.group(2))
+
+    def _add_to_index(self, channel):
+        key = self._index_key(channel)
+        if key is not None:
+            self.channel_index[key] = channel
+            self.archive_catalog.add(key[0], key[1], channel)
+
+    def _remove_from_index(self, channel):
+        key = self._index_key(channel)
+        # 更新イベントの before は複製なので、同一性ではなく ID で比べる
+        indexed = self.channel_index.get(key) if key is not None else None
+        if indexed is not None and indexed.id == channel.id:
+            del self.channel_index[key]
+        self.archive_catalog.remove(channel.id)
+        # 削除・移動されたチャンネルを指すキャッシュも破棄
+        for vc_id, cached_channel in self.voice_text_mapping.items():
+            if cached_channel.id == channel.id:
+                self.voice_text_mapping.pop(vc_id)
+
+    async def on_ready(self):
+        for guild in self.bot.guilds:
+            self.index_guild(guild)
+
+    async def on_guild_join(self, guild):
+        self.index_guild(guild)
+
+    async def on_guild_channel_create(self, channel):
+        if isinstance(channel, discord.CategoryChannel):
+            if channel.name == CATEGORY_NAME and channel.guild.id not in self.category_index:
+                self.category_index[channel.guild.id] = channel
+            return
+        self._add_to_index(channel)
+
+    async def on_guild_channel_delete(self, channel):
+        if isinstance(channel, discord.CategoryChannel):
+            if self.category_index.get(channel.guild.id) is not None and self.category_index[channel.guild.id].id == channel.id:
+                self.index_guild(channel.guild)
+            return
+        self._remove_from_index(channel)
+
+    async def on_guild_channel_update(self, before, after):
+        if isinstance(after, discord.CategoryChannel):
+            # カテゴリー名の変更はギルドごと登録し直す
+            if before.name != after.name and CATEGORY_NAME in (before.name, after.name):
+                self.index_guild(after.guild)
+            return
+        if before.name != after.name or before.category_id != after.category_id:
+            self._remove_from_index(before)
+            self._add_to_index(after)
+
     async def start_cleanup_task(self):
         """Bot の起動時にキャッシュクリアタスクを開始"""
         if self.cleanup_task is None:
             self.cleanup_task = asyncio.create_task(self.cleanup_old_cache())
-        # debug_log("[TASK] キャッシュクリアタスクを開始")
+        # logger.debug("[TASK] キャッシュクリアタスクを開始")
 
     async def get_or_create_text_channel(self, guild, voice_channel):
         """ボイスチャンネルに紐づくテキストチャンネルを取得または作成"""
-        # debug_log(f"[GET_CHANNEL] {voice_channel.name} に対応するテキストチャンネルを取得または作成")
-
-        category = discord.utils.get(guild.categories, name=CATEGORY_NAME)
-
-        if category is None:
-            debug_log(f"[CREATE_CATEGORY] {CATEGORY_NAME} カテゴリが存在しないため新規作成")
-            category = await guild.create_category(CATEGORY_NAME)
+        # logger.debug("[GET_CHANNEL] %s に対応するテキストチャンネルを取得または作成", voice_channel.name)
 
         today_date = datetime.datetime.now(jst).strftime("%Y%m%d")
-        expected_channel_name = f"{today_date}_{normalize_text_channel_name(voice_channel.name)}"
+        normalized_name = normalize_text_channel_name(voice_channel.name)
+        expected_channel_name = f"{today_date}_{normalized_name}"
 
-        # debug_log(f"[EXPECTED_NAME] 期待するテキストチャンネル名: `{expected_channel_name}`")
+        # logger.debug("[EXPECTED_NAME] 期待するテキストチャンネル名: `%s`", expected_channel_name)
 
-        # キャッシュの取得と日付のチェック
+        # キャッシュの取得（日付が変わったエントリは JST 0時で失効済み）
         cached_channel = self.voice_text_mapping.get(voice_channel.id)
         if cached_channel:
-            match = re.match(r"(\d{8})_", cached_channel.name)  # YYYYMMDD_ の形式を取得
-            cached_date = match.group(1) if match else None
+            # logger.debug("[CACHE_HIT] `%s` のテキストチャンネルはキャッシュ済み: `%s`", voice_channel.name, cached_channel.name)
+            channel_lookups.inc(result="cache")
+            return cached_channel
 
-            if cached_date == today_date:
-                # debug_log(f"[CACHE_HIT] `{voice_channel.name}` のテキストチャンネルはキャッシュ済み: `{cached_channel.name}`")
-                return cached_channel
-            else:
-                # debug_log(f"[CACHE_MISMATCH] キャッシュの日付 `{cached_date}` が現在 `{today_date}` と異なるため、キャッシュを無効化")
-                del self.voice_text_mapping[voice_channel.id]
+        if guild.id not in self.indexed_guilds:
+            self.index_guild(guild)
 
-        # 既存のテキストチャンネルを検索
-        target_channel = discord.utils.get(category.text_channels, name=expected_channel_name)
+        # 既存のテキストチャンネルをインデックスから検索
+        index_key = make_index_key(guild.id, today_date, normalized_name)
+        target_channel = self.channel_index.get(index_key)
 
         if target_channel:
-            # debug_log(f"[EXISTING_CHANNEL] 既存のテキストチャンネル `{expected_channel_name}` を使用")
-            self.voice_text_mapping[voice_channel.id] = target_channel
+            # logger.debug("[EXISTING_CHANNEL] 既存のテキストチャンネル `%s` を使用", expected_channel_name)
+            self.voice_text_mapping.set(voice_channel.id, target_channel)
+            channel_lookups.inc(result="index")
         else:
-            # debug_log(f"[NEW_CHANNEL] テキストチャンネル `{expected_channel_name}` を新規作成")
-            target_channel = await guild.create_text_channel(expected_channel_name, category=category)
-            await target_channel.send(f"このテキストチャンネルは <#{voice_channel.id}> に紐づいています。")
-            self.voice_text_mapping[voice_channel.id] = target_channel
-
-        # キャッシュ管理: サイズが超過した場合、最も古いものを削除
-        if len(self.voice_text_mapping) > self.max_cache_size:
-            removed_channel_id = next(iter(self.voice_text_mapping))
-            removed_channel_name = self.voice_text_mapping[removed_channel_id].name
-            del self.voice_text_mapping[removed_channel_id]
-            # debug_log(f"[CACHE_CLEANUP] キャッシュサイズ超過のため `{removed_channel_name}` を削除")
+            # ✅ 同じチャンネルを作成中なら、その完了を待つ（重複作成を防ぐ）
+            target_channel = await self._run_once(
+                index_key,
+                lambda: self._create_text_channel(guild, voice_channel, expected_channel_name)
+            )
+            self.voice_text_mapping.set(voice_channel.id, target_channel)
+            channel_lookups.inc(result="created")
 
         # 現在のキャッシュ状態をログに出力
-        # debug_log(f"[CACHE_STATE] 現在のキャッシュ: {self._format_cache_state()}")
+        # logger.debug("[CACHE_STATE] 現在のキャッシュ: %s", self._format_cache_state())
 
         return target_channel
 
+    async def _run_once(self, key, factory):
+        """同じキーの処理が実行中ならその結果を待ち、なければ新しく開始する"""
+        task = self.pending_creations.get(key)
+        if task is None:
+            task = asyncio.create_task(factory())
+            self.pending_creations[key] = task
+            task.add_done_callback(lambda _: self.pending_creations.pop(key, None))
+        # 呼び出し元がキャンセルされても作成処理自体は止めない
+        return await asyncio.shield(task)
+
+    async def _get_or_create_category(self, guild):
+        """CATEGORY_NAME のカテゴリーを取得または作成"""
+        category = self.category_index.get(guild.id)
+        if category is None:
+            category = await self._run_once(("category", guild.id), lambda: self._create_category(guild))
+        return category
+
+    async def _create_category(self, guild):
+        logger.debug("[CREATE_CATEGORY] %s カテゴリが存在しないため新規作成", CATEGORY_NAME)
+        category = await guild.create_category(CATEGORY_NAME)
+        self.category_index[guild.id] = category
+        return category
+
+    async def _create_text_channel(self, guild, voice_channel, channel_name):
+        """テキストチャンネルを新規作成してインデックスに登録"""
+        category = await self._get_or_create_category(guild)
+        # logger.debug("[NEW_CHANNEL] テキストチャンネル `%s` を新規作成", channel_name)
+        target_channel = await guild.create_text_channel(channel_name, category=category)
+        self._add_to_index(target_channel)
+        await target_channel.send(f"このテキストチャンネルは <#{voice_channel.id}> に紐づいています。")
+        return target_channel
+
     async def cleanup_old_cache(self):
         """定期的に古いキャッシュを削除するタスク"""
         try:
             while True:
                 await asyncio.sleep(self.cleanup_interval)
 
-                all_voice_channels = {vc.id for guild in self.bot.guilds for vc in guild.voice_channels}
-                removed_channels = []
+                expired_count = self.voice_text_mapping.purge_expired()
 
-                for vc_id in list(self.voice_text_mapping.keys()):
-                    if vc_id not in all_voice_channels:
-                        del self.voice_text_mapping[vc_id]
+                # キャッシュにあるボイスチャンネルだけ存在確認（全ギルドは走査しない）
+                removed_channels = []
+                for vc_id in self.voice_text_mapping.keys():
+                    if self.bot.get_channel(vc_id) is None:
+                        self.voice_text_mapping.pop(vc_id)
                         removed_channels.append(vc_id)
 
-                if removed_channels:
-                    debug_log(f"[CACHE_CLEANUP] {len(removed_channels)} 件の古いキャッシュを削除しました")
-
-                if len(self.voice_text_mapping) > self.max_cache_size:
-                    excess = len(self.voice_text_mapping) - self.max_cache_size
-                    for _ in range(excess):
-                        removed_channel_id = next(iter(self.voice_text_mapping))
-                        removed_channel_name = self.voice_text_mapping[removed_channel_id].name
-                        del self.voice_text_mapping[removed_channel_id]
-
-                    # debug_log(f"[CACHE_CLEANUP] キャッシュサイズが上限 ({self.max_cache_size}) を超えたため、{excess} 件を削除しました")
+                if expired_count or removed_channels:
+                    logger.debug("[CACHE_CLEANUP] 失効 %s 件・削除済みVC %s 件のキャッシュを削除しました", expired_count, len(removed_channels))
 
                 # キャッシュクリア後の状態を出力
-                # debug_log(f"[CACHE_STATE] キャッシュクリア後の状態: {self._format_cache_state()}")
+                # logger.debug("[CACHE_STATE] キャッシュクリア後の状態: %s", self._format_cache_state())
 
         except asyncio.CancelledError:
-            debug_log("[CLEANUP TASK] Bot の終了を検知、タスクを停止します")
+            logger.debug("[CLEANUP TASK] Bot の終了を検知、タスクを停止します")
 
     async def stop_cleanup_task(self):
         """Bot のシャットダウン時にタスクを停止"""
         if self.cleanup_task:
-            # debug_log("[CLEANUP TASK] タスクをキャンセルします")
+            # logger.debug("[CLEANUP TASK] タスクをキャンセルします")
             self.cleanup_task.cancel()
             try:
                 await self.cleanup_task
             except asyncio.CancelledError:
-                debug_log("[CLEANUP TASK] タスクが正常にキャンセルされました")
+                logger.debug("[CLEANUP TASK] タスクが正常にキャンセルされました")
 
     def _format_cache_state(self):
         """キャッシュの現在の状態をフォーマット"""
         if not self.voice_text_mapping:
             return "空"
         return ", ".join([f"{vc_id}: {channel.name}" for vc_id, channel in self.voice_text_mapping.items()])
+
+    def cache_stats(self):
+        """ボイス→テキストキャッシュのヒット率などを取得"""
+        return self.voice_text_mapping.stats()
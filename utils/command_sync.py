@@ -0,0 +1,39 @@
+import asyncio
+import hashlib
+import json
+from utils.kv_store import get_state_store
+
+COMMAND_HASH_KEY = "command_tree_hash"
+
+
+def _command_payload(command, tree):
+    try:
+        return command.to_dict(tree)
+    except TypeError:
+        return command.to_dict()  # 古い discord.py は引数なし
+
+
+def command_tree_hash(tree, application_id=None):
+    """グローバルに登録するコマンド定義（名前・説明・引数・権限など）のハッシュ"""
+    commands = sorted(
+        (_command_payload(command, tree) for command in tree.get_commands()),
+        key=lambda payload: (payload.get("type", 1), payload["name"]),
+    )
+    body = json.dumps({"application_id": application_id, "commands": commands},
+                      sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(body.encode("utf-8")).hexdigest()
+
+
+async def sync_command_tree(bot, force=False):
+    """前回の同期からコマンド定義が変わったときだけ tree.sync() する
+
+    同期した場合はコマンド数を、変更がなくスキップした場合は None を返す。
+    ハッシュは永続ストアに保存するので、再起動・再接続のたびに REST を呼ばない。
+    """
+    meta = await asyncio.to_thread(get_state_store().namespace, "bot_meta")
+    digest = command_tree_hash(bot.tree, bot.application_id)
+    if not force and meta.get(COMMAND_HASH_KEY) == digest:
+        return None
+    synced = await bot.tree.sync()
+    meta[COMMAND_HASH_KEY] = digest
+    return len(synced)
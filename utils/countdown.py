@@ -1,64 +1,123 @@
 import asyncio
+import time
 import discord
 from utils.messages import get_random_success_message
+from utils.logging_setup import get_logger
+from config import COUNTDOWN_SECONDS, COUNTDOWN_EDIT_INTERVAL, STOP_BUTTON_ONLY_COMMAND_USER
 
-countdown_lock = asyncio.Lock()
-countdown_active = {}
+logger = get_logger("oyanmo")
+
+
+class Countdown:
+    """モノトニック時計の締め切りで待つカウントダウン
+
+    - 残り時間は Discord の相対タイムスタンプ（`<t:unix:R>`）で表示するので、毎秒の編集は不要
+    - `edit_interval` 秒ごとの途中経過（on_tick）は別タスクで実行し、遅れても締め切りはずれない
+    - 中止はこのカウントダウン自身の `cancel()` で行う（グローバルな状態は持たない）
+    """
+    def __init__(self, seconds=COUNTDOWN_SECONDS, edit_interval=COUNTDOWN_EDIT_INTERVAL):
+        self.seconds = seconds
+        self.edit_interval = edit_interval
+        self.deadline = time.monotonic() + seconds
+        self.ends_at = int(time.time() + seconds)
+        self._cancelled = asyncio.Event()
+
+    @property
+    def relative_timestamp(self):
+        return f"<t:{self.ends_at}:R>"
+
+    def remaining(self):
+        return max(0.0, self.deadline - time.monotonic())
+
+    def cancel(self):
+        self._cancelled.set()
+
+    @property
+    def cancelled(self):
+        return self._cancelled.is_set()
+
+    async def wait(self, on_tick=None):
+        """締め切りまで待つ。最後まで待てたら True、中止されたら False"""
+        tick_task = None
+        try:
+            while not self.cancelled:
+                remaining = self.remaining()
+                if remaining <= 0:
+                    return True
+                timeout = remaining
+                if on_tick is not None and self.edit_interval:
+                    timeout = min(remaining, self.edit_interval)
+                try:
+                    await asyncio.wait_for(self._cancelled.wait(), timeout=timeout)
+                except asyncio.TimeoutError:
+                    remaining = self.remaining()
+                    # 前回の途中経過がまだ終わっていなければ今回は飛ばす
+                    if on_tick is not None and remaining > 0 and (tick_task is None or tick_task.done()):
+                        tick_task = asyncio.create_task(on_tick(remaining))
+            return False
+        finally:
+            if tick_task is not None and not tick_task.done():
+                tick_task.cancel()
 
-async def set_countdown_active(user_id, value):
-    async with countdown_lock:
-        countdown_active[user_id] = value
 
 class StopButtonView(discord.ui.View):
-    def __init__(self, target_member_id, command_user_id):
-        super().__init__(timeout=None)
-        self.target_member_id = target_member_id
+    def __init__(self, countdown, command_user_id):
+        # ✅ カウントダウン終了後まで残り続けないようにタイムアウトを付ける
+        super().__init__(timeout=countdown.seconds + 30)
+        self.countdown = countdown
         self.command_user_id = command_user_id
 
     @discord.ui.button(label="STOP", style=discord.ButtonStyle.danger)
     async def stop_button(self, interaction: discord.Interaction, button: discord.ui.Button):
-        from config import STOP_BUTTON_ONLY_COMMAND_USER
         if STOP_BUTTON_ONLY_COMMAND_USER and interaction.user.id != self.command_user_id:
             await interaction.response.send_message("❌ 停止権限がありません。", ephemeral=True)
             return
 
-        countdown_active[self.target_member_id] = False
+        self.countdown.cancel()
+        self.stop()
         await interaction.response.defer()
         # メッセージ編集は countdown_procedure 側で行うのでここでは省略
 
-async def countdown_procedure(interaction, target_member, target_channel, countdown_msg):
-    from utils.messages import completion_messages
-
-    embed = discord.Embed(
-        title="おやんも コマンド実行",
-        description=f"🔹 `{interaction.user.display_name}` が `/おやんも {target_member.display_name}` を実行しました。",
-        color=0x5865F2
-    )
-    view = StopButtonView(target_member.id, interaction.user.id)
-    await countdown_msg.edit(embed=embed, view=view)
 
-    countdown_active[target_member.id] = True
+async def run_countdown(interaction, countdown_msg, embed, subject):
+    """`subject`（表示用の対象名）のカウントダウンを表示して待つ。最後まで待てたら True、中止なら False"""
+    countdown = Countdown()
+    embed.description = f"⏳ {subject} を {countdown.relative_timestamp} に移動させます"
+    embed.set_footer(text=f"{interaction.user.display_name} が /おやんも を実行")
+    view = StopButtonView(countdown, interaction.user.id)
+    await countdown_msg.edit(embed=embed, view=view)
 
-    for i in range(10, -1, -1):
-        if not countdown_active.get(target_member.id, False):
-            embed.description = f"⏹ `{target_member.display_name}` の移動を中止しました！"
-            embed.color = 0xFF4500
-            await countdown_msg.edit(embed=embed, view=None)
-            return
+    async def show_remaining(remaining):
+        embed.description = f"⏳ {subject} を移動させます（残り約 {round(remaining)} 秒）"
+        try:
+            await countdown_msg.edit(embed=embed)
+        except discord.HTTPException as e:
+            logger.debug("[COUNTDOWN] 途中経過の編集に失敗: %s", e)
 
-        embed.description = f"⏳ `{target_member.display_name}` を移動させます: `{i}`"
-        await countdown_msg.edit(embed=embed)
-        await asyncio.sleep(1)
+    completed = await countdown.wait(on_tick=show_remaining)
+    view.stop()
 
-    if not countdown_active.get(target_member.id, False):
-        embed.description = f"⏹ `{target_member.display_name}` の移動を中止しました！"
+    if not completed:
+        embed.description = f"⏹ {subject} の移動を中止しました！"
         embed.color = 0xFF4500
         await countdown_msg.edit(embed=embed, view=None)
+    return completed
+
+
+async def countdown_procedure(interaction, target_member, target_channel, countdown_msg):
+    embed = discord.Embed(title="おやんも コマンド実行", color=0x5865F2)
+    if not await run_countdown(interaction, countdown_msg, embed, f"`{target_member.display_name}`"):
         return
 
-    await target_member.move_to(target_channel)
+    try:
+        await target_member.move_to(target_channel)
+    except discord.HTTPException as e:
+        embed.description = f"❌ `{target_member.display_name}` を移動できませんでした（ボイスチャンネルから退出済みの可能性があります）。"
+        embed.color = 0xFF4500
+        await countdown_msg.edit(embed=embed, view=None)
+        logger.debug("[COUNTDOWN] %s の移動に失敗: %s", target_member.display_name, e)
+        return
 
     embed.description = get_random_success_message(target_member.display_name)
     embed.color = 0x32CD32
     await countdown_msg.edit(embed=embed, view=None)
-    countdown_active[target_member.id] = False
@@ -1,30 +1,258 @@
-from pydrive2.auth import GoogleAuth
-from pydrive2.drive import GoogleDrive
-import os
-
-# ✅ Google Drive 認証
-def authenticate_drive():
-    gauth = GoogleAuth()
-    gauth.LoadCredentialsFile("credentials.json")  # ✅ 認証情報をロード
-
-    if gauth.credentials is None:
-        gauth.CommandLineAuth()  # ✅ 新しいターミナル認証方式
-        gauth.SaveCredentialsFile("credentials.json")  # ✅ 初回認証時に保存
-    elif gauth.access_token_expired:
-        gauth.Refresh()  # ✅ トークンが期限切れならリフレッシュ
-    else:
-        gauth.Authorize()  # ✅ 認証済みならそのまま利用
-    drive = authenticate_drive()
-
-def upload_to_drive(file_path, folder_id):
-    """Google Drive にファイルをアップロード"""
-    try:
-        file_name = os.path.basename(file_path)
-        file_drive = drive.CreateFile({"title": file_name, "parents": [{"id": folder_id}]})
-        file_drive.SetContentFile(file_path)
-        file_drive.Upload()
-        print(f"[DEBUG] {file_name} を Google Drive にアップロードしました")
-        return True
-    except Exception as e:
-        print(f"[ERROR] Google Drive アップロードエラー: {e}")
-        return False
+import asyncio
+import email.utils
+import json
+import os
+import random
+import re
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from utils.logging_setup import get_logger
+
+logger = get_logger("drive")
+
+# Google Drive API の接続先（テスト時はローカルの偽エンドポイントに向けられる）
+DRIVE_API_BASE = os.getenv("DRIVE_API_BASE", "https://www.googleapis.com")
+CREDENTIALS_FILE = "credentials.json"
+
+CHUNK_SIZE = 8 * 1024 * 1024  # 再開可能アップロードのチャンク（256KiB の倍数）
+RESUMABLE_THRESHOLD = 5 * 1024 * 1024  # これを超えるファイルは再開可能アップロード
+MAX_RETRIES = 5
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+
+class DriveUploadError(Exception):
+    """Google Drive へのアップロード失敗"""
+
+
+class DriveUploader:
+    """Google Drive へのアップロードをスレッドプールで実行するサービス
+
+    - 認証は初回だけ行い、認可済みの HTTP セッションを使い回す
+    - 大きいファイルはチャンク単位の再開可能アップロード
+    - 一時的なエラー（429 / 5xx / 通信断）は指数バックオフで再試行
+    """
+    def __init__(self, api_base=DRIVE_API_BASE, credentials_file=CREDENTIALS_FILE,
+                 max_workers=2, token_provider=None):
+        self.api_base = api_base.rstrip("/")
+        self.credentials_file = credentials_file
+        self.token_provider = token_provider  # 偽エンドポイント用にトークン取得を差し替え可能
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="drive-upload")
+        self.session = requests.Session()
+        self._auth_lock = threading.Lock()
+        self._gauth = None
+
+    # ---------- 認証 ----------
+    def _authenticate(self):
+        """credentials.json から認証（初回のみ。以前の再帰呼び出しは廃止）"""
+        from pydrive2.auth import GoogleAuth
+
+        gauth = GoogleAuth()
+        gauth.LoadCredentialsFile(self.credentials_file)
+        if gauth.credentials is None:
+            # 端末がない（定期実行・ワーカー）ときに入力待ちでスレッドを止めない
+            if not sys.stdin or not sys.stdin.isatty():
+                raise DriveUploadError(f"{self.credentials_file} に認証情報がありません。端末から一度起動して認証してください")
+            gauth.CommandLineAuth()  # ✅ 初回のみターミナル認証
+            gauth.SaveCredentialsFile(self.credentials_file)
+        elif gauth.access_token_expired:
+            gauth.Refresh()
+            gauth.SaveCredentialsFile(self.credentials_file)
+        return gauth
+
+    def _access_token(self, force_refresh=False):
+        if self.token_provider is not None:
+            return self.token_provider()
+
+        with self._auth_lock:
+            try:
+                if self._gauth is None:
+                    self._gauth = self._authenticate()
+                elif force_refresh or self._gauth.access_token_expired:
+                    self._gauth.Refresh()
+                    self._gauth.SaveCredentialsFile(self.credentials_file)
+                return self._gauth.credentials.access_token
+            except DriveUploadError:
+                raise
+            except Exception as e:
+                # pydrive2 の認証エラーもアップロード失敗として扱う（呼び出し側で個別に処理できるように）
+                raise DriveUploadError(f"Google Drive の認証に失敗: {e}") from e
+
+    # ---------- HTTP ----------
+    def _backoff(self, attempt, retry_after=None):
+        delay = self._retry_after_seconds(retry_after)
+        if delay is None:
+            delay = min(2 ** attempt, 32) + random.random()
+        time.sleep(delay)
+
+    @staticmethod
+    def _retry_after_seconds(retry_after):
+        """Retry-After（秒数 または HTTP 日付）を秒数にする。読めなければ None"""
+        if not retry_after:
+            return None
+        try:
+            return max(0.0, float(retry_after))
+        except ValueError:
+            pass
+        try:
+            when = email.utils.parsedate_to_datetime(retry_after)
+        except (TypeError, ValueError):
+            return None
+        if when is None or when.tzinfo is None:
+            return None
+        return min(max(0.0, when.timestamp() - time.time()), 60.0)
+
+    def _request(self, method, url, **kwargs):
+        """認可ヘッダー付きで送信し、一時的なエラーは再試行する"""
+        headers = kwargs.pop("headers", {})
+        refreshed = False
+        for attempt in range(MAX_RETRIES + 1):
+            headers["Authorization"] = f"Bearer {self._access_token()}"
+            try:
+                response = self.session.request(method, url, headers=headers, timeout=60, **kwargs)
+            except requests.RequestException as e:
+                if attempt == MAX_RETRIES:
+                    raise DriveUploadError(f"{method} {url} に失敗: {e}") from e
+                self._backoff(attempt)
+                continue
+
+            if response.status_code == 401 and not refreshed:
+                self._access_token(force_refresh=True)
+                refreshed = True
+                continue
+            if response.status_code in RETRY_STATUSES and attempt < MAX_RETRIES:
+                self._backoff(attempt, response.headers.get("Retry-After"))
+                continue
+            return response
+
+        raise DriveUploadError(f"{method} {url} が再試行上限に達しました")
+
+    # ---------- アップロード ----------
+    def _upload_url(self, upload_type, file_id=None):
+        """新規作成は POST /files、既存ファイルの置き換えは PATCH /files/<ID>"""
+        if file_id:
+            return "PATCH", f"{self.api_base}/upload/drive/v3/files/{file_id}?uploadType={upload_type}"
+        return "POST", f"{self.api_base}/upload/drive/v3/files?uploadType={upload_type}"
+
+    def _upload_simple(self, file_path, metadata, mime_type, file_id=None):
+        """小さいファイルは multipart で1リクエスト"""
+        boundary = f"zero-bot-{random.getrandbits(64):x}"
+        with open(file_path, "rb") as f:
+            content = f.read()
+        body = (
+            f"--{boundary}\r\nContent-Type: application/json; charset=UTF-8\r\n\r\n"
+            f"{json.dumps(metadata)}\r\n"
+            f"--{boundary}\r\nContent-Type: {mime_type}\r\n\r\n"
+        ).encode("utf-8") + content + f"\r\n--{boundary}--\r\n".encode("utf-8")
+
+        response = self._request(
+            *self._upload_url("multipart", file_id),
+            headers={"Content-Type": f"multipart/related; boundary={boundary}"},
+            data=body,
+        )
+        if response.status_code not in (200, 201):
+            raise DriveUploadError(f"アップロード失敗 ({response.status_code}): {response.text}")
+        return response.json()["id"]
+
+    def _query_offset(self, session_url, size):
+        """中断した再開可能アップロードの受信済みバイト数を問い合わせる"""
+        response = self._request("PUT", session_url, headers={"Content-Range": f"bytes */{size}"})
+        if response.status_code in (200, 201):
+            return size, response
+        if response.status_code == 308:
+            return self._parse_range(response), None
+        raise DriveUploadError(f"アップロード状態の取得に失敗 ({response.status_code}): {response.text}")
+
+    @staticmethod
+    def _parse_range(response):
+        match = re.match(r"bytes=0-(\d+)", response.headers.get("Range", ""))
+        return int(match.group(1)) + 1 if match else 0
+
+    def _upload_resumable(self, file_path, metadata, mime_type, file_id=None):
+        """大きいファイルはチャンクに分けて送信（失敗時は受信済みの位置から再開）"""
+        size = os.path.getsize(file_path)
+        response = self._request(
+            *self._upload_url("resumable", file_id),
+            headers={
+                "Content-Type": "application/json; charset=UTF-8",
+                "X-Upload-Content-Type": mime_type,
+                "X-Upload-Content-Length": str(size),
+            },
+            data=json.dumps(metadata),
+        )
+        if response.status_code != 200 or "Location" not in response.headers:
+            raise DriveUploadError(f"アップロードの開始に失敗 ({response.status_code}): {response.text}")
+        session_url = response.headers["Location"]
+
+        offset = 0
+        failures = 0
+        with open(file_path, "rb") as f:
+            while True:
+                f.seek(offset)
+                chunk = f.read(CHUNK_SIZE)
+                end = offset + len(chunk) - 1
+                try:
+                    response = self.session.put(
+                        session_url, data=chunk, timeout=120,
+                        headers={
+                            "Authorization": f"Bearer {self._access_token()}",
+                            "Content-Range": f"bytes {offset}-{end}/{size}",
+                        },
+                    )
+                except requests.RequestException:
+                    response = None
+
+                if response is not None and response.status_code in (200, 201):
+                    return response.json()["id"]
+                if response is not None and response.status_code == 308:
+                    offset = self._parse_range(response)
+                    failures = 0
+                    continue
+                if response is not None and response.status_code not in RETRY_STATUSES:
+                    raise DriveUploadError(f"チャンク送信に失敗 ({response.status_code}): {response.text}")
+
+                failures += 1
+                if failures > MAX_RETRIES:
+                    raise DriveUploadError(f"{file_path} のチャンク送信が再試行上限に達しました")
+                self._backoff(failures, response.headers.get("Retry-After") if response is not None else None)
+                offset, done_response = self._query_offset(session_url, size)
+                if done_response is not None:
+                    return done_response.json()["id"]
+
+    def upload_file(self, file_path, folder_id, mime_type="text/markdown", file_id=None):
+        """（同期）ファイルをアップロードして Drive のファイルIDを返す
+
+        file_id を渡すと、新しいファイルを作らずにその内容を置き換える
+        """
+        metadata = {"name": os.path.basename(file_path)}
+        if folder_id and not file_id:
+            metadata["parents"] = [folder_id]  # 置き換えでは親フォルダーを指定できない
+
+        if os.path.getsize(file_path) > RESUMABLE_THRESHOLD:
+            file_id = self._upload_resumable(file_path, metadata, mime_type, file_id)
+        else:
+            file_id = self._upload_simple(file_path, metadata, mime_type, file_id)
+        logger.debug("[DRIVE] %s を Google Drive にアップロードしました", metadata["name"])
+        return file_id
+
+    async def upload(self, file_path, folder_id, mime_type="text/markdown", file_id=None):
+        """イベントループを止めずにスレッドプールでアップロード"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, self.upload_file, file_path, folder_id, mime_type, file_id)
+
+    def close(self):
+        self.executor.shutdown(wait=False)
+        self.session.close()
+
+
+_uploader = None
+
+def get_drive_uploader():
+    """プロセス全体で共有する DriveUploader を取得（認証は初回アップロード時）"""
+    global _uploader
+    if _uploader is None:
+        _uploader = DriveUploader()
+    return _uploader
@@ -2,22 +2,19 @@ import discord
 from discord import app_commands
 import re
 from config import debug_log, EXCLUDED_CATEGORY_IDS  # ✅ 除外カテゴリーIDを追加
+from utils.voice_presence import get_voice_presence
 import json
 import os
 
 PROFILE_MESSAGE_PATH = "profile_messages.json"
-EXCLUDED_VOICE_CHANNEL_IDS=[1426392389374836826, 1252161804147232779]
 
 def load_profile_messages():
+    """旧形式の profile_messages.json を読み込む（StateStore への移行用）"""
     if os.path.exists(PROFILE_MESSAGE_PATH):
         with open(PROFILE_MESSAGE_PATH, "r", encoding="utf-8") as f:
             return json.load(f)
     return {}
 
-def save_profile_messages(data):
-    with open(PROFILE_MESSAGE_PATH, "w", encoding="utf-8") as f:
-        json.dump(data, f, indent=2)
-
 def normalize_voice_channel_name(name: str) -> str:
     """ボイスチャンネル名を比較用に正規化"""
     original_name = name  # デバッグ用
@@ -35,28 +32,15 @@ def normalize_text_channel_name(name: str) -> str:
     return name
 
 async def voice_users_autocomplete(interaction: discord.Interaction, current: str):
-    """ボイスチャンネルのユーザーをオートコンプリート"""
+    """ボイスチャンネルのユーザーをオートコンプリート（実行者と同じ部屋・前方一致を優先）
+
+    表示名の重複で取り違えないよう、値にはメンバーIDを入れる。
+    """
     guild = interaction.guild
     if guild is None:
-        debug_log("サーバー情報なし")
         return []
 
-    voice_members = []
-    current_lower = (current or "").lower()
-
-    print(EXCLUDED_VOICE_CHANNEL_IDS)
-
-    for vc in guild.voice_channels:
-        # 除外チャンネルをスキップ
-        if vc.id in EXCLUDED_VOICE_CHANNEL_IDS:
-            print(f"[DEBUG] 除外VC: {vc.name} (ID: {vc.id})")
-            continue
-
-        for member in vc.members:
-            if current_lower in member.display_name.lower():
-                voice_members.append(member.display_name)
-
-    print(f"[DELETE BOT]オートコンプリート候補: {voice_members[:25]}")
-
-    return [app_commands.Choice(name=name, value=name) for name in voice_members[:25]]
-
+    presence = get_voice_presence(interaction.client)
+    caller_channel_id = presence.channel_of(guild, interaction.user.id)
+    entries = presence.suggest(guild, current, caller_channel_id=caller_channel_id)
+    return [app_commands.Choice(name=entry.display_name, value=str(entry.member_id)) for entry in entries]
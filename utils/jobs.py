@@ -0,0 +1,147 @@
+import asyncio
+import itertools
+import multiprocessing
+import queue
+import threading
+from config import JOB_WORKER_ENABLED
+from utils.logging_setup import get_logger
+from utils.metrics import get_metrics
+
+logger = get_logger("jobs")
+
+WORKER_JOIN_TIMEOUT = 30.0  # 終了時に実行中のジョブを待つ秒数
+RESULT_POLL_INTERVAL = 1.0  # 結果待ちの間にワーカーの生存を確認する間隔
+
+
+class JobError(Exception):
+    """ワーカープロセスでのジョブ失敗（ワーカーの異常終了を含む）"""
+
+
+class JobDispatcher:
+    """重い処理をワーカープロセス（worker.py）に任せる窓口
+
+    - ジョブは multiprocessing のキューで送り、結果は専用スレッドが受け取ってイベントループに返す
+    - `await run(...)` をキャンセルすると、ワーカー側のジョブもキャンセルする
+    - ワーカーが落ちたら実行中のジョブを JobError で失敗させ、ワーカーを起動し直す
+    """
+    def __init__(self):
+        self._context = multiprocessing.get_context("spawn")  # fork だとイベントループやスレッドを引き継いでしまう
+        self.job_queue = None
+        self.result_queue = None
+        self.process = None
+        self._ids = itertools.count(1)
+        self._pending = {}  # {ジョブID: Future}
+        self._loop = None
+        self._reader = None
+        self._closing = False
+        self._jobs = get_metrics().counter("zero_bot_jobs", "ワーカープロセスで実行したジョブの数", ("kind", "result"))
+
+    def start(self):
+        if self.process is not None:
+            return
+        self._loop = asyncio.get_running_loop()
+        self._spawn()
+        self._reader = threading.Thread(target=self._read_results, name="job-results", daemon=True)
+        self._reader.start()
+
+    def _spawn(self):
+        from worker import worker_main  # ワーカー側のモジュールは子プロセスで読み込まれる
+
+        # 落ちたワーカーがキューのロックを持ったままの場合があるので、キューは毎回作り直す
+        self.job_queue = self._context.Queue()
+        self.result_queue = self._context.Queue()
+        self.process = self._context.Process(
+            target=worker_main, args=(self.job_queue, self.result_queue), name="zero-bot-worker", daemon=True
+        )
+        self.process.start()
+        logger.info("ワーカープロセスを起動しました (pid=%s)", self.process.pid)
+
+    async def run(self, kind, **payload):
+        """ジョブを送って結果を待つ（payload と結果は pickle できる値のみ）"""
+        job_id = next(self._ids)
+        future = self._loop.create_future()
+        self._pending[job_id] = future
+        self.job_queue.put({"id": job_id, "kind": kind, "payload": payload})
+        try:
+            return await future
+        except asyncio.CancelledError:
+            self.job_queue.put({"cancel": job_id})
+            self._jobs.inc(kind=kind, result="cancelled")
+            raise
+        finally:
+            self._pending.pop(job_id, None)
+
+    def pending_count(self):
+        return len(self._pending)
+
+    def stats(self):
+        return {
+            "pending": len(self._pending),
+            "alive": self.process is not None and self.process.is_alive(),
+            "pid": self.process.pid if self.process is not None else None,
+        }
+
+    # ---------- 結果の受け取り（スレッド） ----------
+    def _read_results(self):
+        reported = None  # 再起動を依頼済みのプロセス
+        while True:
+            try:
+                message = self.result_queue.get(timeout=RESULT_POLL_INTERVAL)
+            except queue.Empty:
+                process = self.process
+                if not self._closing and process is not reported and not process.is_alive():
+                    reported = process
+                    self._loop.call_soon_threadsafe(self._restart, process)
+                continue
+            if message is None:
+                return
+            self._loop.call_soon_threadsafe(self._resolve, message)
+
+    def _resolve(self, message):
+        future = self._pending.get(message["id"])
+        if future is None or future.done():
+            return  # キャンセル済み
+        if message["ok"]:
+            self._jobs.inc(kind=message["kind"], result="ok")
+            future.set_result(message["result"])
+        else:
+            self._jobs.inc(kind=message["kind"], result="error")
+            future.set_exception(JobError(message["error"]))
+
+    def _restart(self, process):
+        """落ちたワーカーのジョブを失敗させて起動し直す（イベントループ上で実行）"""
+        if self._closing or process is not self.process:
+            return
+        logger.error("ワーカープロセスが終了しました (exitcode=%s)。再起動します", process.exitcode)
+        self._fail_pending(f"ワーカーが終了しました (exitcode={process.exitcode})")
+        self._spawn()
+
+    def _fail_pending(self, reason):
+        for future in self._pending.values():
+            if not future.done():
+                future.set_exception(JobError(reason))
+
+    async def close(self):
+        """実行中のジョブを待ってワーカーを止める（待ちきれなければ強制終了）"""
+        if self.process is None:
+            return
+        self._closing = True
+        self.job_queue.put(None)
+        await asyncio.to_thread(self.process.join, WORKER_JOIN_TIMEOUT)
+        if self.process.is_alive():
+            self.process.terminate()
+        self.result_queue.put(None)
+        await asyncio.to_thread(self._reader.join)
+        self._fail_pending("Bot を終了します")
+        self.process = None
+
+
+def get_job_dispatcher(bot):
+    """Bot 全体で共有する JobDispatcher を取得（JOB_WORKER が無効なら None）"""
+    if not JOB_WORKER_ENABLED:
+        return None
+    dispatcher = getattr(bot, "job_dispatcher", None)
+    if dispatcher is None:
+        dispatcher = JobDispatcher()
+        bot.job_dispatcher = dispatcher
+    return dispatcher
@@ -0,0 +1,167 @@
+import asyncio
+import json
+import sqlite3
+import threading
+from utils.logging_setup import get_logger
+
+logger = get_logger("kv_store")
+
+STATE_DB_PATH = "zero_bot.db"
+_DELETED = object()
+
+
+class KVNamespace:
+    """名前空間ごとの dict ライクなビュー（読み込みはメモリ、書き込みは StateStore がまとめて反映）"""
+    def __init__(self, store, name, data):
+        self._store = store
+        self.name = name
+        self._data = data
+
+    def get(self, key, default=None):
+        return self._data.get(key, default)
+
+    def __getitem__(self, key):
+        return self._data[key]
+
+    def __setitem__(self, key, value):
+        self._data[key] = value
+        self._store._mark_dirty(self.name, key, value)
+
+    def __delitem__(self, key):
+        del self._data[key]
+        self._store._mark_dirty(self.name, key, _DELETED)
+
+    def pop(self, key, default=None):
+        if key not in self._data:
+            return default
+        value = self._data.pop(key)
+        self._store._mark_dirty(self.name, key, _DELETED)
+        return value
+
+    def __contains__(self, key):
+        return key in self._data
+
+    def __len__(self):
+        return len(self._data)
+
+    def items(self):
+        return self._data.items()
+
+
+class StateStore:
+    """SQLite（WAL モード）による永続キーバリューストア
+
+    - 読み込みは起動時に名前空間ごとメモリへ載せ、以降はメモリから返す
+    - 書き込みは一定時間ぶんまとめて、スレッド上で1トランザクションで反映する
+    - 書き込み途中で落ちても SQLite のトランザクションで整合性が保たれる
+    """
+    def __init__(self, path=STATE_DB_PATH, flush_interval=1.0):
+        self.path = path
+        self.flush_interval = flush_interval
+        self._conn = None
+        self._conn_lock = threading.Lock()
+        self._namespaces = {}
+        self._pending = {}  # {(名前空間, キー): 値 or _DELETED}
+        self._flush_task = None
+        self._flush_lock = None
+
+    def _connection(self):
+        with self._conn_lock:
+            if self._conn is None:
+                conn = sqlite3.connect(self.path, check_same_thread=False)
+                conn.execute("PRAGMA journal_mode=WAL")
+                conn.execute("PRAGMA synchronous=NORMAL")
+                conn.execute(
+                    "CREATE TABLE IF NOT EXISTS kv ("
+                    " namespace TEXT NOT NULL, key TEXT NOT NULL, value TEXT NOT NULL,"
+                    " PRIMARY KEY (namespace, key))"
+                )
+                conn.commit()
+                self._conn = conn
+            return self._conn
+
+    def namespace(self, name, migrate_from=None):
+        """名前空間を開く（migrate_from の関数があれば、空のときだけ初期データを取り込む）"""
+        if name in self._namespaces:
+            return self._namespaces[name]
+
+        conn = self._connection()
+        with self._conn_lock:
+            rows = conn.execute("SELECT key, value FROM kv WHERE namespace = ?", (name,)).fetchall()
+        data = {key: json.loads(value) for key, value in rows}
+        ns = self._namespaces[name] = KVNamespace(self, name, data)
+
+        if not data and migrate_from is not None:
+            initial = migrate_from() or {}
+            for key, value in initial.items():
+                data[key] = value
+            if initial:
+                self._write_batch({(name, key): value for key, value in initial.items()})
+        return ns
+
+    def _mark_dirty(self, namespace, key, value):
+        self._pending[(namespace, key)] = value
+        if self._flush_task is None or self._flush_task.done():
+            try:
+                self._flush_task = asyncio.get_running_loop().create_task(self._delayed_flush())
+            except RuntimeError:
+                # イベントループ外（起動前など）ではその場で書き込む
+                self._write_batch(self._take_pending())
+
+    async def _delayed_flush(self):
+        await asyncio.sleep(self.flush_interval)
+        await self.flush()
+
+    def _take_pending(self):
+        batch, self._pending = self._pending, {}
+        return batch
+
+    async def flush(self):
+        """溜まっている変更をスレッド上でまとめて書き込む"""
+        if self._flush_lock is None:
+            self._flush_lock = asyncio.Lock()
+        async with self._flush_lock:
+            batch = self._take_pending()
+            if not batch:
+                return
+            try:
+                await asyncio.to_thread(self._write_batch, batch)
+            except sqlite3.Error as e:
+                # 書き込めなかった分は次回に回す（その間に更新されたキーは新しい値を優先）
+                logger.error("[ERROR] 永続ストアへの書き込みに失敗: %s", e, exc_info=True)
+                self._pending = {**batch, **self._pending}
+
+    def _write_batch(self, batch):
+        upserts = [(ns, key, json.dumps(value, ensure_ascii=False)) for (ns, key), value in batch.items() if value is not _DELETED]
+        deletes = [(ns, key) for (ns, key), value in batch.items() if value is _DELETED]
+        conn = self._connection()
+        with self._conn_lock:
+            with conn:
+                if upserts:
+                    conn.executemany(
+                        "INSERT INTO kv (namespace, key, value) VALUES (?, ?, ?)"
+                        " ON CONFLICT(namespace, key) DO UPDATE SET value = excluded.value",
+                        upserts,
+                    )
+                if deletes:
+                    conn.executemany("DELETE FROM kv WHERE namespace = ? AND key = ?", deletes)
+
+    async def close(self):
+        """未反映の変更を書き込んで閉じる"""
+        if self._flush_task is not None and not self._flush_task.done():
+            self._flush_task.cancel()
+        await self.flush()
+        with self._conn_lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+
+_store = None
+
+def get_state_store():
+    """プロセス全体で共有する StateStore を取得"""
+    global _store
+    if _store is None:
+        _store = StateStore()
+    return _store
@@ -0,0 +1,211 @@
+import datetime
+import gzip
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import shutil
+import sys
+import threading
+import time
+import pytz
+from utils.lru_cache import next_jst_midnight
+from config import DEBUG_MODE
+
+jst = pytz.timezone("Asia/Tokyo")
+
+LOG_DIR = "log"
+LOG_FILE_PREFIX = "message_handler"
+LOG_RETENTION_DAYS = 3  # 当日を含めて3日分残す
+ROOT_LOGGER_NAME = "zero_bot"
+LEVEL_NAMES = ("DEBUG", "INFO", "WARNING", "ERROR")
+
+# 構造化ログに含める追加フィールド（logger.info(..., extra={...}) で渡す）
+STRUCTURED_FIELDS = ("guild_id", "channel_id", "user_id", "message_id")
+
+_listener = None
+
+
+class JsonLineFormatter(logging.Formatter):
+    """1レコード1行の JSON に整形"""
+    def format(self, record):
+        payload = {
+            "ts": datetime.datetime.fromtimestamp(record.created, jst).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        for field in STRUCTURED_FIELDS:
+            value = getattr(record, field, None)
+            if value is not None:
+                payload[field] = value
+        if record.exc_info:
+            payload["exc_info"] = self.formatException(record.exc_info)
+        return json.dumps(payload, ensure_ascii=False)
+
+
+class JSTDailyFileHandler(logging.FileHandler):
+    """JST の 0 時で `<prefix>_YYYYMMDD.log` を切り替え、前日分を gzip 圧縮して古いものを削除"""
+    def __init__(self, log_dir=LOG_DIR, prefix=LOG_FILE_PREFIX, retention_days=LOG_RETENTION_DAYS):
+        self.log_dir = log_dir
+        self.prefix = prefix
+        self.retention_days = retention_days
+        os.makedirs(log_dir, exist_ok=True)
+        super().__init__(self._path_for_today(), encoding="utf-8", delay=True)
+        self.rollover_at = next_jst_midnight()
+
+    def clean_up(self):
+        """前回までのログの圧縮と期限切れの削除（起動を待たせないよう setup_logging が別スレッドで呼ぶ）"""
+        self._compress_stale()
+        self._delete_expired()
+
+    def _path_for_today(self):
+        today_str = datetime.datetime.now(jst).strftime("%Y%m%d")
+        return os.path.abspath(os.path.join(self.log_dir, f"{self.prefix}_{today_str}.log"))
+
+    def emit(self, record):
+        if time.time() >= self.rollover_at:
+            self._rollover()
+        super().emit(record)
+
+    def _rollover(self):
+        previous = self.baseFilename
+        if self.stream:
+            self.stream.close()
+            self.stream = None
+        self.baseFilename = self._path_for_today()
+        self.rollover_at = next_jst_midnight()
+
+        self._compress(previous)
+        self._delete_expired()
+
+    @staticmethod
+    def _compress(path):
+        if os.path.exists(path):
+            with open(path, "rb") as src, gzip.open(f"{path}.gz", "wb") as dst:
+                shutil.copyfileobj(src, dst)
+            os.remove(path)
+
+    def _compress_stale(self):
+        """停止中に日付をまたいだ場合など、当日以外の未圧縮ログを圧縮"""
+        today_path = self._path_for_today()
+        for fname in os.listdir(self.log_dir):
+            path = os.path.abspath(os.path.join(self.log_dir, fname))
+            if fname.startswith(f"{self.prefix}_") and fname.endswith(".log") and path != today_path:
+                self._compress(path)
+
+    def _delete_expired(self):
+        """保持日数より古いログ（.log / .log.gz）を削除"""
+        threshold = (datetime.datetime.now(jst) - datetime.timedelta(days=self.retention_days - 1)).strftime("%Y%m%d")
+        for fname in os.listdir(self.log_dir):
+            if not fname.startswith(f"{self.prefix}_"):
+                continue
+            date_str = fname[len(self.prefix) + 1:].split(".", 1)[0]
+            if len(date_str) == 8 and date_str.isdigit() and date_str < threshold:
+                try:
+                    os.remove(os.path.join(self.log_dir, fname))
+                except OSError:
+                    continue
+
+
+class ConsoleFormatter(logging.Formatter):
+    """`[DEBUG][voice_events] ...` の形式（これまでの debug_log の print に合わせる）"""
+    def format(self, record):
+        subsystem = record.name[len(ROOT_LOGGER_NAME) + 1:] or ROOT_LOGGER_NAME
+        line = f"[{record.levelname}][{subsystem}] {record.getMessage()}"
+        if record.exc_info:
+            line += "\n" + self.formatException(record.exc_info)
+        return line
+
+
+class _BelowLevelFilter(logging.Filter):
+    """指定レベル未満のレコードだけを通す（INFO 以上はファイルに任せる）"""
+    def __init__(self, level):
+        super().__init__()
+        self.level = level
+
+    def filter(self, record):
+        return record.levelno < self.level
+
+
+def get_logger(name):
+    """`zero_bot.<name>` のロガーを取得（出力先は setup_logging で設定）"""
+    return logging.getLogger(f"{ROOT_LOGGER_NAME}.{name}")
+
+
+def setup_logging(level=None, prefix=LOG_FILE_PREFIX):
+    """ロガーには QueueHandler だけを付け、ファイル・コンソールへの出力は別スレッドの QueueListener が行う
+
+    INFO 以上は JSON ラインのファイルへ、DEBUG はコンソールへ出す。
+    既定のレベルは DEBUG_MODE なら DEBUG、それ以外は INFO（サブシステムごとに set_level で変更できる）。
+    別プロセス（worker.py）は prefix を変えて、同じファイルを奪い合わないようにする。
+    """
+    global _listener
+    if _listener is not None:
+        return _listener
+    if level is None:
+        level = logging.DEBUG if DEBUG_MODE else logging.INFO
+
+    file_handler = JSTDailyFileHandler(prefix=prefix)
+    file_handler.setLevel(logging.INFO)
+    file_handler.setFormatter(JsonLineFormatter())
+
+    console_handler = logging.StreamHandler(sys.stdout)
+    console_handler.addFilter(_BelowLevelFilter(logging.INFO))
+    console_handler.setFormatter(ConsoleFormatter())
+
+    log_queue = queue.SimpleQueue()
+    root = logging.getLogger(ROOT_LOGGER_NAME)
+    root.setLevel(level)
+    root.propagate = False
+    root.addHandler(logging.handlers.QueueHandler(log_queue))
+
+    _listener = logging.handlers.QueueListener(log_queue, file_handler, console_handler, respect_handler_level=True)
+    _listener.start()
+    threading.Thread(target=file_handler.clean_up, name="log-cleanup", daemon=True).start()
+    return _listener
+
+
+def shutdown_logging():
+    """キューに残っているログを書き出してスレッドを止める"""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        for handler in _listener.handlers:
+            handler.close()
+        _listener = None
+
+
+def _logger_for(subsystem):
+    """登録済みのサブシステムのロガー（未知の名前でロガーを新しく作らない）"""
+    if subsystem in ("", "all", ROOT_LOGGER_NAME):
+        return logging.getLogger(ROOT_LOGGER_NAME)
+    if f"{ROOT_LOGGER_NAME}.{subsystem}" not in logging.root.manager.loggerDict:
+        raise ValueError(f"不明なサブシステム: {subsystem}")
+    return get_logger(subsystem)
+
+
+def set_level(subsystem, level):
+    """サブシステム（"all" なら全体）のログレベルを実行中に変更する"""
+    if isinstance(level, str):
+        if level.upper() not in LEVEL_NAMES:
+            raise ValueError(f"不明なログレベル: {level}")
+        level = getattr(logging, level.upper())
+    _logger_for(subsystem).setLevel(level)
+
+
+def reset_level(subsystem):
+    """サブシステム個別の設定を外し、全体のレベルに従わせる"""
+    if subsystem not in ("", "all", ROOT_LOGGER_NAME):
+        _logger_for(subsystem).setLevel(logging.NOTSET)
+
+
+def subsystem_levels():
+    """{サブシステム名: 実効レベル名}（"all" は全体の既定）"""
+    prefix = f"{ROOT_LOGGER_NAME}."
+    levels = {"all": logging.getLevelName(logging.getLogger(ROOT_LOGGER_NAME).getEffectiveLevel())}
+    for name in sorted(logging.root.manager.loggerDict):
+        if name.startswith(prefix):
+            levels[name[len(prefix):]] = logging.getLevelName(logging.getLogger(name).getEffectiveLevel())
+    return levels
@@ -0,0 +1,100 @@
+import datetime
+import time
+from collections import OrderedDict
+import pytz
+
+jst = pytz.timezone("Asia/Tokyo")
+
+
+def next_jst_midnight(now=None):
+    """次の JST 0:00 の UNIX 時刻を返す"""
+    now = now if now is not None else time.time()
+    current = datetime.datetime.fromtimestamp(now, jst)
+    tomorrow = (current + datetime.timedelta(days=1)).date()
+    return jst.localize(datetime.datetime.combine(tomorrow, datetime.time())).timestamp()
+
+
+class LRUCache:
+    """サイズ上限・TTL・JST 日付変更での失効つき LRU キャッシュ（ヒット率の集計つき）"""
+    def __init__(self, max_size=64, ttl=None, expire_at_midnight=True):
+        self.max_size = max_size
+        self.ttl = ttl  # 秒（None なら TTL なし）
+        self.expire_at_midnight = expire_at_midnight
+        self._data = OrderedDict()  # {キー: (値, 失効時刻)}
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def _expires_at(self, now):
+        expires_at = float("inf")
+        if self.ttl is not None:
+            expires_at = now + self.ttl
+        if self.expire_at_midnight:
+            expires_at = min(expires_at, next_jst_midnight(now))
+        return expires_at
+
+    def get(self, key, default=None):
+        entry = self._data.get(key)
+        if entry is None:
+            self.misses += 1
+            return default
+
+        value, expires_at = entry
+        if time.time() >= expires_at:
+            del self._data[key]
+            self.expirations += 1
+            self.misses += 1
+            return default
+
+        self._data.move_to_end(key)  # 最近使ったものを末尾へ
+        self.hits += 1
+        return value
+
+    def set(self, key, value):
+        self._data[key] = (value, self._expires_at(time.time()))
+        self._data.move_to_end(key)
+        while len(self._data) > self.max_size:
+            self._data.popitem(last=False)  # 最も長く使われていないものを削除
+            self.evictions += 1
+
+    def pop(self, key, default=None):
+        entry = self._data.pop(key, None)
+        return default if entry is None else entry[0]
+
+    def purge_expired(self):
+        """失効済みのエントリを削除して件数を返す"""
+        now = time.time()
+        expired = [key for key, (_, expires_at) in self._data.items() if now >= expires_at]
+        for key in expired:
+            del self._data[key]
+        self.expirations += len(expired)
+        return len(expired)
+
+    def items(self):
+        return [(key, value) for key, (value, _) in self._data.items()]
+
+    def keys(self):
+        return list(self._data.keys())
+
+    def clear(self):
+        self._data.clear()
+
+    def __contains__(self, key):
+        return key in self._data
+
+    def __len__(self):
+        return len(self._data)
+
+    def stats(self):
+        """ヒット・ミス・追い出し件数とヒット率"""
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._data),
+            "max_size": self.max_size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
@@ -0,0 +1,295 @@
+import bisect
+import functools
+import threading
+import time
+
+# ハンドラー・REST 呼び出しの待ち時間用（秒）
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _label_key(labelnames, labels):
+    if set(labels) != set(labelnames):
+        raise ValueError(f"ラベルが一致しません: {sorted(labels)} != {sorted(labelnames)}")
+    return tuple(str(labels[name]) for name in labelnames)
+
+
+def _escape(value):
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(labelnames, key, extra=None):
+    pairs = list(zip(labelnames, key))
+    if extra:
+        pairs.append(extra)
+    if not pairs:
+        return ""
+    body = ",".join(f'{name}="{_escape(value)}"' for name, value in pairs)
+    return "{" + body + "}"
+
+
+def _format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()  # ログ用スレッドなどイベントループ外からも更新できるように
+
+    def header(self):
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+
+
+class Counter(_Metric):
+    """増えるだけの値"""
+    kind = "counter"
+
+    def __init__(self, name, documentation, labelnames=()):
+        super().__init__(name, documentation, labelnames)
+        self._values = {}
+
+    def inc(self, amount=1, **labels):
+        key = _label_key(self.labelnames, labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels):
+        return self._values.get(_label_key(self.labelnames, labels), 0)
+
+    def samples(self):
+        """{ラベル値のタプル: 値}"""
+        with self._lock:
+            return dict(self._values)
+
+    def render(self):
+        lines = self.header()
+        for key, value in sorted(self.samples().items()):
+            lines.append(f"{self.name}_total{_format_labels(self.labelnames, key)} {_format_value(value)}")
+        return lines
+
+
+class Gauge(_Metric):
+    """上下する値（set_function を使うと出力時に関数から取得）"""
+    kind = "gauge"
+
+    def __init__(self, name, documentation, labelnames=()):
+        super().__init__(name, documentation, labelnames)
+        self._values = {}
+        self._function = None
+
+    def set(self, value, **labels):
+        key = _label_key(self.labelnames, labels)
+        with self._lock:
+            self._values[key] = value
+
+    def inc(self, amount=1, **labels):
+        key = _label_key(self.labelnames, labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount=1, **labels):
+        self.inc(-amount, **labels)
+
+    def set_function(self, function):
+        """function() が返す値（ラベルがある場合は {ラベル値のタプル: 値}）を使う"""
+        self._function = function
+
+    def samples(self):
+        if self._function is not None:
+            value = self._function()
+            return dict(value) if self.labelnames else {(): value}
+        with self._lock:
+            return dict(self._values)
+
+    def render(self):
+        lines = self.header()
+        for key, value in sorted(self.samples().items()):
+            lines.append(f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}")
+        return lines
+
+
+class Histogram(_Metric):
+    """値の分布（累積バケット・合計・件数）"""
+    kind = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._series = {}  # {ラベル値のタプル: [バケットごとの件数（+Inf を含む）, 合計, 件数]}
+
+    def observe(self, value, **labels):
+        key = _label_key(self.labelnames, labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def time(self, **labels):
+        """with metric.time(...): の間の経過秒数を記録"""
+        return _Timer(self, labels)
+
+    def samples(self):
+        with self._lock:
+            return {key: (list(counts), total, count) for key, (counts, total, count) in self._series.items()}
+
+    def quantile(self, q, **labels):
+        """バケットから分位点を推定（該当バケットの上限を返す。データがなければ None）"""
+        series = self.samples().get(_label_key(self.labelnames, labels))
+        if series is None or series[2] == 0:
+            return None
+        counts, _, count = series
+        rank = q * count
+        cumulative = 0
+        for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+            cumulative += bucket_count
+            if cumulative >= rank:
+                return bound
+        return float("inf")
+
+    def render(self):
+        lines = self.header()
+        for key, (counts, total, count) in sorted(self.samples().items()):
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += bucket_count
+                labels = _format_labels(self.labelnames, key, ("le", _format_value(float(bound))))
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labelnames, key)} {_format_value(total)}")
+            lines.append(f"{self.name}_count{_format_labels(self.labelnames, key)} {count}")
+        return lines
+
+
+class _Timer:
+    def __init__(self, histogram, labels):
+        self.histogram = histogram
+        self.labels = labels
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.histogram.observe(time.perf_counter() - self.started, **self.labels)
+        return False
+
+
+class MetricsRegistry:
+    """メトリクスの登録先（同じ名前で取得すると登録済みのものを返す）"""
+    def __init__(self):
+        self._metrics = {}
+
+    def _get_or_create(self, cls, name, documentation, labelnames, **kwargs):
+        metric = self._metrics.get(name)
+        if metric is None:
+            metric = self._metrics[name] = cls(name, documentation, labelnames, **kwargs)
+        elif not isinstance(metric, cls) or metric.labelnames != tuple(labelnames):
+            raise ValueError(f"{name} は別の種類・ラベルで登録済みです")
+        return metric
+
+    def counter(self, name, documentation, labelnames=()):
+        return self._get_or_create(Counter, name, documentation, labelnames)
+
+    def gauge(self, name, documentation, labelnames=()):
+        return self._get_or_create(Gauge, name, documentation, labelnames)
+
+    def histogram(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        return self._get_or_create(Histogram, name, documentation, labelnames, buckets=buckets)
+
+    def get(self, name):
+        return self._metrics.get(name)
+
+    def render_prometheus(self):
+        """Prometheus のテキスト形式で出力"""
+        lines = []
+        for metric in self._metrics.values():
+            try:
+                lines.extend(metric.render())
+            except Exception as e:
+                lines.append(f"# {metric.name} の取得に失敗: {e}")
+        return "\n".join(lines) + "\n"
+
+
+_registry = None
+
+def get_metrics():
+    """プロセス全体で共有する MetricsRegistry を取得"""
+    global _registry
+    if _registry is None:
+        _registry = MetricsRegistry()
+    return _registry
+
+
+# ---------- よく使うメトリクス ----------
+def event_handler_seconds():
+    return get_metrics().histogram(
+        "zero_bot_event_handler_seconds", "イベントハンドラーの処理時間（秒）", ("event",)
+    )
+
+
+def event_handler_errors():
+    return get_metrics().counter(
+        "zero_bot_event_handler_errors", "イベントハンドラーで発生した例外の数", ("event",)
+    )
+
+
+def timed_handler(event):
+    """イベントハンドラーの処理時間と例外数を記録するデコレータ"""
+    def decorator(func):
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return await func(*args, **kwargs)
+            except Exception:
+                event_handler_errors().inc(event=event)
+                raise
+            finally:
+                event_handler_seconds().observe(time.perf_counter() - started, event=event)
+        return wrapper
+    return decorator
+
+
+def instrument_http(http):
+    """discord.py の HTTPClient.request を包み、全 REST 呼び出しの回数と時間を記録する
+
+    元に戻す関数を返す。ルートはパスのテンプレート（/channels/{channel_id}/messages など）で集計する。
+    """
+    registry = get_metrics()
+    requests_total = registry.counter(
+        "zero_bot_rest_requests", "REST 呼び出しの回数", ("method", "route", "status")
+    )
+    request_seconds = registry.histogram(
+        "zero_bot_rest_request_seconds", "REST 呼び出しの所要時間（秒。レートリミットの待ちを含む）", ("method", "route")
+    )
+    original = http.request
+
+    @functools.wraps(original)
+    async def request(route, **kwargs):
+        method = getattr(route, "method", "?")
+        path = getattr(route, "path", str(route))
+        status = "ok"
+        started = time.perf_counter()
+        try:
+            return await original(route, **kwargs)
+        except Exception as e:
+            status = str(getattr(e, "status", type(e).__name__))
+            raise
+        finally:
+            request_seconds.observe(time.perf_counter() - started, method=method, route=path)
+            requests_total.inc(method=method, route=path, status=status)
+
+    http.request = request
+
+    def restore():
+        http.request = original
+    return restore
@@ -0,0 +1,79 @@
+import asyncio
+from utils.logging_setup import get_logger
+
+logger = get_logger("profile_index")
+
+
+class ProfileLinkIndex:
+    """プロフィールチャンネルの「投稿者 → 最新のプロフィール投稿」インデックス
+
+    起動時に全履歴を1回だけ読み込み、以降はメッセージの投稿・編集・削除イベントで更新する。
+    入室時の検索は history API を呼ばずにメモリ上で完結する。
+    """
+    def __init__(self, source_channel_ids):
+        self.source_channel_ids = set(source_channel_ids)
+        self._posts = {}  # {投稿者ID: {メッセージID: (ギルドID, チャンネルID)}}
+        self._latest = {}  # {投稿者ID: (メッセージID, ギルドID, チャンネルID)}
+        self._authors = {}  # {メッセージID: 投稿者ID}（削除イベント用）
+        self.ready = asyncio.Event()
+        self._backfill_task = None
+
+    def is_source(self, channel_id):
+        return channel_id in self.source_channel_ids
+
+    def add(self, message):
+        if message.guild is None or not self.is_source(message.channel.id):
+            return
+        author_id = message.author.id
+        self._posts.setdefault(author_id, {})[message.id] = (message.guild.id, message.channel.id)
+        self._authors[message.id] = author_id
+
+        latest = self._latest.get(author_id)
+        if latest is None or message.id > latest[0]:
+            self._latest[author_id] = (message.id, message.guild.id, message.channel.id)
+
+    def remove(self, message_id):
+        author_id = self._authors.pop(message_id, None)
+        if author_id is None:
+            return
+        posts = self._posts.get(author_id, {})
+        posts.pop(message_id, None)
+
+        latest = self._latest.get(author_id)
+        if latest and latest[0] == message_id:
+            # 最新が消えたら、残っている中で一番新しい投稿に戻す
+            if posts:
+                newest_id = max(posts)
+                self._latest[author_id] = (newest_id, *posts[newest_id])
+            else:
+                del self._latest[author_id]
+                self._posts.pop(author_id, None)
+
+    def latest_link(self, author_id):
+        latest = self._latest.get(author_id)
+        if latest is None:
+            return None
+        message_id, guild_id, channel_id = latest
+        return f"https://discord.com/channels/{guild_id}/{channel_id}/{message_id}"
+
+    def start_backfill(self, bot):
+        """全履歴の読み込みを1回だけ開始"""
+        if self._backfill_task is None:
+            self._backfill_task = asyncio.create_task(self._backfill(bot))
+
+    async def _backfill(self, bot):
+        # 失敗しても ready は必ず立てる（入室のたびにタイムアウトまで待たせない）
+        try:
+            for channel_id in self.source_channel_ids:
+                channel = bot.get_channel(channel_id)
+                if channel is None:
+                    logger.warning("指定のメッセージチャンネル (ID: %s) が見つかりません", channel_id)
+                    continue
+                try:
+                    async for message in channel.history(limit=None):
+                        self.add(message)
+                except Exception as e:
+                    logger.error("[ERROR] プロフィール履歴の読み込みに失敗 (%s): %s", channel_id, e, exc_info=True)
+        finally:
+            self.ready.set()
+        logger.debug("[PROFILE INDEX] %d 人分のプロフィール投稿を登録しました", len(self._latest))
@@ -0,0 +1,63 @@
+import datetime
+import discord
+from utils.rate_limit import RateLimiter
+from utils.logging_setup import get_logger
+
+logger = get_logger("purge")
+
+# 一括削除は 14 日以内のメッセージのみ（境界付近は余裕を持たせて個別削除に回す）
+BULK_DELETE_MAX_AGE = datetime.timedelta(days=14) - datetime.timedelta(minutes=5)
+BULK_DELETE_LIMIT = 100
+
+
+class ChannelPurger:
+    """チャンネルのメッセージを削除するエンジン
+
+    - 14 日以内のメッセージは 100 件ずつ一括削除、それより古いものは個別削除
+    - 429 を受けたら RateLimiter がレートリミットの待ち時間に合わせて待機
+    - 一部が失敗しても最後まで続け、件数を返す
+    - タスクをキャンセルすれば途中で止まる（CancelledError はそのまま伝える）
+    """
+    def __init__(self, limiter=None):
+        self.limiter = limiter or RateLimiter(concurrency=1)
+
+    async def purge(self, channel, before=None):
+        """`before`（datetime）より前のメッセージを削除して {"deleted", "failed"} を返す"""
+        result = {"deleted": 0, "failed": 0}
+        bulk_cutoff = discord.utils.utcnow() - BULK_DELETE_MAX_AGE
+        bulk = []
+
+        async for message in channel.history(limit=None, before=before):
+            if message.created_at > bulk_cutoff:
+                bulk.append(message)
+                if len(bulk) >= BULK_DELETE_LIMIT:
+                    await self._delete_bulk(channel, bulk, result)
+                    bulk = []
+            else:
+                await self._delete_single(message, result)
+
+        if bulk:
+            await self._delete_bulk(channel, bulk, result)
+
+        logger.debug("[PURGE] %s: 削除 %s 件 / 失敗 %s 件", channel.name, result['deleted'], result['failed'])
+        return result
+
+    async def _delete_bulk(self, channel, messages, result):
+        try:
+            await self.limiter.run(lambda: channel.delete_messages(messages))
+            result["deleted"] += len(messages)
+        except (discord.HTTPException, discord.RateLimited) as e:
+            # まとめて失敗した場合は1件ずつ試す
+            logger.debug("[PURGE] 一括削除に失敗したため個別削除に切り替えます: %s", e)
+            for message in messages:
+                await self._delete_single(message, result)
+
+    async def _delete_single(self, message, result):
+        try:
+            await self.limiter.run(message.delete)
+            result["deleted"] += 1
+        except discord.NotFound:
+            result["deleted"] += 1  # 既に削除済み
+        except (discord.HTTPException, discord.RateLimited) as e:
+            result["failed"] += 1
+            logger.debug("[PURGE] メッセージ %s の削除に失敗: %s", message.id, e)
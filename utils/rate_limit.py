@@ -0,0 +1,64 @@
+import asyncio
+import time
+import discord
+from utils.logging_setup import get_logger
+
+logger = get_logger("rate_limit")
+
+
+def retry_after_seconds(error, default=1.0):
+    """429 エラーから待ち時間（秒）を取り出す"""
+    retry_after = getattr(error, "retry_after", None)  # discord.RateLimited
+    if retry_after:
+        return float(retry_after)
+
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None) or {}
+    for header in ("X-RateLimit-Reset-After", "Retry-After"):
+        value = headers.get(header)
+        if value:
+            try:
+                return float(value)
+            except ValueError:
+                pass
+    return default
+
+
+class RateLimiter:
+    """同時実行数を絞りつつ、429 を受けたら全ワーカーをまとめて待たせる実行器
+
+    バケットごとの通常の待機（X-RateLimit-* ヘッダー）は discord.py の HTTP 層が行う。
+    ここではそれに加えて同時リクエスト数を制限し、それでも 429 が返ってきた場合は
+    Retry-After / X-RateLimit-Reset-After の秒数だけ全体を止めてから再試行する。
+    """
+    def __init__(self, concurrency=4, max_retries=3):
+        self.semaphore = asyncio.Semaphore(concurrency)
+        self.max_retries = max_retries
+        self._resume_at = 0.0  # time.monotonic() 基準の再開時刻
+        self.rate_limited = 0  # 受けた 429 の回数
+
+    def pause(self, seconds):
+        self._resume_at = max(self._resume_at, time.monotonic() + seconds)
+
+    async def _wait_for_window(self):
+        delay = self._resume_at - time.monotonic()
+        while delay > 0:
+            await asyncio.sleep(delay)
+            delay = self._resume_at - time.monotonic()
+
+    async def run(self, coro_factory):
+        """coro_factory() を制限付きで実行（429 なら待ってから再試行）"""
+        attempt = 0
+        while True:
+            async with self.semaphore:
+                await self._wait_for_window()
+                try:
+                    return await coro_factory()
+                except (discord.RateLimited, discord.HTTPException) as e:
+                    if getattr(e, "status", 429) != 429 or attempt >= self.max_retries:
+                        raise
+                    wait = retry_after_seconds(e)
+                    self.rate_limited += 1
+                    self.pause(wait)
+                    logger.debug("[RATE LIMIT] 429 を受信、%.2f 秒待機します", wait)
+            attempt += 1
@@ -0,0 +1,179 @@
+import asyncio
+import time
+import discord
+from utils.logging_setup import get_logger
+
+logger = get_logger("relay")
+
+MAX_EMBEDS_PER_MESSAGE = 10  # Discord の1メッセージあたりの embed 上限
+MAX_EMBED_CHARS_PER_MESSAGE = 6000  # 1メッセージの全 embed の合計文字数の上限
+
+
+def _embed_chars(embeds):
+    return sum(len(embed) for embed in embeds)
+
+
+def _consume_exception(future):
+    """結果を待たない呼び出し元でも「未取得の例外」警告が出ないようにする"""
+    if not future.cancelled():
+        future.exception()
+
+
+class RelayQueue:
+    """転記先テキストチャンネルごとにワーカーを1つ持ち、短時間に届いた embed をまとめて送信する"""
+    def __init__(self, batch_window=0.5, idle_timeout=300):
+        self.batch_window = batch_window  # まとめ送信を待つ時間（秒）
+        self.idle_timeout = idle_timeout  # この秒数キューが空ならワーカーを終了
+        self.queues = {}  # {チャンネルID: asyncio.Queue}
+        self.workers = {}  # {チャンネルID: asyncio.Task}
+        self.last_flush_latency = {}  # {チャンネルID: 最後の送信までの待ち時間（秒）}
+        self.max_flush_latency = {}  # {チャンネルID: これまでの最大待ち時間（秒）}
+        self.sent_batches = 0
+        self.sent_embeds = 0
+
+    def enqueue(self, channel, embeds):
+        """embed を転記キューに積む。送信後の Message を受け取れる Future を返す"""
+        if len(embeds) > MAX_EMBEDS_PER_MESSAGE:
+            raise ValueError(f"embeds は最大 {MAX_EMBEDS_PER_MESSAGE} 件までです")
+
+        future = asyncio.get_running_loop().create_future()
+        future.add_done_callback(_consume_exception)
+        queue = self.queues.get(channel.id)
+        if queue is None:
+            queue = self.queues[channel.id] = asyncio.Queue()
+        queue.put_nowait((time.monotonic(), list(embeds), future))
+
+        if channel.id not in self.workers:
+            self.workers[channel.id] = asyncio.create_task(self._worker(channel, queue))
+        return future
+
+    async def _worker(self, channel, queue):
+        """チャンネルごとの送信ワーカー（投入順を維持する）"""
+        carry = None
+        try:
+            while True:
+                if carry is None:
+                    try:
+                        carry = await asyncio.wait_for(queue.get(), timeout=self.idle_timeout)
+                    except asyncio.TimeoutError:
+                        if queue.empty():
+                            break
+                        continue
+
+                batch = [carry]
+                carry = None
+                embed_count = len(batch[0][1])
+                embed_chars = _embed_chars(batch[0][1])
+
+                # 待ち時間内に届いたものをまとめる
+                deadline = time.monotonic() + self.batch_window
+                while embed_count < MAX_EMBEDS_PER_MESSAGE:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    try:
+                        item = await asyncio.wait_for(queue.get(), timeout=remaining)
+                    except asyncio.TimeoutError:
+                        break
+                    # 件数・文字数の上限を超えるものは次回へ持ち越し
+                    item_chars = _embed_chars(item[1])
+                    if (embed_count + len(item[1]) > MAX_EMBEDS_PER_MESSAGE
+                            or embed_chars + item_chars > MAX_EMBED_CHARS_PER_MESSAGE):
+                        carry = item
+                        break
+                    batch.append(item)
+                    embed_count += len(item[1])
+                    embed_chars += item_chars
+
+                await self._flush(channel, batch)
+        finally:
+            # 終了したワーカーを登録から外す（次の enqueue で作り直す）
+            if self.workers.get(channel.id) is asyncio.current_task():
+                del self.workers[channel.id]
+                if queue.empty():
+                    self.queues.pop(channel.id, None)
+                    self.last_flush_latency.pop(channel.id, None)
+                    self.max_flush_latency.pop(channel.id, None)
+
+    async def _flush(self, channel, batch):
+        """まとめた embed を1回で送信し、各 Future に結果を渡す"""
+        embeds = [embed for _, item_embeds, _ in batch for embed in item_embeds]
+        try:
+            sent_msg = await channel.send(embeds=embeds)
+        except discord.HTTPException as e:
+            if e.status == 400 and len(batch) > 1:
+                # まとめたことが原因かもしれないので、1件ずつ送り直す（失敗した分だけを落とす）
+                logger.warning("[RELAY] %s へのまとめ送信が拒否されたため個別に送信します: %s", channel.name, e)
+                for item in batch:
+                    await self._flush(channel, [item])
+                return
+            logger.error("[RELAY] 転記に失敗しました (%s): %s", channel.name, e)
+            self._fail(batch, e)
+            return
+        except Exception as e:
+            # 接続エラー・タイムアウトなど。ワーカーは止めずに次の送信へ進む
+            logger.error("[RELAY] 転記に失敗しました (%s)", channel.name, exc_info=True)
+            self._fail(batch, e)
+            return
+
+        latency = time.monotonic() - batch[0][0]
+        self.last_flush_latency[channel.id] = latency
+        self.max_flush_latency[channel.id] = max(latency, self.max_flush_latency.get(channel.id, 0.0))
+        self.sent_batches += 1
+        self.sent_embeds += len(embeds)
+        logger.debug("[RELAY] %s に %s 件の embed を送信 (待ち時間 %.2fs)", channel.name, len(embeds), latency)
+
+        for _, _, future in batch:
+            if not future.done():
+                future.set_result(sent_msg)
+
+    @staticmethod
+    def _fail(batch, error):
+        for _, _, future in batch:
+            if not future.done():
+                future.set_exception(error)
+
+    def queue_depth(self, channel_id=None):
+        """キューに残っている件数（channel_id 省略時は全チャンネル合計）"""
+        if channel_id is not None:
+            queue = self.queues.get(channel_id)
+            return queue.qsize() if queue else 0
+        return sum(queue.qsize() for queue in self.queues.values())
+
+    def stats(self):
+        """キューの深さと送信待ち時間の状態を返す"""
+        return {
+            "workers": len(self.workers),
+            "queue_depth": self.queue_depth(),
+            "sent_batches": self.sent_batches,
+            "sent_embeds": self.sent_embeds,
+            "channels": {
+                channel_id: {
+                    "queue_depth": self.queue_depth(channel_id),
+                    "last_flush_latency": self.last_flush_latency.get(channel_id),
+                    "max_flush_latency": self.max_flush_latency.get(channel_id),
+                }
+                for channel_id in set(self.queues) | set(self.last_flush_latency)
+            },
+        }
+
+    async def close(self):
+        """全ワーカーを停止（未送信分は破棄）"""
+        for task in list(self.workers.values()):
+            task.cancel()
+        for task in list(self.workers.values()):
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+        self.workers.clear()
+        self.queues.clear()
+
+
+def get_relay_queue(bot):
+    """Bot 全体で共有する RelayQueue を取得（なければ作成）"""
+    queue = getattr(bot, "relay_queue", None)
+    if queue is None:
+        queue = RelayQueue()
+        bot.relay_queue = queue
+    return queue
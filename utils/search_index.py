@@ -0,0 +1,200 @@
+import asyncio
+import sqlite3
+import threading
+from utils.logging_setup import get_logger
+from config import SEARCH_INDEX_ENABLED, SEARCH_DB_PATH
+
+logger = get_logger("search")
+
+# trigram トークナイザは 3 文字単位で索引するため、これより短い語は LIKE で探す
+TRIGRAM_MIN_LENGTH = 3
+
+
+def get_search_index(bot):
+    """Bot 全体で共有する SearchIndex を取得（SEARCH_INDEX が無効なら None）"""
+    if not SEARCH_INDEX_ENABLED:
+        return None
+    index = getattr(bot, "search_index", None)
+    if index is None:
+        index = SearchIndex()
+        bot.search_index = index
+    return index
+
+
+def _escape_fts(term):
+    """FTS5 の構文として解釈されないよう、語をダブルクォートで囲む"""
+    return '"' + term.replace('"', '""') + '"'
+
+
+def _escape_like(term):
+    return term.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+class SearchIndex:
+    """転記したメッセージのローカル全文検索インデックス（SQLite FTS5）
+
+    - `add()` はメモリに溜めるだけで、一定時間ぶんをスレッド上で1トランザクションで書き込む
+    - 検索もスレッド上で行い、イベントループを止めない
+    - Discord 側のチャンネルがアーカイブ・削除された後も検索できる
+    """
+    def __init__(self, path=SEARCH_DB_PATH, flush_interval=1.0):
+        self.path = path
+        self.flush_interval = flush_interval
+        self._conn = None
+        self._conn_lock = threading.Lock()
+        self._pending = {}  # {メッセージID: 行}（同じメッセージは最後の内容だけ書く）
+        self._flush_task = None
+        self._flush_lock = None
+
+    def _connection(self):
+        with self._conn_lock:
+            if self._conn is None:
+                conn = sqlite3.connect(self.path, check_same_thread=False)
+                conn.execute("PRAGMA journal_mode=WAL")
+                conn.execute("PRAGMA synchronous=NORMAL")
+                conn.execute(
+                    "CREATE TABLE IF NOT EXISTS messages ("
+                    " message_id INTEGER PRIMARY KEY, guild_id INTEGER NOT NULL, channel_id INTEGER NOT NULL,"
+                    " room TEXT NOT NULL, author_id INTEGER NOT NULL, author_name TEXT NOT NULL,"
+                    " created_at REAL NOT NULL, content TEXT NOT NULL)"
+                )
+                conn.execute("CREATE INDEX IF NOT EXISTS messages_guild_time ON messages (guild_id, created_at)")
+                conn.execute("CREATE INDEX IF NOT EXISTS messages_author_time ON messages (author_id, created_at)")
+                self._create_fts(conn)
+                conn.commit()
+                self._conn = conn
+            return self._conn
+
+    @staticmethod
+    def _create_fts(conn):
+        """messages を外部コンテンツとする FTS テーブルと、同期用のトリガーを作成"""
+        exists = conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'messages_fts'").fetchone()
+        if not exists:
+            try:
+                conn.execute(
+                    "CREATE VIRTUAL TABLE messages_fts USING fts5("
+                    "content, content='messages', content_rowid='message_id', tokenize='trigram')"
+                )
+            except sqlite3.OperationalError:
+                # trigram が使えない古い SQLite では空白区切りで索引（日本語は LIKE 検索に頼る）
+                conn.execute(
+                    "CREATE VIRTUAL TABLE messages_fts USING fts5("
+                    "content, content='messages', content_rowid='message_id')"
+                )
+        conn.executescript(
+            "CREATE TRIGGER IF NOT EXISTS messages_ai AFTER INSERT ON messages BEGIN"
+            " INSERT INTO messages_fts (rowid, content) VALUES (new.message_id, new.content); END;"
+            "CREATE TRIGGER IF NOT EXISTS messages_ad AFTER DELETE ON messages BEGIN"
+            " INSERT INTO messages_fts (messages_fts, rowid, content) VALUES ('delete', old.message_id, old.content); END;"
+            "CREATE TRIGGER IF NOT EXISTS messages_au AFTER UPDATE ON messages BEGIN"
+            " INSERT INTO messages_fts (messages_fts, rowid, content) VALUES ('delete', old.message_id, old.content);"
+            " INSERT INTO messages_fts (rowid, content) VALUES (new.message_id, new.content); END;"
+        )
+
+    def add(self, message, room=None):
+        """メッセージを書き込み待ちに追加（本文も添付もないものは無視）"""
+        content = message.content or ""
+        if message.attachments:
+            content = "\n".join([content, *(attachment.filename for attachment in message.attachments)]).strip()
+        if not content:
+            return
+
+        self._pending[message.id] = (
+            message.id,
+            message.guild.id,
+            message.channel.id,
+            room or message.channel.name,
+            message.author.id,
+            message.author.display_name,
+            message.created_at.timestamp(),
+            content,
+        )
+        if self._flush_task is None or self._flush_task.done():
+            self._flush_task = asyncio.get_running_loop().create_task(self._delayed_flush())
+
+    async def _delayed_flush(self):
+        await asyncio.sleep(self.flush_interval)
+        await self.flush()
+
+    async def flush(self):
+        """溜まっているメッセージをスレッド上でまとめて書き込む"""
+        if self._flush_lock is None:
+            self._flush_lock = asyncio.Lock()
+        async with self._flush_lock:
+            batch, self._pending = self._pending, {}
+            if not batch:
+                return
+            try:
+                await asyncio.to_thread(self._write_batch, list(batch.values()))
+            except sqlite3.Error as e:
+                # 書き込めなかった分は次回に回す（その間に届いた新しい内容を優先）
+                logger.error("[ERROR] 検索インデックスへの書き込みに失敗: %s", e, exc_info=True)
+                self._pending = {**batch, **self._pending}
+
+    def _write_batch(self, rows):
+        conn = self._connection()
+        with self._conn_lock:
+            with conn:
+                conn.executemany(
+                    "INSERT INTO messages (message_id, guild_id, channel_id, room, author_id, author_name, created_at, content)"
+                    " VALUES (?, ?, ?, ?, ?, ?, ?, ?)"
+                    " ON CONFLICT(message_id) DO UPDATE SET"
+                    " room = excluded.room, author_name = excluded.author_name, content = excluded.content",
+                    rows,
+                )
+
+    async def search(self, guild_id, keyword=None, author_id=None, room=None, since=None, until=None, limit=10):
+        """条件に合うメッセージを新しい順に返す（since / until は datetime、until は含まない）"""
+        return await asyncio.to_thread(self._search, guild_id, keyword, author_id, room, since, until, limit)
+
+    def _search(self, guild_id, keyword, author_id, room, since, until, limit):
+        conditions = ["m.guild_id = ?"]
+        params = [guild_id]
+        source = "messages AS m"
+
+        terms = (keyword or "").split()
+        fts_terms = [term for term in terms if len(term) >= TRIGRAM_MIN_LENGTH]
+        if fts_terms:
+            source = "messages_fts JOIN messages AS m ON m.message_id = messages_fts.rowid"
+            conditions.append("messages_fts MATCH ?")
+            params.append(" AND ".join(_escape_fts(term) for term in fts_terms))
+        for term in terms:
+            if len(term) < TRIGRAM_MIN_LENGTH:
+                conditions.append("m.content LIKE ? ESCAPE '\\'")
+                params.append(f"%{_escape_like(term)}%")
+
+        if author_id is not None:
+            conditions.append("m.author_id = ?")
+            params.append(author_id)
+        if room:
+            conditions.append("m.room LIKE ? ESCAPE '\\'")
+            params.append(f"%{_escape_like(room)}%")
+        if since is not None:
+            conditions.append("m.created_at >= ?")
+            params.append(since.timestamp())
+        if until is not None:
+            conditions.append("m.created_at < ?")
+            params.append(until.timestamp())
+
+        sql = (
+            "SELECT m.message_id, m.channel_id, m.room, m.author_id, m.author_name, m.created_at, m.content"
+            f" FROM {source} WHERE {' AND '.join(conditions)}"
+            " ORDER BY m.created_at DESC LIMIT ?"
+        )
+        params.append(limit)
+
+        conn = self._connection()
+        with self._conn_lock:
+            rows = conn.execute(sql, params).fetchall()
+        keys = ("message_id", "channel_id", "room", "author_id", "author_name", "created_at", "content")
+        return [dict(zip(keys, row)) for row in rows]
+
+    async def close(self):
+        """未反映のメッセージを書き込んで閉じる"""
+        if self._flush_task is not None and not self._flush_task.done():
+            self._flush_task.cancel()
+        await self.flush()
+        with self._conn_lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
@@ -0,0 +1,48 @@
+import time
+from contextlib import contextmanager
+from utils.metrics import get_metrics
+
+
+class StartupTimer:
+    """起動のどこに時間がかかっているかを記録する
+
+    `with timer.measure("名前"):` か `begin()` / `end()` で区間を測り、`finish()` で内訳を返す。
+    並行して測った区間（Cog の並列ロードなど）は、それぞれの所要時間をそのまま記録する。
+    """
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.phases = []  # [(名前, 開始からの秒数, 所要秒数)]
+        self.finished = False
+        self._open = {}  # {名前: 開始時刻}
+        self._seconds = get_metrics().gauge("zero_bot_startup_seconds", "起動処理の区間ごとの所要時間（秒）", ("phase",))
+
+    def begin(self, name):
+        self._open[name] = time.perf_counter()
+
+    def end(self, name):
+        started = self._open.pop(name, None)
+        if started is None:
+            return
+        elapsed = time.perf_counter() - started
+        self.phases.append((name, started - self.started, elapsed))
+        self._seconds.set(elapsed, phase=name)
+
+    @contextmanager
+    def measure(self, name):
+        self.begin(name)
+        try:
+            yield
+        finally:
+            self.end(name)
+
+    def finish(self):
+        """起動完了として内訳の文字列を返す（2回目以降は None）"""
+        if self.finished:
+            return None
+        self.finished = True
+        total = time.perf_counter() - self.started
+        self._seconds.set(total, phase="total")
+        lines = [f"⏱ 起動時間の内訳（合計 {total:.2f}s）"]
+        for name, offset, elapsed in self.phases:
+            lines.append(f"  {name:<32} {elapsed * 1000:8.1f}ms（+{offset:.2f}s）")
+        return "\n".join(lines)
@@ -0,0 +1,57 @@
+import asyncio
+from collections import namedtuple
+from utils.logging_setup import get_logger
+
+logger = get_logger("voice_events")
+
+# kind: "join" / "leave"、at: 発生時刻（JST の datetime）
+VoiceEvent = namedtuple("VoiceEvent", ["kind", "member", "voice_channel", "at"])
+
+
+class VoiceEventCoalescer:
+    """ギルドごとに短時間の入退室イベントを溜め、まとめてコールバックへ渡す
+
+    最初のイベントから `window` 秒後に、その間に届いたイベントを発生順のまま
+    `flush_callback(guild_id, events)` に渡す（連続する移動でも待ち時間は伸びない）。
+    同じギルドのコールバックは1つずつ順番に実行する（前の送信中に次の窓が閉じても追い越さない）。
+    """
+    def __init__(self, flush_callback, window=3.0):
+        self.flush_callback = flush_callback
+        self.window = window
+        self._buffers = {}  # {ギルドID: [VoiceEvent]}
+        self._timers = {}  # {ギルドID: asyncio.Task}
+        self._locks = {}  # {ギルドID: asyncio.Lock}
+
+    def add(self, guild_id, event):
+        self._buffers.setdefault(guild_id, []).append(event)
+        if guild_id not in self._timers:
+            self._timers[guild_id] = asyncio.create_task(self._flush_later(guild_id))
+
+    async def _flush_later(self, guild_id):
+        try:
+            await asyncio.sleep(self.window)
+        finally:
+            self._timers.pop(guild_id, None)
+        await self._flush(guild_id)
+
+    async def _flush(self, guild_id):
+        lock = self._locks.get(guild_id)
+        if lock is None:
+            lock = self._locks[guild_id] = asyncio.Lock()
+        async with lock:
+            # 前の送信を待つ間に届いたイベントも、ロックを取ってからまとめて取り出す
+            events = self._buffers.pop(guild_id, [])
+            if not events:
+                return
+            try:
+                await self.flush_callback(guild_id, events)
+            except Exception as e:
+                logger.error("[ERROR] 入退室イベントの送信に失敗 (guild=%s): %s", guild_id, e, exc_info=True)
+
+    async def flush_all(self):
+        """溜まっているイベントを今すぐ全て送る（終了時用）"""
+        for task in list(self._timers.values()):
+            task.cancel()
+        self._timers.clear()
+        for guild_id in list(self._buffers):
+            await self._flush(guild_id)
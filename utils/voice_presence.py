@@ -0,0 +1,127 @@
+import heapq
+from collections import namedtuple
+from utils.logging_setup import get_logger
+from config import EXCLUDED_VOICE_CHANNEL_IDS
+
+logger = get_logger("voice_presence")
+
+# name_lower: 比較用に小文字化した表示名（更新時に1回だけ作る）
+PresenceEntry = namedtuple("PresenceEntry", ["member_id", "display_name", "name_lower", "channel_id", "member"])
+
+MAX_CHOICES = 25  # Discord のオートコンプリート候補の上限
+
+
+def get_voice_presence(bot):
+    """Bot 全体で共有する VoicePresenceIndex を取得（なければ作成）"""
+    index = getattr(bot, "voice_presence", None)
+    if index is None:
+        index = VoicePresenceIndex(bot, excluded_channel_ids=EXCLUDED_VOICE_CHANNEL_IDS)
+        bot.voice_presence = index
+    return index
+
+
+class VoicePresenceIndex:
+    """ボイスチャンネルにいるメンバーのインデックス
+
+    起動時にギルドのキャッシュから作り、以降は入退室・表示名の変更イベントで更新する。
+    オートコンプリートのたびに全チャンネル・全メンバーを走査しなくて済む。
+    """
+    def __init__(self, bot, excluded_channel_ids=()):
+        self.bot = bot
+        self.excluded_channel_ids = set(excluded_channel_ids)
+        self._guilds = {}  # {ギルドID: {メンバーID: PresenceEntry}}
+
+        bot.add_listener(self.on_ready, "on_ready")
+        bot.add_listener(self.on_guild_join, "on_guild_join")
+        bot.add_listener(self.on_voice_state_update, "on_voice_state_update")
+        bot.add_listener(self.on_member_update, "on_member_update")
+
+    def index_guild(self, guild):
+        members = {}
+        for vc in guild.voice_channels:
+            if vc.id in self.excluded_channel_ids:
+                continue
+            for member in vc.members:
+                members[member.id] = self._entry(member, vc.id)
+        self._guilds[guild.id] = members
+        logger.debug("[PRESENCE] %s: ボイスチャンネルに %d 人", guild.name, len(members))
+
+    @staticmethod
+    def _entry(member, channel_id):
+        return PresenceEntry(member.id, member.display_name, member.display_name.lower(), channel_id, member)
+
+    def _members(self, guild):
+        if guild.id not in self._guilds:
+            self.index_guild(guild)
+        return self._guilds[guild.id]
+
+    def channel_of(self, guild, member_id):
+        """メンバーがいるボイスチャンネルID（いなければ None）"""
+        entry = self._members(guild).get(member_id)
+        return entry.channel_id if entry else None
+
+    def get(self, guild, member_id):
+        return self._members(guild).get(member_id)
+
+    def resolve_member(self, guild, value):
+        """オートコンプリートの値（メンバーID）からメンバーを取得（見つからなければ None）
+
+        ボイスチャンネルのインデックス → メンバーキャッシュの順に引く。
+        候補を選ばず表示名を直接入力された場合は、ボイスチャンネル内で一意に決まるときだけ解決する。
+        """
+        value = (value or "").strip()
+        if value.isdigit():
+            member_id = int(value)
+        else:
+            matches = [entry for entry in self._members(guild).values() if entry.display_name == value]
+            if len(matches) != 1:
+                return None
+            member_id = matches[0].member_id
+
+        entry = self._members(guild).get(member_id)
+        if entry is not None:
+            return entry.member
+        return guild.get_member(member_id)
+
+    def suggest(self, guild, current, caller_channel_id=None, limit=MAX_CHOICES):
+        """入力中の文字列に合うメンバーを順位付けして返す
+
+        実行者と同じ部屋 → 前方一致 → 部分一致 → 名前順。
+        """
+        current_lower = (current or "").lower()
+        ranked = []
+        for entry in self._members(guild).values():
+            if entry.name_lower.startswith(current_lower):
+                match_rank = 0
+            elif current_lower in entry.name_lower:
+                match_rank = 1
+            else:
+                continue
+            room_rank = 0 if caller_channel_id is not None and entry.channel_id == caller_channel_id else 1
+            ranked.append((room_rank, match_rank, entry.name_lower, entry))
+        return [item[3] for item in heapq.nsmallest(limit, ranked, key=lambda item: item[:3])]
+
+    # ---------- イベント ----------
+    async def on_ready(self):
+        for guild in self.bot.guilds:
+            self.index_guild(guild)
+
+    async def on_guild_join(self, guild):
+        self.index_guild(guild)
+
+    async def on_voice_state_update(self, member, before, after):
+        if member.guild.id not in self._guilds:
+            return  # 未登録のギルドは次の参照時にまとめて作る
+        members = self._guilds[member.guild.id]
+        if after.channel is None or after.channel.id in self.excluded_channel_ids:
+            members.pop(member.id, None)
+        else:
+            members[member.id] = self._entry(member, after.channel.id)
+
+    async def on_member_update(self, before, after):
+        if before.display_name == after.display_name:
+            return
+        members = self._guilds.get(after.guild.id)
+        entry = members.get(after.id) if members else None
+        if entry is not None:
+            members[after.id] = self._entry(after, entry.channel_id)
@@ -0,0 +1,105 @@
+"""重い処理を受け持つワーカープロセス
+
+bot.py（JOB_WORKER=True）が multiprocessing で起動し、ローカルのキューでジョブを受け取る。
+ゲートウェイには接続せず、REST だけを使う discord.Client でチャンネルを取得する。
+
+  archive  アーカイブの書き出し → バンドル → Google Drive へのアップロード
+  purge    空になったボイスチャンネルのメッセージ削除
+
+※ Google Drive の初回認証（ターミナル入力）はワーカーではできないので、先に JOB_WORKER=False で済ませておく
+"""
+import asyncio
+import signal
+import discord
+from config import TOKEN
+from utils.archive_pipeline import ArchivePipeline
+from utils.purge import ChannelPurger
+from utils.logging_setup import setup_logging, shutdown_logging, get_logger
+
+logger = get_logger("worker")
+
+
+class JobWorker:
+    def __init__(self, job_queue, result_queue):
+        self.job_queue = job_queue
+        self.result_queue = result_queue
+        self.client = discord.Client(intents=discord.Intents.none())
+        self.pipeline = ArchivePipeline()
+        self.purger = ChannelPurger()
+        self.tasks = {}  # {ジョブID: 実行中の Task}
+        self.handlers = {
+            "archive": self.run_archive,
+            "purge": self.run_purge,
+        }
+
+    async def run(self):
+        await self.client.login(TOKEN)  # ✅ REST のみ（ゲートウェイには接続しない）
+        logger.info("ワーカーを開始しました")
+        try:
+            while True:
+                message = await asyncio.to_thread(self.job_queue.get)
+                if message is None:
+                    break  # Bot の終了
+                if "cancel" in message:
+                    task = self.tasks.get(message["cancel"])
+                    if task is not None:
+                        task.cancel()
+                    continue
+                self.start_job(message)
+
+            # 実行中のジョブは最後まで終わらせる（待ちきれなければ Bot 側が強制終了する）
+            if self.tasks:
+                await asyncio.gather(*self.tasks.values(), return_exceptions=True)
+        finally:
+            await self.client.close()
+
+    def start_job(self, message):
+        handler = self.handlers.get(message["kind"])
+        if handler is None:
+            self.result_queue.put({"id": message["id"], "kind": message["kind"], "ok": False,
+                                   "error": f"不明なジョブ: {message['kind']}"})
+            return
+        logger.debug("[JOB] %s #%s を開始", message["kind"], message["id"])
+        task = asyncio.create_task(handler(**message["payload"]))
+        self.tasks[message["id"]] = task
+        task.add_done_callback(lambda t: self._on_done(message, t))
+
+    def _on_done(self, message, task):
+        self.tasks.pop(message["id"], None)
+        result = {"id": message["id"], "kind": message["kind"], "ok": False}
+        if task.cancelled():
+            result["error"] = "キャンセルされました"
+        elif task.exception() is not None:
+            e = task.exception()
+            logger.error("[JOB] %s #%s が失敗: %s", message["kind"], message["id"], e)
+            result["error"] = f"{type(e).__name__}: {e}"
+        else:
+            result["ok"] = True
+            result["result"] = task.result()
+        self.result_queue.put(result)
+
+    async def fetch_channel(self, channel_id):
+        try:
+            return await self.client.fetch_channel(channel_id)
+        except discord.NotFound:
+            return None  # 削除済み
+
+    # ---------- ジョブ ----------
+    async def run_archive(self, targets):
+        return await self.pipeline.run(targets, self.fetch_channel)
+
+    async def run_purge(self, channel_id, before):
+        channel = await self.fetch_channel(channel_id)
+        if channel is None:
+            return {"deleted": 0, "failed": 0}
+        return await self.purger.purge(channel, before=before)
+
+
+def worker_main(job_queue, result_queue):
+    """multiprocessing から呼ばれる子プロセスの入口"""
+    signal.signal(signal.SIGINT, signal.SIG_IGN)  # Ctrl+C では止めず、Bot 側からの終了指示を待つ
+    setup_logging(prefix="worker")
+    try:
+        asyncio.run(JobWorker(job_queue, result_queue).run())
+    finally:
+        shutdown_logging()